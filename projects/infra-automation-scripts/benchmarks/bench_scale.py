@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Synthetic-scale benchmarks for the infra automation scripts.
+
+Runs the audit, cost and backup functions against synthetic estates of
+configurable size, page shape and per-call latency (see synthetic_aws.py)
+and reports wall time, API calls, peak RSS and rows/sec. Each case runs in
+a fresh process so peak RSS is attributable to that case alone. Results
+can be saved as JSON and compared against an earlier run to catch
+regressions across versions.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Any, Callable
+
+import boto3
+from tabulate import tabulate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from synthetic_aws import ACCOUNT_ID, Estate, SyntheticAws  # noqa: E402
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger("bench_scale")
+
+
+def bench_audit_ec2_instances(session: boto3.Session) -> int:
+    from aws_resource_audit import audit_ec2_instances
+
+    return sum(1 for _ in audit_ec2_instances(session))
+
+
+def bench_find_old_snapshots(session: boto3.Session) -> int:
+    from cost_optimizer import find_old_snapshots
+
+    return len(find_old_snapshots(session.client("ec2"), ACCOUNT_ID, age_days=90))
+
+
+def bench_find_underutilized_instances(session: boto3.Session) -> int:
+    from cost_optimizer import find_underutilized_instances
+
+    return len(find_underutilized_instances(session, cpu_threshold=10.0))
+
+
+def bench_cost_report(session: boto3.Session) -> int:
+    from argparse import Namespace
+
+    from cost_optimizer import scan_account
+
+    args = Namespace(
+        stopped_days=7,
+        cpu_threshold=10.0,
+        utilization_days=14,
+        utilization_rules=None,
+        snapshot_age=90,
+        lb_days=14,
+        lb_min_requests=100.0,
+    )
+    return sum(1 for _ in scan_account(session, ACCOUNT_ID, args))
+
+
+def bench_find_idle_load_balancers(session: boto3.Session) -> int:
+    from cost_optimizer import find_idle_load_balancers
+
+    return len(find_idle_load_balancers(session))
+
+
+def bench_delete_old_snapshots(session: boto3.Session) -> int:
+    from backup_manager import delete_old_snapshots
+
+    return delete_old_snapshots(session, retention_days=30, dry_run=False)
+
+
+# Services whose models are loaded before timing starts.
+WARM_SERVICES = ("ec2", "sts", "cloudwatch", "elbv2", "elb")
+
+# Case name -> (estate fields scaled by --sizes, benchmark returning rows produced).
+CASES: dict[str, tuple[tuple[str, ...], Callable[[boto3.Session], int]]] = {
+    "audit_ec2_instances": (("instances",), bench_audit_ec2_instances),
+    "find_old_snapshots": (("snapshots",), bench_find_old_snapshots),
+    "find_underutilized_instances": (("instances",), bench_find_underutilized_instances),
+    "find_idle_load_balancers": (("load_balancers",), bench_find_idle_load_balancers),
+    "cost_report": (("instances", "volumes", "snapshots", "addresses", "load_balancers"), bench_cost_report),
+    "delete_old_snapshots": (("snapshots",), bench_delete_old_snapshots),
+}
+
+# Metrics compared against a baseline; higher is worse for all of them.
+COMPARED_METRICS = ("wall_s", "api_calls", "peak_rss_mb")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case: str, size: int, page_size: int, reservation_size: int, latency: float) -> dict[str, Any]:
+    """Run one case at one size; meant to execute in a fresh worker process."""
+    logging.getLogger().setLevel(logging.WARNING)
+    fields, bench = CASES[case]
+    estate = Estate(
+        page_size=page_size,
+        reservation_size=reservation_size,
+        latency=latency,
+        **{field: size for field in fields},
+    )
+    # Import the module under test, load service models and build clients
+    # against an empty estate first, so only the work that scales is timed.
+    bench(SyntheticAws(Estate()).session())
+    aws = SyntheticAws(estate)
+    session = aws.session()
+    for service in WARM_SERVICES:
+        session.client(service)
+    baseline_rss = peak_rss_mb()
+
+    started = time.perf_counter()
+    rows = bench(session)
+    wall = time.perf_counter() - started
+    return {
+        "case": case,
+        "size": size,
+        "rows": rows,
+        "wall_s": round(wall, 3),
+        "api_calls": sum(aws.calls.values()),
+        "calls_by_operation": dict(sorted(aws.calls.items())),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "rows_per_s": round(rows / wall, 1) if wall > 0 else 0.0,
+    }
+
+
+def git_revision() -> str:
+    """Short hash of the checked-out commit, or 'unknown'."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list[dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """Print the change against a saved run; return True if anything regressed."""
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    previous = {(r["case"], r["size"]): r for r in baseline.get("results", [])}
+
+    rows = []
+    regressed = False
+    for result in results:
+        before = previous.get((result["case"], result["size"]))
+        if before is None:
+            continue
+        row: dict[str, Any] = {"Case": result["case"], "Size": result["size"]}
+        for metric in COMPARED_METRICS:
+            old, new = before[metric], result[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            flag = ""
+            if change > threshold:
+                flag = " !"
+                regressed = True
+            row[metric] = f"{old} -> {new} ({change:+.1f}%){flag}"
+        rows.append(row)
+
+    print(f"\nCompared with {baseline_path} (revision {baseline.get('meta', {}).get('revision', '?')}):")
+    if rows:
+        print(tabulate(rows, headers="keys", tablefmt="grid", disable_numparse=True))
+    else:
+        print("  No matching cases in the baseline.")
+    if regressed:
+        print(f"  '!' marks regressions above {threshold:.0f}%")
+    return regressed
+
+
+def sizes_arg(value: str) -> list[int]:
+    """argparse type for a comma-separated list of positive sizes."""
+    try:
+        sizes = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got {value!r}")
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError(f"sizes must be >= 1, got {value!r}")
+    return sizes
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the CLI argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scripts against synthetic AWS estates.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""\
+Examples:
+  %(prog)s
+  %(prog)s --sizes 10000,100000,1000000 --cases audit_ec2_instances find_old_snapshots
+  %(prog)s --latency-ms 20 --page-size 500 --save results/before.json
+  %(prog)s --save results/after.json --compare results/before.json
+        """,
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=list(CASES),
+        default=list(CASES),
+        help="Cases to run (default: all)",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=sizes_arg,
+        default=[1000, 10000],
+        metavar="N,N,...",
+        help="Estate sizes to run each case at (default: 1000,10000)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every API call (default: 0)")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Resources per page when the caller sends no MaxResults (default: 1000)",
+    )
+    parser.add_argument(
+        "--reservation-size",
+        type=int,
+        default=1,
+        help="Instances per describe_instances reservation (default: 1)",
+    )
+    parser.add_argument("--save", metavar="FILE", help="Write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against results saved earlier with --save")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Percent increase reported as a regression by --compare (default: 10)",
+    )
+    return parser
+
+
+def main() -> int:
+    """Run the benchmark suite."""
+    parser = build_parser()
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for case in args.cases:
+        for size in args.sizes:
+            logger.info("Running %s at %d resources...", case, size)
+            # A fresh interpreter per case keeps peak RSS from leaking between cases.
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(
+                    run_case, case, size, args.page_size, args.reservation_size, args.latency_ms / 1000,
+                ).result()
+            results.append(result)
+
+    print(tabulate(
+        [
+            {
+                "Case": r["case"],
+                "Size": r["size"],
+                "Rows": r["rows"],
+                "Wall s": r["wall_s"],
+                "API calls": r["api_calls"],
+                "Peak RSS MB": r["peak_rss_mb"],
+                "RSS growth MB": round(r["peak_rss_mb"] - r["baseline_rss_mb"], 1),
+                "Rows/s": r["rows_per_s"],
+            }
+            for r in results
+        ],
+        headers="keys",
+        tablefmt="grid",
+    ))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        meta = {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "latency_ms": args.latency_ms,
+            "page_size": args.page_size,
+            "reservation_size": args.reservation_size,
+        }
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({"meta": meta, "results": results}, fh, indent=2)
+        logger.info("Results written to %s", args.save)
+
+    if args.compare:
+        try:
+            if compare(results, args.compare, args.threshold):
+                return 1
+        except (OSError, ValueError) as exc:
+            logger.error("Failed to read baseline %s: %s", args.compare, exc)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Synthetic AWS estates for benchmarking the scripts without an account.
+
+Responses are produced by botocore event handlers, the same mechanism
+botocore's Stubber uses: the API parameters are captured before
+serialization and a parsed response is returned from before-call, so no
+HTTP request is made. Unlike Stubber, responses are generated on demand
+from the resource index, so an estate of a million resources costs no
+memory until a page of it is requested. Filters and pagination tokens are
+honoured the way the real APIs honour them, and every call can be delayed
+to model network latency.
+"""
+
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+ACCOUNT_ID = "123456789012"
+INSTANCE_TYPES = ("t3.micro", "t3.large", "m5.large", "m5.xlarge", "c5.large", "r5.large")
+VOLUME_TYPES = ("gp3", "gp2", "io1", "st1")
+TEAMS = ("payments", "search", "platform", "data")
+
+_OK = AWSResponse(None, 200, {}, None)
+
+
+@dataclass
+class Estate:
+    """Shape of a synthetic account; resources are derived from their index."""
+
+    instances: int = 0
+    volumes: int = 0
+    snapshots: int = 0
+    addresses: int = 0
+    # ELBv2 load balancers; a quarter as many Classic ones are added.
+    load_balancers: int = 0
+    region: str = "us-east-1"
+    # Resources per page when the caller does not send MaxResults.
+    page_size: int = 1000
+    reservation_size: int = 1
+    latency: float = 0.0
+    seed_time: datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def instance(self, i: int) -> dict[str, Any]:
+        return {
+            "InstanceId": f"i-{i:017x}",
+            "InstanceType": INSTANCE_TYPES[i % len(INSTANCE_TYPES)],
+            "State": {"Name": "stopped" if i % 5 == 0 else "running"},
+            "StateTransitionReason": "User initiated (2025-11-02 10:00:00 GMT)" if i % 5 == 0 else "",
+            "Placement": {"AvailabilityZone": f"{self.region}{'abc'[i % 3]}"},
+            "PrivateIpAddress": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+            "LaunchTime": self.seed_time - timedelta(hours=i % 20000),
+            "Tags": [{"Key": "Name", "Value": f"node-{i}"}, {"Key": "Team", "Value": TEAMS[i % len(TEAMS)]}],
+        }
+
+    def volume(self, i: int) -> dict[str, Any]:
+        return {
+            "VolumeId": f"vol-{i:017x}",
+            "Size": 8 + i % 500,
+            "VolumeType": VOLUME_TYPES[i % len(VOLUME_TYPES)],
+            "AvailabilityZone": f"{self.region}{'abc'[i % 3]}",
+            "State": "available" if i % 4 == 0 else "in-use",
+            "CreateTime": self.seed_time - timedelta(hours=i % 20000),
+            "Tags": [{"Key": "Name", "Value": f"data-{i}"}, {"Key": "Backup", "Value": "daily" if i % 2 else "none"}],
+        }
+
+    def snapshot(self, i: int) -> dict[str, Any]:
+        tags = [{"Key": "Name", "Value": f"snap-{i}"}]
+        if i % 2 == 0:
+            tags.append({"Key": "CreatedBy", "Value": "backup_manager"})
+        return {
+            "SnapshotId": f"snap-{i:017x}",
+            "VolumeId": f"vol-{i % max(self.volumes, 1):017x}",
+            "VolumeSize": 8 + i % 500,
+            "StartTime": datetime.now(timezone.utc) - timedelta(hours=i % (2 * 365 * 24)),
+            "State": "completed",
+            "OwnerId": ACCOUNT_ID,
+            "Tags": tags,
+        }
+
+    def address(self, i: int) -> dict[str, Any]:
+        address = {
+            "AllocationId": f"eipalloc-{i:017x}",
+            "PublicIp": f"198.18.{i >> 8 & 255}.{i & 255}",
+            "Domain": "vpc",
+        }
+        if i % 3:
+            address["AssociationId"] = f"eipassoc-{i:017x}"
+        return address
+
+    def load_balancer_arn(self, i: int) -> str:
+        kind = "net" if i % 3 == 1 else "app"
+        return f"arn:aws:elasticloadbalancing:{self.region}:{ACCOUNT_ID}:loadbalancer/{kind}/lb-{i}/{i:016x}"
+
+    def load_balancer(self, i: int) -> dict[str, Any]:
+        return {
+            "LoadBalancerArn": self.load_balancer_arn(i),
+            "LoadBalancerName": f"lb-{i}",
+            "Type": "network" if i % 3 == 1 else "application",
+            "State": {"Code": "active"},
+            "CreatedTime": self.seed_time - timedelta(days=30 + i % 700),
+        }
+
+    def target_group(self, i: int) -> dict[str, Any]:
+        # Target group i routes to load balancer i; every fifth one is detached.
+        return {
+            "TargetGroupArn": f"arn:aws:elasticloadbalancing:{self.region}:{ACCOUNT_ID}:targetgroup/tg-{i}/{i:016x}",
+            "TargetGroupName": f"tg-{i}",
+            "LoadBalancerArns": [] if i % 5 == 0 else [self.load_balancer_arn(i)],
+        }
+
+    def classic_load_balancer(self, i: int) -> dict[str, Any]:
+        return {
+            "LoadBalancerName": f"classic-{i}",
+            "CreatedTime": self.seed_time - timedelta(days=30 + i % 700),
+            "Instances": [{"InstanceId": f"i-{i:017x}"}] if i % 2 else [],
+        }
+
+
+# EC2 filter name -> attribute getter, for server-side filtering.
+FILTER_ATTRIBUTES: dict[str, Callable[[dict[str, Any]], str]] = {
+    "instance-state-name": lambda r: r["State"]["Name"],
+    "instance-type": lambda r: r["InstanceType"],
+    "volume-type": lambda r: r["VolumeType"],
+    "status": lambda r: r["State"],
+    "availability-zone": lambda r: r.get("Placement", {}).get("AvailabilityZone") or r.get("AvailabilityZone", ""),
+    "domain": lambda r: r["Domain"],
+}
+
+
+def _matches(resource: dict[str, Any], filters: list[dict[str, Any]]) -> bool:
+    for flt in filters:
+        name, values = flt["Name"], flt["Values"]
+        if name.startswith("tag:"):
+            tags = {tag["Key"]: tag["Value"] for tag in resource.get("Tags", [])}
+            actual = tags.get(name[4:])
+        else:
+            actual = FILTER_ATTRIBUTES[name](resource)
+        if actual not in values:
+            return False
+    return True
+
+
+class SyntheticAws:
+    """Serve an Estate to every client of a boto3 session.
+
+    ``calls`` counts requests per operation; it is kept alongside any other
+    instrumentation so benchmarks can report API calls on their own.
+    """
+
+    def __init__(self, estate: Estate) -> None:
+        self.estate = estate
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def session(self) -> boto3.Session:
+        """Return a session whose clients are answered from the estate."""
+        session = boto3.Session(
+            aws_access_key_id="synthetic",
+            aws_secret_access_key="synthetic",
+            region_name=self.estate.region,
+        )
+        session.events.register("before-parameter-build.*.*", self._capture)
+        session.events.register("before-call.*.*", self._respond)
+        return session
+
+    @staticmethod
+    def _capture(params: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        context["synthetic_params"] = dict(params)
+
+    def _respond(self, model: Any, context: dict[str, Any], **kwargs: Any) -> tuple[AWSResponse, dict[str, Any]]:
+        operation = model.name
+        service = model.service_model.service_name
+        params = context.get("synthetic_params", {})
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.estate.latency:
+            time.sleep(self.estate.latency)
+        # ELB and ELBv2 share operation names, so service-specific handlers come first.
+        handler = getattr(self, f"_op_{service}_{operation}", None) or getattr(self, f"_op_{operation}", None)
+        return _OK, handler(params) if handler else {}
+
+    def _page(
+        self,
+        params: dict[str, Any],
+        total: int,
+        build: Callable[[int], dict[str, Any]],
+        ids_key: str | None = None,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """Return one filtered page of resources and the next token."""
+        filters = params.get("Filters", [])
+        if ids_key and params.get(ids_key):
+            wanted = [int(resource_id.split("-", 1)[1], 16) for resource_id in params[ids_key]]
+            items = [build(i) for i in wanted if i < total]
+            return [item for item in items if _matches(item, filters)], None
+        start = int(params.get("NextToken") or 0)
+        limit = params.get("MaxResults") or self.estate.page_size
+        end = min(start + limit, total)
+        items = [item for item in map(build, range(start, end)) if _matches(item, filters)]
+        return items, str(end) if end < total else None
+
+    def _marker_page(
+        self,
+        params: dict[str, Any],
+        total: int,
+        build: Callable[[int], dict[str, Any]],
+        result_key: str,
+    ) -> dict[str, Any]:
+        """One page of an ELB listing, which pages with Marker/PageSize."""
+        start = int(params.get("Marker") or 0)
+        end = min(start + (params.get("PageSize") or 400), total)
+        return {result_key: [build(i) for i in range(start, end)], **({"NextMarker": str(end)} if end < total else {})}
+
+    def _op_DescribeInstances(self, params: dict[str, Any]) -> dict[str, Any]:
+        instances, token = self._page(params, self.estate.instances, self.estate.instance, "InstanceIds")
+        size = self.estate.reservation_size
+        reservations = [
+            {"ReservationId": f"r-{n:017x}", "Instances": instances[n:n + size]}
+            for n in range(0, len(instances), size)
+        ]
+        return {"Reservations": reservations, **({"NextToken": token} if token else {})}
+
+    def _op_DescribeVolumes(self, params: dict[str, Any]) -> dict[str, Any]:
+        volumes, token = self._page(params, self.estate.volumes, self.estate.volume, "VolumeIds")
+        return {"Volumes": volumes, **({"NextToken": token} if token else {})}
+
+    def _op_DescribeSnapshots(self, params: dict[str, Any]) -> dict[str, Any]:
+        snapshots, token = self._page(params, self.estate.snapshots, self.estate.snapshot, "SnapshotIds")
+        return {"Snapshots": snapshots, **({"NextToken": token} if token else {})}
+
+    def _op_DescribeAddresses(self, params: dict[str, Any]) -> dict[str, Any]:
+        addresses = [self.estate.address(i) for i in range(self.estate.addresses)]
+        return {"Addresses": [a for a in addresses if _matches(a, params.get("Filters", []))]}
+
+    def _op_elbv2_DescribeLoadBalancers(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._marker_page(params, self.estate.load_balancers, self.estate.load_balancer, "LoadBalancers")
+
+    def _op_DescribeTargetGroups(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._marker_page(params, self.estate.load_balancers, self.estate.target_group, "TargetGroups")
+
+    def _op_elb_DescribeLoadBalancers(self, params: dict[str, Any]) -> dict[str, Any]:
+        total = self.estate.load_balancers // 4
+        return self._marker_page(params, total, self.estate.classic_load_balancer, "LoadBalancerDescriptions")
+
+    def _op_elbv2_DescribeTags(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"TagDescriptions": [
+            {"ResourceArn": arn, "Tags": [{"Key": "Team", "Value": TEAMS[zlib.crc32(arn.encode()) % len(TEAMS)]}]}
+            for arn in params["ResourceArns"]
+        ]}
+
+    def _op_elb_DescribeTags(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"TagDescriptions": [
+            {"LoadBalancerName": name, "Tags": [{"Key": "Team", "Value": TEAMS[zlib.crc32(name.encode()) % len(TEAMS)]}]}
+            for name in params["LoadBalancerNames"]
+        ]}
+
+    def _op_GetMetricData(self, params: dict[str, Any]) -> dict[str, Any]:
+        results = []
+        for query in params["MetricDataQueries"]:
+            stat = query["MetricStat"]
+            dimension = stat["Metric"]["Dimensions"][0]
+            if dimension["Name"] == "InstanceId":
+                load = int(dimension["Value"].split("-", 1)[1], 16) % 40
+            else:
+                load = zlib.crc32(dimension["Value"].encode()) % 40
+            step = timedelta(seconds=stat["Period"])
+            points = max(1, int((params["EndTime"] - params["StartTime"]) / step))
+            results.append({
+                "Id": query["Id"],
+                "Timestamps": [params["StartTime"] + step * n for n in range(points)],
+                "Values": [float(load + n % 3) for n in range(points)],
+                "StatusCode": "Complete",
+            })
+        return {"MetricDataResults": results}
+
+    def _op_GetCallerIdentity(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"Account": ACCOUNT_ID, "Arn": f"arn:aws:iam::{ACCOUNT_ID}:user/bench", "UserId": "bench"}
+
+    def _op_DeleteSnapshot(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {}
@@ -0,0 +1,273 @@
+"""Opt-in AWS API call instrumentation.
+
+Hooks into the botocore event system of a session so that every client it
+creates records per-operation call counts, latency percentiles, request and
+response bytes, retries, throttling and errors. Shared by
+aws_resource_audit.py, cost_optimizer.py and backup_manager.py: their
+get_session() passes each new session through instrument(), which is a no-op
+unless --stats, --stats-json or --trace enabled collection.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import IO, Any
+from urllib.parse import urlencode
+
+import boto3
+from tabulate import tabulate
+
+logger = logging.getLogger("api_stats")
+
+# Error codes AWS services use to signal request throttling.
+THROTTLE_CODES = frozenset({
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "BandwidthLimitExceeded",
+    "SlowDown",
+    "EC2ThrottledException",
+})
+
+# Request parameters that carry a pagination token into the next page.
+PAGE_TOKENS = ("NextToken", "Marker", "ContinuationToken", "PaginationToken", "nextToken")
+
+_CONTEXT_KEY = "api_stats"
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class OperationStats:
+    """Counters for one service operation."""
+
+    calls: int = 0
+    pages: int = 0
+    errors: int = 0
+    retries: int = 0
+    throttles: int = 0
+    bytes_out: int = 0
+    bytes_in: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+
+class ApiStats:
+    """Collect API call statistics from instrumented boto3 sessions.
+
+    Handlers are registered on the session's event emitter, which every
+    client built from the session inherits, and update shared counters
+    under a lock so clients can be used from worker threads. Handlers only
+    observe and always return None, so they never change how a call is made.
+    """
+
+    def __init__(self, trace: bool = False) -> None:
+        self.trace = trace
+        self.started = time.perf_counter()
+        self.operations: dict[tuple[str, str], OperationStats] = {}
+        self.events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def attach(self, session: boto3.Session) -> boto3.Session:
+        """Register the collection handlers on a session and return it.
+
+        Only clients created after this call are instrumented.
+        """
+        events = session.events
+        events.register("before-parameter-build.*.*", self._on_start, unique_id="api-stats-start")
+        events.register("before-call.*.*", self._on_request, unique_id="api-stats-request")
+        events.register("needs-retry.*.*", self._on_attempt, unique_id="api-stats-attempt")
+        events.register("after-call.*.*", self._on_response, unique_id="api-stats-response")
+        events.register("after-call-error.*.*", self._on_exception, unique_id="api-stats-exception")
+        return session
+
+    def _on_start(self, params: dict[str, Any], model: Any, context: dict[str, Any], **kwargs: Any) -> None:
+        paged = any(params.get(token) for token in PAGE_TOKENS)
+        context[_CONTEXT_KEY] = {
+            "service": model.service_model.service_name,
+            "operation": model.name,
+            "started": time.perf_counter(),
+            "paged": paged,
+        }
+
+    def _on_request(self, params: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        call = context.get(_CONTEXT_KEY)
+        if call is None:
+            return
+        body = params.get("body")
+        if isinstance(body, dict):
+            call["bytes_out"] = len(urlencode(body, doseq=True))
+        elif isinstance(body, (bytes, str)):
+            call["bytes_out"] = len(body)
+
+    def _on_attempt(self, response: Any = None, request_dict: Any = None, **kwargs: Any) -> None:
+        if not response:
+            return
+        code = response[1].get("Error", {}).get("Code")
+        if code in THROTTLE_CODES:
+            call = (request_dict or {}).get("context", {}).get(_CONTEXT_KEY)
+            if call is not None:
+                call["throttles"] = call.get("throttles", 0) + 1
+
+    def _on_response(self, http_response: Any, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        call = context.get(_CONTEXT_KEY)
+        if call is None:
+            return
+        metadata = parsed.get("ResponseMetadata", {})
+        # Paginated responses carry a token (or truncation flag) for the next page.
+        if any(parsed.get(token) for token in ("NextToken", "NextMarker", "IsTruncated", "NextContinuationToken")):
+            call["paged"] = True
+        headers = getattr(http_response, "headers", None) or {}
+        self._record(
+            call,
+            error=http_response.status_code >= 300,
+            retries=metadata.get("RetryAttempts", 0),
+            bytes_in=int(headers.get("content-length") or 0),
+        )
+
+    def _on_exception(self, exception: Exception, context: dict[str, Any], **kwargs: Any) -> None:
+        call = context.get(_CONTEXT_KEY)
+        if call is not None:
+            self._record(call, error=True, retries=0, bytes_in=0)
+
+    def _record(self, call: dict[str, Any], error: bool, retries: int, bytes_in: int) -> None:
+        ended = time.perf_counter()
+        elapsed = ended - call["started"]
+        key = (call["service"], call["operation"])
+        with self._lock:
+            stats = self.operations.setdefault(key, OperationStats())
+            stats.calls += 1
+            stats.pages += call["paged"]
+            stats.errors += error
+            stats.retries += retries
+            stats.throttles += call.get("throttles", 0)
+            stats.bytes_out += call.get("bytes_out", 0)
+            stats.bytes_in += bytes_in
+            stats.latencies.append(elapsed)
+            if self.trace:
+                self.events.append({
+                    "name": call["operation"],
+                    "cat": call["service"],
+                    "ph": "X",
+                    "ts": round((call["started"] - self.started) * 1e6),
+                    "dur": round(elapsed * 1e6),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": {"error": error, "retries": retries, "throttles": call.get("throttles", 0)},
+                })
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Return one row per operation, slowest total time first."""
+        rows = []
+        with self._lock:
+            items = [(key, stats, sorted(stats.latencies)) for key, stats in self.operations.items()]
+        for (service, operation), stats, ordered in items:
+            rows.append({
+                "Service": service,
+                "Operation": operation,
+                "Calls": stats.calls,
+                "Pages": stats.pages,
+                "Errors": stats.errors,
+                "Retries": stats.retries,
+                "Throttles": stats.throttles,
+                "p50 ms": round(percentile(ordered, 50) * 1000, 1),
+                "p95 ms": round(percentile(ordered, 95) * 1000, 1),
+                "p99 ms": round(percentile(ordered, 99) * 1000, 1),
+                "Total s": round(sum(ordered), 3),
+                "KB out": round(stats.bytes_out / 1024, 1),
+                "KB in": round(stats.bytes_in / 1024, 1),
+            })
+        rows.sort(key=lambda row: row["Total s"], reverse=True)
+        return rows
+
+    def print_summary(self, file: IO[str] | None = None) -> None:
+        """Print the per-operation summary table."""
+        out = file or sys.stderr
+        rows = self.summary()
+        print(f"\n{'=' * 60}", file=out)
+        print("  AWS API Calls", file=out)
+        print(f"{'=' * 60}", file=out)
+        if not rows:
+            print("  No API calls recorded.", file=out)
+            return
+        print(tabulate(rows, headers="keys", tablefmt="grid"), file=out)
+        print(
+            f"  Total: {sum(row['Calls'] for row in rows)} calls, "
+            f"{sum(row['Throttles'] for row in rows)} throttled, "
+            f"{sum(row['Retries'] for row in rows)} retries",
+            file=out,
+        )
+
+    def write_json(self, path: str) -> None:
+        """Write the summary rows as JSON."""
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"wall_time": time.perf_counter() - self.started, "operations": self.summary()}, fh, indent=2)
+        logger.info("API stats written to %s", path)
+
+    def write_trace(self, path: str) -> None:
+        """Write recorded calls in Chrome trace event format (chrome://tracing, Perfetto)."""
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+        logger.info("API trace with %d calls written to %s", len(events), path)
+
+
+_active: ApiStats | None = None
+
+
+def instrument(session: boto3.Session) -> boto3.Session:
+    """Attach the active collector, if any, to a new session."""
+    if _active is not None:
+        _active.attach(session)
+    return session
+
+
+def add_stats_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the API instrumentation options shared by the scripts."""
+    group = parser.add_argument_group("API instrumentation")
+    group.add_argument("--stats", action="store_true", help="Print per-operation API call stats to stderr")
+    group.add_argument("--stats-json", metavar="FILE", help="Write per-operation API call stats as JSON")
+    group.add_argument("--trace", metavar="FILE", help="Write every API call in Chrome trace format")
+
+
+def open_stats(args: argparse.Namespace) -> ApiStats | None:
+    """Start collecting if any instrumentation option was given.
+
+    Must run before the script creates its sessions.
+    """
+    global _active
+    if not (args.stats or args.stats_json or args.trace):
+        return None
+    _active = ApiStats(trace=bool(args.trace))
+    return _active
+
+
+def report_stats(stats: ApiStats | None, args: argparse.Namespace) -> None:
+    """Emit the outputs requested on the command line."""
+    if stats is None:
+        return
+    try:
+        if args.stats:
+            stats.print_summary()
+        if args.stats_json:
+            stats.write_json(args.stats_json)
+        if args.trace:
+            stats.write_trace(args.trace)
+    except OSError as exc:
+        logger.error("Failed to write API stats: %s", exc)
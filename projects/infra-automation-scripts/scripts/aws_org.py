@@ -0,0 +1,265 @@
+"""Multi-account and multi-region targeting helpers.
+
+Shared by aws_resource_audit.py and cost_optimizer.py to run their existing
+checks across many member accounts in a single process. Roles are assumed
+in parallel, and the resulting STS credentials are cached per account and
+refreshed automatically shortly before they expire. Also holds the
+per-session client cache used wherever sessions are shared between threads.
+"""
+
+import argparse
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from typing import Any, Callable
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+from botocore.exceptions import BotoCoreError, ClientError
+
+from api_stats import instrument
+
+logger = logging.getLogger("aws_org")
+
+# Adaptive retries add client-side rate limiting, which keeps wide fan-outs
+# from turning throttling errors into failed sections.
+CLIENT_CONFIG = Config(retries={"max_attempts": 10, "mode": "adaptive"})
+
+_client_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary[boto3.Session, dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+
+def get_client(session: boto3.Session, service: str) -> Any:
+    """Return a cached client for a session, safe to call from worker threads.
+
+    boto3 sessions are not thread-safe but the clients they create are, so
+    client construction is serialized and each client is built once per session.
+    """
+    with _client_lock:
+        clients = _clients.setdefault(session, {})
+        if service not in clients:
+            clients[service] = session.client(service, config=CLIENT_CONFIG)
+        return clients[service]
+
+
+def discover_regions(session: boto3.Session) -> list[str]:
+    """Return the regions enabled for the account, sorted by name."""
+    ec2 = session.client("ec2")
+    response = ec2.describe_regions(
+        Filters=[{"Name": "opt-in-status", "Values": ["opt-in-not-required", "opted-in"]}],
+    )
+    return sorted(region["RegionName"] for region in response.get("Regions", []))
+
+
+def resolve_regions(session: boto3.Session, spec: str) -> list[str]:
+    """Expand a --regions value ('all' or a comma-separated list)."""
+    if spec.strip().lower() == "all":
+        return discover_regions(session)
+    return [region.strip() for region in spec.split(",") if region.strip()]
+
+
+def load_account_ids(accounts: list[str] | None = None, accounts_file: str | None = None) -> list[str]:
+    """Collect account IDs from CLI values and/or a file (one per line).
+
+    CLI values may also be comma-separated. Blank lines and '#' comments in
+    the file are ignored, and duplicates are dropped while keeping order.
+    """
+    raw: list[str] = []
+    for value in accounts or []:
+        raw.extend(value.split(","))
+    if accounts_file:
+        try:
+            with open(accounts_file, encoding="utf-8") as fh:
+                for line in fh:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        raw.append(line)
+        except OSError as exc:
+            logger.error("Failed to read accounts file %s: %s", accounts_file, exc)
+
+    account_ids: list[str] = []
+    for value in raw:
+        value = value.strip()
+        if not value:
+            continue
+        if not (value.isdigit() and len(value) == 12):
+            logger.warning("Ignoring invalid account ID: %s", value)
+            continue
+        if value not in account_ids:
+            account_ids.append(value)
+    return account_ids
+
+
+def add_org_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the organization-mode options shared by the audit scripts."""
+    group = parser.add_argument_group("organization mode")
+    group.add_argument(
+        "--accounts",
+        nargs="+",
+        metavar="ID",
+        help="Member account IDs to audit via an assumed role (space or comma separated)",
+    )
+    group.add_argument("--accounts-file", metavar="FILE", help="File with account IDs (one per line)")
+    group.add_argument(
+        "--role-name",
+        default="OrganizationAccountAccessRole",
+        help="Role to assume in each account (default: OrganizationAccountAccessRole)",
+    )
+    group.add_argument("--external-id", help="External ID for sts:AssumeRole")
+
+
+# (account ID, region, session) for one account/region to scan.
+Target = tuple[str, str, boto3.Session]
+
+
+class AssumedRoleSessions:
+    """Build boto3 sessions for member accounts via sts:AssumeRole.
+
+    One set of refreshable credentials is kept per account and shared by
+    every regional session for that account, so a role is assumed once per
+    run (plus a refresh if the run outlives the credentials).
+    """
+
+    def __init__(
+        self,
+        base_session: boto3.Session,
+        role_name: str,
+        session_name: str = "infra-automation",
+        duration_seconds: int = 3600,
+        external_id: str | None = None,
+    ) -> None:
+        self.base_session = base_session
+        self.role_name = role_name
+        self.session_name = session_name
+        self.duration_seconds = duration_seconds
+        self.external_id = external_id
+        self._sts = base_session.client("sts")
+        self._partition = base_session.get_partition_for_region(base_session.region_name or "us-east-1")
+        self._lock = threading.Lock()
+        self._credentials: dict[str, RefreshableCredentials] = {}
+        self._sessions: dict[tuple[str, str], boto3.Session] = {}
+
+    def role_arn(self, account_id: str) -> str:
+        """Return the ARN of the role to assume in an account."""
+        return f"arn:{self._partition}:iam::{account_id}:role/{self.role_name}"
+
+    def _assume(self, account_id: str) -> dict[str, Any]:
+        """Call sts:AssumeRole and return botocore credential metadata."""
+        kwargs: dict[str, Any] = {
+            "RoleArn": self.role_arn(account_id),
+            "RoleSessionName": self.session_name,
+            "DurationSeconds": self.duration_seconds,
+        }
+        if self.external_id:
+            kwargs["ExternalId"] = self.external_id
+        creds = self._sts.assume_role(**kwargs)["Credentials"]
+        expiration = creds["Expiration"]
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        logger.debug("Assumed %s (expires %s)", kwargs["RoleArn"], expiration.isoformat())
+        return {
+            "access_key": creds["AccessKeyId"],
+            "secret_key": creds["SecretAccessKey"],
+            "token": creds["SessionToken"],
+            "expiry_time": expiration.isoformat(),
+        }
+
+    def credentials(self, account_id: str) -> RefreshableCredentials:
+        """Return cached, auto-refreshing credentials for an account."""
+        with self._lock:
+            cached = self._credentials.get(account_id)
+        if cached is not None:
+            return cached
+
+        creds = RefreshableCredentials.create_from_metadata(
+            metadata=self._assume(account_id),
+            refresh_using=lambda: self._assume(account_id),
+            method="sts-assume-role",
+        )
+        with self._lock:
+            return self._credentials.setdefault(account_id, creds)
+
+    def session(self, account_id: str, region: str) -> boto3.Session:
+        """Return a cached boto3 session for an account and region."""
+        key = (account_id, region)
+        with self._lock:
+            cached = self._sessions.get(key)
+        if cached is not None:
+            return cached
+
+        credentials = self.credentials(account_id)
+        botocore_session = botocore.session.get_session()
+        botocore_session._credentials = credentials
+        session = instrument(boto3.Session(botocore_session=botocore_session, region_name=region))
+        with self._lock:
+            return self._sessions.setdefault(key, session)
+
+    def assume_all(self, account_ids: list[str], workers: int = 10) -> list[str]:
+        """Assume the role in every account in parallel.
+
+        Returns the accounts that succeeded, in input order. Accounts where the
+        role cannot be assumed are logged and skipped so they do not block the
+        rest of the organization.
+        """
+
+        def _try(account_id: str) -> bool:
+            try:
+                self.credentials(account_id)
+                return True
+            except (ClientError, BotoCoreError) as exc:
+                logger.error("Failed to assume %s: %s", self.role_arn(account_id), exc)
+                return False
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(account_ids) or 1))) as pool:
+            ok = list(pool.map(_try, account_ids))
+        assumed = [account_id for account_id, success in zip(account_ids, ok) if success]
+        logger.info(
+            "Assumed %s in %d/%d accounts in %.1fs",
+            self.role_name,
+            len(assumed),
+            len(account_ids),
+            time.perf_counter() - started,
+        )
+        return assumed
+
+
+def build_targets(
+    base_session: boto3.Session,
+    regions: list[str],
+    args: argparse.Namespace,
+    session_for_region: Callable[[str], boto3.Session],
+) -> list[Target]:
+    """Expand the org-mode options and regions into scan targets.
+
+    In organization mode every reachable account is paired with every
+    region through an assumed role. Otherwise the caller's own account is
+    used, with ``session_for_region`` supplying the per-region sessions;
+    if the account ID cannot be resolved it is reported as "self".
+    """
+    if args.accounts or args.accounts_file:
+        account_ids = load_account_ids(args.accounts, args.accounts_file)
+        if not account_ids:
+            logger.error("No valid account IDs specified")
+            return []
+        roles = AssumedRoleSessions(base_session, args.role_name, external_id=args.external_id)
+        return [
+            (account_id, region, roles.session(account_id, region))
+            for account_id in roles.assume_all(account_ids, workers=args.workers)
+            for region in regions
+        ]
+
+    try:
+        account_id = get_client(base_session, "sts").get_caller_identity()["Account"]
+    except (ClientError, BotoCoreError) as exc:
+        logger.error("Failed to get account ID: %s", exc)
+        account_id = "self"
+    return [
+        (account_id, region, base_session if region == base_session.region_name else session_for_region(region))
+        for region in regions
+    ]
@@ -8,16 +8,31 @@ Outputs results as formatted tables with optional CSV export.
 
 import argparse
 import csv
+import hashlib
 import io
+import json
 import logging
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any
+from functools import partial
+from typing import IO, Any, Callable, Iterator
 
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 from tabulate import tabulate
 
+from api_stats import add_stats_arguments, instrument, open_stats, report_stats
+from aws_org import AssumedRoleSessions, add_org_arguments, get_client, load_account_ids, resolve_regions
+from cli_args import positive_int
+from daemon_client import DaemonClient, add_daemon_arguments
+from daemon_client import connect as connect_daemon
+from inventory_store import InventoryStore, add_inventory_arguments, describe_resources, open_inventory
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -25,6 +40,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("aws_resource_audit")
 
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "infra-automation")
+BUCKET_REGION_CACHE = "s3_bucket_regions.json"
+AUDIT_SNAPSHOT = "audit_snapshot.json"
+
+_bucket_cache_lock = threading.Lock()
+
 
 def get_session(profile: str | None = None, region: str | None = None) -> boto3.Session:
     """Create a boto3 session with optional profile and region."""
@@ -33,150 +54,422 @@ def get_session(profile: str | None = None, region: str | None = None) -> boto3.
         kwargs["profile_name"] = profile
     if region:
         kwargs["region_name"] = region
-    return boto3.Session(**kwargs)
+    return instrument(boto3.Session(**kwargs))
+
+
+def describe_ec2(
+    session: boto3.Session,
+    resource_type: str,
+    inventory: InventoryStore | None = None,
+    **filters: Any,
+) -> Iterator[dict[str, Any]]:
+    """Describe EC2 resources through the inventory cache when one is enabled."""
+    ec2 = get_client(session, "ec2")
+    account_id = inventory.account_id(get_client(session, "sts")) if inventory else None
+    return describe_resources(ec2, resource_type, inventory, account_id, **filters)
+
+
+# Keys accepted by --filter, besides tag:<Key>.
+FILTER_KEYS = ("state", "instance-type", "az", "engine")
+
+# The --filter keys each section can honour; "tag" stands for any tag:<Key>.
+SECTION_FILTERS: dict[str, set[str]] = {
+    "ec2": {"state", "instance-type", "az", "tag"},
+    "rds": {"state", "instance-type", "az", "engine", "tag"},
+    "s3": set(),
+    "ebs": {"az", "tag"},
+    "eip": {"tag"},
+}
+
+# --filter key -> accepted values (values of one key are ORed, keys are ANDed).
+AuditFilters = dict[str, list[str]]
+
+
+def filter_kind(key: str) -> str:
+    """Return the SECTION_FILTERS key a --filter key belongs to."""
+    return "tag" if key.startswith("tag:") else key
+
+
+def section_supports(section_key: str, filters: AuditFilters) -> bool:
+    """Whether a section can apply every requested filter."""
+    return all(filter_kind(key) in SECTION_FILTERS[section_key] for key in filters)
+
+
+def ec2_filter_kwargs(filters: AuditFilters | None) -> dict[str, Any]:
+    """Translate --filter values into describe_resources keyword filters."""
+    kwargs: dict[str, Any] = {}
+    for key, values in (filters or {}).items():
+        if key.startswith("tag:"):
+            kwargs.setdefault("tags", {})[key[4:]] = values
+        elif key == "instance-type":
+            kwargs["subtype"] = values
+        elif key in ("state", "az"):
+            kwargs[key] = values
+    return kwargs
+
+
+def rds_matches(db: dict[str, Any], filters: AuditFilters) -> bool:
+    """Client-side check for the filters describe_db_instances cannot apply."""
+    tags = {tag["Key"]: tag["Value"] for tag in db.get("TagList", [])}
+    attributes = {
+        "state": db.get("DBInstanceStatus"),
+        "instance-type": db.get("DBInstanceClass"),
+        "az": db.get("AvailabilityZone"),
+        "engine": db.get("Engine"),
+    }
+    for key, values in filters.items():
+        actual = tags.get(key[4:]) if key.startswith("tag:") else attributes.get(key)
+        if actual not in values:
+            return False
+    return True
+
+
+def get_name_tag(resource: dict[str, Any]) -> str:
+    """Return the value of a resource's Name tag, or ''."""
+    for tag in resource.get("Tags", []):
+        if tag["Key"] == "Name":
+            return tag["Value"]
+    return ""
+
 
+def format_time(value: datetime | None) -> str:
+    """Render an optional timestamp the way the tables have always shown it."""
+    return "" if value is None else str(value)
 
-def audit_ec2_instances(session: boto3.Session) -> list[dict[str, str]]:
+
+# Audit rows keep native types (ints, bools, datetimes, None for missing
+# values) and are only turned into strings by render(), at output time.
+# Slotted dataclasses are several times smaller than the dicts of strings
+# they replace, which matters when a large table is held for printing.
+
+
+@dataclass(slots=True)
+class Ec2InstanceRow:
+    instance_id: str
+    name: str
+    instance_type: str
+    state: str
+    private_ip: str | None
+    public_ip: str | None
+    launch_time: datetime | None
+    az: str
+
+    def render(self) -> dict[str, str]:
+        return {
+            "InstanceId": self.instance_id,
+            "Name": self.name,
+            "Type": self.instance_type,
+            "State": self.state,
+            "PrivateIP": self.private_ip or "N/A",
+            "PublicIP": self.public_ip or "N/A",
+            "LaunchTime": format_time(self.launch_time),
+            "AZ": self.az,
+        }
+
+
+@dataclass(slots=True)
+class RdsInstanceRow:
+    db_instance_id: str
+    engine: str
+    engine_version: str
+    instance_class: str
+    status: str
+    multi_az: bool
+    storage_gb: int
+    endpoint: str | None
+
+    def render(self) -> dict[str, str]:
+        return {
+            "DBInstanceId": self.db_instance_id,
+            "Engine": f"{self.engine} {self.engine_version}",
+            "Class": self.instance_class,
+            "Status": self.status,
+            "MultiAZ": str(self.multi_az),
+            "Storage": f"{self.storage_gb} GB",
+            "Endpoint": self.endpoint or "N/A",
+        }
+
+
+@dataclass(slots=True)
+class S3BucketRow:
+    bucket_name: str
+    region: str | None
+    creation_date: datetime | None
+
+    def render(self) -> dict[str, str]:
+        return {
+            "BucketName": self.bucket_name,
+            "Region": self.region or "unknown",
+            "CreationDate": format_time(self.creation_date),
+        }
+
+
+@dataclass(slots=True)
+class EbsVolumeRow:
+    volume_id: str
+    name: str
+    size_gb: int
+    volume_type: str
+    az: str
+    create_time: datetime | None
+
+    def render(self) -> dict[str, str]:
+        return {
+            "VolumeId": self.volume_id,
+            "Name": self.name,
+            "Size": f"{self.size_gb} GB",
+            "Type": self.volume_type,
+            "AZ": self.az,
+            "CreateTime": format_time(self.create_time),
+        }
+
+
+@dataclass(slots=True)
+class ElasticIpRow:
+    allocation_id: str | None
+    public_ip: str | None
+    domain: str | None
+
+    def render(self) -> dict[str, str]:
+        return {
+            "AllocationId": self.allocation_id or "N/A",
+            "PublicIP": self.public_ip or "N/A",
+            "Domain": self.domain or "N/A",
+        }
+
+
+AuditRow = Ec2InstanceRow | RdsInstanceRow | S3BucketRow | EbsVolumeRow | ElasticIpRow
+
+
+def audit_ec2_instances(
+    session: boto3.Session,
+    inventory: InventoryStore | None = None,
+    filters: AuditFilters | None = None,
+    page_size: int | None = None,
+) -> Iterator[Ec2InstanceRow]:
     """List all EC2 instances with key metadata."""
-    ec2 = session.client("ec2")
-    results: list[dict[str, str]] = []
     try:
-        paginator = ec2.get_paginator("describe_instances")
-        for page in paginator.paginate():
-            for reservation in page["Reservations"]:
-                for instance in reservation["Instances"]:
-                    name = ""
-                    for tag in instance.get("Tags", []):
-                        if tag["Key"] == "Name":
-                            name = tag["Value"]
-                            break
-                    results.append({
-                        "InstanceId": instance["InstanceId"],
-                        "Name": name,
-                        "Type": instance["InstanceType"],
-                        "State": instance["State"]["Name"],
-                        "PrivateIP": instance.get("PrivateIpAddress", "N/A"),
-                        "PublicIP": instance.get("PublicIpAddress", "N/A"),
-                        "LaunchTime": str(instance.get("LaunchTime", "")),
-                        "AZ": instance["Placement"]["AvailabilityZone"],
-                    })
+        kwargs = ec2_filter_kwargs(filters)
+        for instance in describe_ec2(session, "instances", inventory, page_size=page_size, **kwargs):
+            yield Ec2InstanceRow(
+                instance_id=instance["InstanceId"],
+                name=get_name_tag(instance),
+                instance_type=instance["InstanceType"],
+                state=instance["State"]["Name"],
+                private_ip=instance.get("PrivateIpAddress"),
+                public_ip=instance.get("PublicIpAddress"),
+                launch_time=instance.get("LaunchTime"),
+                az=instance["Placement"]["AvailabilityZone"],
+            )
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to audit EC2 instances: %s", exc)
-    return results
+        raise
 
 
-def audit_rds_instances(session: boto3.Session) -> list[dict[str, str]]:
-    """List all RDS instances with key metadata."""
-    rds = session.client("rds")
-    results: list[dict[str, str]] = []
+def audit_rds_instances(
+    session: boto3.Session,
+    filters: AuditFilters | None = None,
+    page_size: int | None = None,
+) -> Iterator[RdsInstanceRow]:
+    """List all RDS instances with key metadata.
+
+    The engine filter is applied by the API; the other filters are checked
+    client-side, as describe_db_instances has no native filter for them.
+    """
+    rds = get_client(session, "rds")
+    kwargs: dict[str, Any] = {}
+    if filters and "engine" in filters:
+        kwargs["Filters"] = [{"Name": "engine", "Values": filters["engine"]}]
+    if page_size:
+        kwargs["PaginationConfig"] = {"PageSize": max(20, min(page_size, 100))}
     try:
         paginator = rds.get_paginator("describe_db_instances")
-        for page in paginator.paginate():
+        for page in paginator.paginate(**kwargs):
             for db in page["DBInstances"]:
-                results.append({
-                    "DBInstanceId": db["DBInstanceIdentifier"],
-                    "Engine": f"{db['Engine']} {db.get('EngineVersion', '')}",
-                    "Class": db["DBInstanceClass"],
-                    "Status": db["DBInstanceStatus"],
-                    "MultiAZ": str(db.get("MultiAZ", False)),
-                    "Storage": f"{db.get('AllocatedStorage', 0)} GB",
-                    "Endpoint": db.get("Endpoint", {}).get("Address", "N/A"),
-                })
+                if filters and not rds_matches(db, filters):
+                    continue
+                yield RdsInstanceRow(
+                    db_instance_id=db["DBInstanceIdentifier"],
+                    engine=db["Engine"],
+                    engine_version=db.get("EngineVersion", ""),
+                    instance_class=db["DBInstanceClass"],
+                    status=db["DBInstanceStatus"],
+                    multi_az=db.get("MultiAZ", False),
+                    storage_gb=db.get("AllocatedStorage", 0),
+                    endpoint=db.get("Endpoint", {}).get("Address"),
+                )
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to audit RDS instances: %s", exc)
-    return results
+        raise
 
 
-def audit_s3_buckets(session: boto3.Session) -> list[dict[str, str]]:
-    """List all S3 buckets with creation date and region."""
-    s3 = session.client("s3")
-    results: list[dict[str, str]] = []
+def load_bucket_regions(cache_path: str | None) -> dict[str, str]:
+    """Load the bucket -> region cache, returning {} if it is missing or unreadable."""
+    if not cache_path:
+        return {}
+    try:
+        with open(cache_path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable bucket region cache %s: %s", cache_path, exc)
+        return {}
+
+
+def save_bucket_regions(cache_path: str | None, updates: dict[str, str]) -> None:
+    """Merge newly resolved bucket regions into the on-disk cache.
+
+    The file is re-read under a lock and replaced atomically, so concurrent
+    S3 sections (one per account in org mode) never drop each other's entries.
+    """
+    if not cache_path or not updates:
+        return
+    with _bucket_cache_lock:
+        merged = load_bucket_regions(cache_path)
+        merged.update(updates)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(merged, fh, sort_keys=True)
+            os.replace(tmp_path, cache_path)
+        except OSError as exc:
+            logger.warning("Failed to write bucket region cache %s: %s", cache_path, exc)
+
+
+def get_bucket_region(s3: Any, bucket_name: str) -> str | None:
+    """Resolve a bucket's region, or None if the lookup fails."""
+    try:
+        location = s3.get_bucket_location(Bucket=bucket_name)
+    except (ClientError, BotoCoreError) as exc:
+        logger.debug("Failed to get location of bucket %s: %s", bucket_name, exc)
+        return None
+    constraint = location.get("LocationConstraint") or "us-east-1"
+    # Buckets created with the legacy "EU" constraint live in eu-west-1.
+    return "eu-west-1" if constraint == "EU" else constraint
+
+
+def audit_s3_buckets(
+    session: boto3.Session,
+    max_workers: int = 16,
+    cache_path: str | None = None,
+) -> Iterator[S3BucketRow]:
+    """List all S3 buckets with creation date and region.
+
+    Bucket regions never change, so resolved regions are kept in a JSON cache
+    at ``cache_path`` and only buckets not seen before are looked up, up to
+    ``max_workers`` at a time.
+    """
+    s3 = get_client(session, "s3")
     try:
         response = s3.list_buckets()
-        for bucket in response.get("Buckets", []):
-            bucket_name = bucket["Name"]
-            try:
-                location = s3.get_bucket_location(Bucket=bucket_name)
-                region = location.get("LocationConstraint") or "us-east-1"
-            except (ClientError, BotoCoreError):
-                region = "unknown"
-
-            results.append({
-                "BucketName": bucket_name,
-                "Region": region,
-                "CreationDate": str(bucket.get("CreationDate", "")),
-            })
+        buckets = response.get("Buckets", [])
+        regions = load_bucket_regions(cache_path)
+        missing = [bucket["Name"] for bucket in buckets if bucket["Name"] not in regions]
+        logger.debug(
+            "S3 bucket regions: %d cached, %d to look up",
+            len(buckets) - len(missing),
+            len(missing),
+        )
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as pool:
+                resolved = dict(zip(missing, pool.map(partial(get_bucket_region, s3), missing)))
+            found = {name: region for name, region in resolved.items() if region}
+            save_bucket_regions(cache_path, found)
+            regions.update(found)
+
+        for bucket in buckets:
+            yield S3BucketRow(
+                bucket_name=bucket["Name"],
+                region=regions.get(bucket["Name"]),
+                creation_date=bucket.get("CreationDate"),
+            )
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to audit S3 buckets: %s", exc)
-    return results
+        raise
 
 
-def audit_unused_ebs_volumes(session: boto3.Session) -> list[dict[str, str]]:
+def audit_unused_ebs_volumes(
+    session: boto3.Session,
+    inventory: InventoryStore | None = None,
+    filters: AuditFilters | None = None,
+    page_size: int | None = None,
+) -> Iterator[EbsVolumeRow]:
     """Find EBS volumes that are not attached to any instance."""
-    ec2 = session.client("ec2")
-    results: list[dict[str, str]] = []
+    kwargs = {**ec2_filter_kwargs(filters), "state": "available"}
     try:
-        paginator = ec2.get_paginator("describe_volumes")
-        for page in paginator.paginate(Filters=[{"Name": "status", "Values": ["available"]}]):
-            for volume in page["Volumes"]:
-                name = ""
-                for tag in volume.get("Tags", []):
-                    if tag["Key"] == "Name":
-                        name = tag["Value"]
-                        break
-                results.append({
-                    "VolumeId": volume["VolumeId"],
-                    "Name": name,
-                    "Size": f"{volume['Size']} GB",
-                    "Type": volume["VolumeType"],
-                    "AZ": volume["AvailabilityZone"],
-                    "CreateTime": str(volume.get("CreateTime", "")),
-                })
+        for volume in describe_ec2(session, "volumes", inventory, page_size=page_size, **kwargs):
+            yield EbsVolumeRow(
+                volume_id=volume["VolumeId"],
+                name=get_name_tag(volume),
+                size_gb=volume["Size"],
+                volume_type=volume["VolumeType"],
+                az=volume["AvailabilityZone"],
+                create_time=volume.get("CreateTime"),
+            )
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to audit EBS volumes: %s", exc)
-    return results
+        raise
 
 
-def audit_unattached_eips(session: boto3.Session) -> list[dict[str, str]]:
+def audit_unattached_eips(
+    session: boto3.Session,
+    inventory: InventoryStore | None = None,
+    filters: AuditFilters | None = None,
+) -> Iterator[ElasticIpRow]:
     """Find Elastic IPs that are not associated with any resource."""
-    ec2 = session.client("ec2")
-    results: list[dict[str, str]] = []
+    kwargs = {**ec2_filter_kwargs(filters), "state": "unassociated"}
     try:
-        response = ec2.describe_addresses()
-        for addr in response.get("Addresses", []):
-            if not addr.get("AssociationId"):
-                results.append({
-                    "AllocationId": addr.get("AllocationId", "N/A"),
-                    "PublicIP": addr.get("PublicIp", "N/A"),
-                    "Domain": addr.get("Domain", "N/A"),
-                })
+        for addr in describe_ec2(session, "addresses", inventory, **kwargs):
+            yield ElasticIpRow(
+                allocation_id=addr.get("AllocationId"),
+                public_ip=addr.get("PublicIp"),
+                domain=addr.get("Domain"),
+            )
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to audit Elastic IPs: %s", exc)
-    return results
+        raise
 
 
-def print_section(title: str, data: list[dict[str, str]], output_csv: str | None = None) -> None:
+def print_section(
+    title: str,
+    data: list[dict[str, str]],
+    output_csv: str | None = None,
+    elapsed: float | None = None,
+    csv_append: bool = True,
+) -> None:
     """Print a section header and data table, optionally write to CSV."""
     print(f"\n{'=' * 60}")
     print(f"  {title}")
     print(f"{'=' * 60}")
     if not data:
         print("  No resources found.")
+        if elapsed is not None:
+            print(f"  Elapsed: {elapsed:.2f}s")
         return
 
-    print(tabulate(data, headers="keys", tablefmt="grid"))
+    print(tabulate(data, headers="keys", tablefmt="grid", disable_numparse=True))
     print(f"  Total: {len(data)}")
+    if elapsed is not None:
+        print(f"  Elapsed: {elapsed:.2f}s")
 
     if output_csv:
-        write_csv(data, output_csv, title)
+        write_csv(data, output_csv, title, append=csv_append)
+
 
+def write_csv(data: list[dict[str, str]], filepath: str, section: str, append: bool = True) -> None:
+    """Write a section to a combined CSV file.
 
-def write_csv(data: list[dict[str, str]], filepath: str, section: str) -> None:
-    """Append data to a CSV file."""
-    mode = "a" if section != "EC2 Instances" else "w"
+    The first section of a run truncates the file; later sections are
+    appended below a '# <section>' marker line.
+    """
+    mode = "a" if append else "w"
     try:
         with open(filepath, mode, newline="", encoding="utf-8") as fh:
-            if mode == "a":
+            if append:
                 fh.write(f"\n# {section}\n")
             writer = csv.DictWriter(fh, fieldnames=data[0].keys())
             writer.writeheader()
@@ -186,6 +479,473 @@ def write_csv(data: list[dict[str, str]], filepath: str, section: str) -> None:
         logger.error("Failed to write CSV file %s: %s", filepath, exc)
 
 
+class CsvSectionWriter:
+    """Stream rows into one CSV file per section as they are produced.
+
+    Files are opened on a section's first row, with the header taken from
+    that row. Writes are serialized, so concurrent targets of the same
+    section can share a file.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.paths: dict[str, str] = {}
+        self._files: dict[str, tuple[IO[str], csv.DictWriter]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, section_key: str, row: dict[str, str]) -> None:
+        with self._lock:
+            if section_key not in self._files:
+                path = os.path.join(self.directory, f"{section_key}.csv")
+                fh = open(path, "w", newline="", encoding="utf-8")
+                writer = csv.DictWriter(fh, fieldnames=list(row.keys()), extrasaction="ignore")
+                writer.writeheader()
+                self._files[section_key] = (fh, writer)
+                self.paths[section_key] = path
+            self._files[section_key][1].writerow(row)
+
+    def close(self) -> None:
+        with self._lock:
+            for fh, _ in self._files.values():
+                fh.close()
+            self._files.clear()
+
+
+class NdjsonWriter:
+    """Stream rows as newline-delimited JSON, one object per resource.
+
+    Each object carries a "Section" key so one file can hold every section.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fh: IO[str] = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, section_key: str, row: dict[str, str]) -> None:
+        line = json.dumps({"Section": section_key, **row}, default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is sys.stdout:
+                self._fh.flush()
+            else:
+                self._fh.close()
+
+
+RowWriter = CsvSectionWriter | NdjsonWriter
+
+AuditSections = dict[str, tuple[str, Callable[[boto3.Session], Iterator[AuditRow]]]]
+
+AUDIT_SECTIONS: AuditSections = {
+    "ec2": ("EC2 Instances", audit_ec2_instances),
+    "rds": ("RDS Instances", audit_rds_instances),
+    "s3": ("S3 Buckets", audit_s3_buckets),
+    "ebs": ("Unused EBS Volumes", audit_unused_ebs_volumes),
+    "eip": ("Unattached Elastic IPs", audit_unattached_eips),
+}
+
+# Sections whose API is account-wide rather than regional.
+GLOBAL_SECTIONS = {"s3"}
+
+
+@dataclass
+class SectionRun:
+    """Outcome of one audit section against one target.
+
+    ``rows`` is only populated when rows are collected for table output;
+    when streaming, rows go straight to the writer and only ``count`` is kept.
+    ``changes`` runs parallel to ``rows`` in --since-last mode.
+    ``rendered_rows`` holds rows that arrive already rendered: resources
+    that are gone in --since-last mode, or a report served by the daemon.
+    """
+
+    section_key: str
+    scope: dict[str, str]
+    title: str
+    count: int = 0
+    elapsed: float = 0.0
+    failed: bool = False
+    rows: list[AuditRow] = field(default_factory=list)
+    changes: list[str] = field(default_factory=list)
+    rendered_rows: list[dict[str, str]] = field(default_factory=list)
+
+    def rendered(self) -> Iterator[dict[str, str]]:
+        """Yield the collected rows as tagged string dicts for output."""
+        tags = scope_columns(self.section_key, self.scope)
+        for index, row in enumerate(self.rows):
+            rendered = row.render()
+            if self.changes:
+                rendered = {"Change": self.changes[index], **rendered}
+            yield {**tags, **rendered} if tags else rendered
+        yield from self.rendered_rows
+
+
+# Field that identifies a resource within each section, used for delta runs.
+SECTION_ID_FIELDS: dict[str, str] = {
+    "ec2": "InstanceId",
+    "rds": "DBInstanceId",
+    "s3": "BucketName",
+    "ebs": "VolumeId",
+    "eip": "AllocationId",
+}
+
+
+def row_fingerprint(row: dict[str, str]) -> str:
+    """Return a short, stable hash of a row's attributes."""
+    payload = json.dumps(row, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+class DeltaTracker:
+    """Compare this run's rows against the fingerprints saved by the last run.
+
+    The snapshot is a nested mapping of section -> target -> resource ID ->
+    fingerprint, so every comparison is a dict lookup. Targets whose section
+    failed keep their previous fingerprints and report no removals, so an
+    API error is never mistaken for resources disappearing. ``context``
+    holds the account and region of a run whose rows do not carry them,
+    so runs against different accounts or regions never share targets.
+    """
+
+    def __init__(self, path: str, context: dict[str, str] | None = None) -> None:
+        self.path = path
+        self.context = context or {}
+        self.previous: dict[str, dict[str, dict[str, str]]] = {}
+        self.taken_at: str | None = None
+        self._current: dict[tuple[str, str], dict[str, str]] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            self.previous = data.get("sections", {})
+            self.taken_at = data.get("taken_at")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable audit snapshot %s: %s", path, exc)
+
+    def target_key(self, section_key: str, tags: dict[str, str]) -> str:
+        return "/".join(scope_columns(section_key, {**self.context, **tags}).values())
+
+    def observe(self, section_key: str, tags: dict[str, str], row: dict[str, str]) -> str | None:
+        """Record a row; return 'added' or 'changed', or None if unchanged."""
+        target = self.target_key(section_key, tags)
+        resource_id = str(row.get(SECTION_ID_FIELDS[section_key], ""))
+        fingerprint = row_fingerprint(row)
+        with self._lock:
+            self._current.setdefault((section_key, target), {})[resource_id] = fingerprint
+        before = self.previous.get(section_key, {}).get(target, {}).get(resource_id)
+        if before is None:
+            return "added"
+        return "changed" if before != fingerprint else None
+
+    def commit(self, runs: list[SectionRun]) -> dict[str, list[dict[str, str]]]:
+        """Fold this run into the snapshot and return removed rows per section."""
+        removed: dict[str, list[dict[str, str]]] = {}
+        snapshot = {section: dict(targets) for section, targets in self.previous.items()}
+        for run in runs:
+            if run.failed:
+                continue
+            tags = scope_columns(run.section_key, run.scope)
+            target = self.target_key(run.section_key, tags)
+            current = self._current.get((run.section_key, target), {})
+            before = self.previous.get(run.section_key, {}).get(target, {})
+            id_field = SECTION_ID_FIELDS[run.section_key]
+            removed.setdefault(run.section_key, []).extend(
+                {"Change": "removed", **tags, id_field: resource_id}
+                for resource_id in before.keys() - current.keys()
+            )
+            snapshot.setdefault(run.section_key, {})[target] = current
+        self.previous = snapshot
+        return removed
+
+    def save(self) -> None:
+        """Write the snapshot atomically."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(
+                    {"taken_at": datetime.now(timezone.utc).isoformat(), "sections": self.previous},
+                    fh,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logger.warning("Failed to write audit snapshot %s: %s", self.path, exc)
+
+
+def snapshot_context(session: boto3.Session, args: argparse.Namespace) -> dict[str, str]:
+    """Account and region of a --since-last snapshot that the rows' scope columns leave out."""
+    context: dict[str, str] = {}
+    if not (args.accounts or args.accounts_file):
+        try:
+            context["AccountId"] = get_client(session, "sts").get_caller_identity()["Account"]
+        except (ClientError, BotoCoreError) as exc:
+            logger.warning("Failed to identify the account, keying the audit snapshot by profile: %s", exc)
+            context["Profile"] = args.profile or "default"
+    if not args.regions:
+        context["Region"] = args.region
+    return context
+
+
+def scope_columns(section_key: str, scope: dict[str, str]) -> dict[str, str]:
+    """Return the scope columns to tag a section's rows with."""
+    if section_key in GLOBAL_SECTIONS:
+        return {key: value for key, value in scope.items() if key != "Region"}
+    return scope
+
+
+def run_section(
+    session: boto3.Session,
+    section_key: str,
+    scope: dict[str, str] | None = None,
+    audit_sections: AuditSections | None = None,
+    writer: RowWriter | None = None,
+    delta: DeltaTracker | None = None,
+    emit_unchanged: bool = True,
+) -> SectionRun:
+    """Run a single audit section against one target and time it.
+
+    Rows are either collected as typed records or, when a writer is given,
+    rendered, tagged with the target's scope columns and streamed to it as
+    each page arrives. With a
+    delta tracker every row is fingerprinted, and unless ``emit_unchanged``
+    is set only added or changed rows are kept, with a Change column. Errors
+    are logged and mark the run as failed, so one failing region or account
+    never aborts the rest of the audit.
+    """
+    scope = scope or {}
+    title, func = (audit_sections or AUDIT_SECTIONS)[section_key]
+    label = f" ({', '.join(scope.values())})" if scope else ""
+    tags = scope_columns(section_key, scope)
+    run = SectionRun(section_key, scope, title)
+
+    logger.info("Auditing %s%s...", title, label)
+    started = time.perf_counter()
+    try:
+        for row in func(session):
+            rendered = None
+            change = None
+            if delta is not None:
+                rendered = row.render()
+                change = delta.observe(section_key, tags, rendered)
+                if emit_unchanged:
+                    change = None
+                elif change is None:
+                    continue
+            if writer is None:
+                run.rows.append(row)
+                if change is not None:
+                    run.changes.append(change)
+            else:
+                rendered = rendered or row.render()
+                if change is not None:
+                    rendered = {"Change": change, **rendered}
+                writer.write(section_key, {**tags, **rendered} if tags else rendered)
+            run.count += 1
+    except (ClientError, BotoCoreError):
+        run.failed = True
+    except Exception as exc:
+        logger.error("Error auditing %s%s: %s", title, label, exc)
+        run.failed = True
+    run.elapsed = time.perf_counter() - started
+    logger.debug("%s%s finished in %.2fs (%d rows)", title, label, run.elapsed, run.count)
+    return run
+
+
+def run_audit(
+    targets: list[tuple[dict[str, str], boto3.Session]],
+    sections: list[str],
+    workers: int = 1,
+    audit_sections: AuditSections | None = None,
+    writer: RowWriter | None = None,
+    delta: DeltaTracker | None = None,
+    emit_unchanged: bool = True,
+) -> list[SectionRun]:
+    """Run every section against every target on one bounded worker pool.
+
+    Each target is a (scope, session) pair where scope holds the columns that
+    identify it in the merged report, e.g. {"Region": "eu-west-1"}. Global
+    sections (S3) run once per account, against its first target. Runs come
+    back in section-then-target order no matter which task finishes first,
+    so the report layout is stable.
+    """
+    tasks: list[tuple[str, dict[str, str], boto3.Session]] = []
+    for section_key in sections:
+        seen_accounts: set[str | None] = set()
+        for scope, session in targets:
+            if section_key in GLOBAL_SECTIONS:
+                if scope.get("AccountId") in seen_accounts:
+                    continue
+                seen_accounts.add(scope.get("AccountId"))
+            tasks.append((section_key, scope, session))
+
+    def _run(task: tuple[str, dict[str, str], boto3.Session]) -> SectionRun:
+        section_key, scope, session = task
+        return run_section(
+            session,
+            section_key,
+            scope,
+            audit_sections=audit_sections,
+            writer=writer,
+            delta=delta,
+            emit_unchanged=emit_unchanged,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks) or 1))) as pool:
+        return list(pool.map(_run, tasks))
+
+
+def merge_runs(runs: list[SectionRun]) -> list[tuple[str, list[dict[str, str]], float]]:
+    """Merge per-target runs into one (title, rows, elapsed) table per section.
+
+    A section's elapsed time is its slowest target.
+    """
+    merged: dict[str, tuple[str, list[dict[str, str]], float]] = {}
+    for run in runs:
+        title, rows, slowest = merged.setdefault(run.section_key, (run.title, [], 0.0))
+        rows.extend(run.rendered())
+        merged[run.section_key] = (title, rows, max(slowest, run.elapsed))
+    return list(merged.values())
+
+
+def print_timings(runs: list[SectionRun], wall_time: float, file: IO[str] | None = None) -> None:
+    """Print per-section (and per-target) row counts and durations."""
+    out = file or sys.stdout
+    rows = [
+        {
+            "Section": run.title,
+            **run.scope,
+            **({"Region": "global"} if run.section_key in GLOBAL_SECTIONS and "Region" in run.scope else {}),
+            "Rows": run.count,
+            "Seconds": f"{run.elapsed:.2f}",
+        }
+        for run in runs
+    ]
+    print(f"\n{'=' * 60}", file=out)
+    print("  Section Timings", file=out)
+    print(f"{'=' * 60}", file=out)
+    print(tabulate(rows, headers="keys", tablefmt="grid"), file=out)
+    print(f"  Wall time: {wall_time:.2f}s (sum of sections: {sum(run.elapsed for run in runs):.2f}s)", file=out)
+
+
+def print_report(runs: list[SectionRun], csv_output: str | None, wall_time: float) -> None:
+    """Print every section's merged table, then the timings."""
+    csv_append = False
+    for title, data, elapsed in merge_runs(runs):
+        print_section(title, data, csv_output, elapsed=elapsed, csv_append=csv_append)
+        csv_append = csv_append or bool(data)
+    print_timings(runs, wall_time)
+
+
+def open_writer(args: argparse.Namespace) -> RowWriter | None:
+    """Open the streaming writer for --format csv/ndjson, or None for tables."""
+    if args.output_format == "csv":
+        return CsvSectionWriter(args.output)
+    if args.output_format == "ndjson":
+        return NdjsonWriter(args.output)
+    return None
+
+
+def audit_via_daemon(
+    client: DaemonClient,
+    args: argparse.Namespace,
+    sections: list[str],
+    filters: AuditFilters,
+) -> bool:
+    """Output the report served by the inventory daemon.
+
+    Returns False, having printed nothing, if the daemon could not answer,
+    so the caller can fall back to auditing directly.
+    """
+    params = {
+        "sections": ",".join(sections),
+        "filter": [f"{key}={','.join(values)}" for key, values in filters.items()],
+    }
+    try:
+        report = client.get("/audit", params)
+    except (OSError, ValueError) as exc:
+        logger.warning("Inventory daemon request failed, auditing directly: %s", exc)
+        return False
+    logger.info("Report served by the inventory daemon (generated %s)", report["generated_at"])
+    runs = [
+        SectionRun(
+            run["section_key"],
+            run["scope"],
+            run["title"],
+            count=run["count"],
+            elapsed=run["elapsed"],
+            failed=run["failed"],
+            rendered_rows=run["rows"],
+        )
+        for run in report["runs"]
+    ]
+
+    writer = open_writer(args)
+    if writer is None:
+        print_report(runs, args.csv_output, report["wall_time"])
+        return True
+    try:
+        for run in runs:
+            for row in run.rendered_rows:
+                writer.write(run.section_key, row)
+    finally:
+        writer.close()
+    print_timings(runs, report["wall_time"], file=sys.stderr if args.output == "-" else sys.stdout)
+    return True
+
+
+def build_audit_sections(
+    args: argparse.Namespace,
+    inventory: InventoryStore | None = None,
+    filters: AuditFilters | None = None,
+) -> AuditSections:
+    """Bind the inventory, filters and lookup options to each section."""
+    audit_sections = dict(AUDIT_SECTIONS)
+    for key in ("ec2", "ebs"):
+        title, func = AUDIT_SECTIONS[key]
+        audit_sections[key] = (title, partial(func, inventory=inventory, filters=filters, page_size=args.page_size))
+    audit_sections["eip"] = (
+        AUDIT_SECTIONS["eip"][0],
+        partial(audit_unattached_eips, inventory=inventory, filters=filters),
+    )
+    audit_sections["rds"] = (
+        AUDIT_SECTIONS["rds"][0],
+        partial(audit_rds_instances, filters=filters, page_size=args.page_size),
+    )
+    audit_sections["s3"] = (
+        AUDIT_SECTIONS["s3"][0],
+        partial(
+            audit_s3_buckets,
+            max_workers=args.s3_lookup_workers,
+            cache_path=None if args.no_cache else os.path.join(args.cache_dir, BUCKET_REGION_CACHE),
+        ),
+    )
+    return audit_sections
+
+
+def filter_arg(value: str) -> tuple[str, list[str]]:
+    """argparse type for --filter KEY=VALUE[,VALUE...]."""
+    key, sep, raw = value.partition("=")
+    key = key.strip()
+    values = [item.strip() for item in raw.split(",") if item.strip()]
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {value!r}")
+    if key.startswith("tag:") and len(key) > 4:
+        return key, values
+    key = key.lower()
+    if key not in FILTER_KEYS:
+        raise argparse.ArgumentTypeError(
+            f"unknown filter {key!r} (choose from {', '.join(FILTER_KEYS)}, tag:<Key>)"
+        )
+    return key, values
+
+
 def build_parser() -> argparse.ArgumentParser:
     """Build the CLI argument parser."""
     parser = argparse.ArgumentParser(
@@ -196,6 +956,18 @@ Examples:
   %(prog)s --region us-east-1
   %(prog)s --profile production --csv report.csv
   %(prog)s --sections ec2 s3 ebs
+  %(prog)s --workers 5
+  %(prog)s --regions all --workers 20 --csv all-regions.csv
+  %(prog)s --regions us-east-1,eu-west-1 --sections ec2 ebs
+  %(prog)s --sections s3 --s3-lookup-workers 64
+  %(prog)s --filter tag:Team=payments --filter state=running,stopped
+  %(prog)s --sections rds --filter engine=postgres --page-size 100
+  %(prog)s --regions all --workers 20 --format csv --output reports/
+  %(prog)s --format ndjson --output - | jq .
+  %(prog)s --since-last --format ndjson --output changes.ndjson
+  %(prog)s --accounts-file accounts.txt --role-name AuditRole --regions all --workers 50
+  %(prog)s --regions all --workers 20 --stats --trace audit-trace.json
+  %(prog)s --no-daemon --sections ec2
         """,
     )
     parser.add_argument(
@@ -207,11 +979,31 @@ Examples:
         default="us-east-1",
         help="AWS region (default: us-east-1)",
     )
+    parser.add_argument(
+        "--regions",
+        metavar="all|R1,R2,...",
+        help="Audit several regions and merge the results with a Region column "
+             "('all' discovers the regions enabled for the account)",
+    )
     parser.add_argument(
         "--csv",
         dest="csv_output",
         metavar="FILE",
-        help="Export results to CSV file",
+        help="Export results to a single combined CSV file (table format only)",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=["table", "csv", "ndjson"],
+        default="table",
+        help="table prints grids; csv/ndjson stream rows to --output as pages "
+             "arrive, without holding sections in memory (default: table)",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        help="Streaming destination: a directory for csv (one file per section) "
+             "or a file for ndjson ('-' for stdout)",
     )
     parser.add_argument(
         "--sections",
@@ -220,6 +1012,61 @@ Examples:
         default=["ec2", "rds", "s3", "ebs", "eip"],
         help="Sections to audit (default: all)",
     )
+    parser.add_argument(
+        "--filter",
+        dest="filters",
+        action="append",
+        type=filter_arg,
+        metavar="KEY=VALUE[,VALUE]",
+        help="Only audit matching resources; repeatable. Keys: state, instance-type, "
+             "az, engine, tag:<Key>. Sections that cannot apply a filter are skipped",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=positive_int,
+        metavar="N",
+        help="Resources per describe call (clamped to each API's limits)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        metavar="N",
+        help="Run up to N sections concurrently (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--s3-lookup-workers",
+        type=positive_int,
+        default=16,
+        metavar="N",
+        help="Concurrent S3 bucket location lookups (default: 16)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        metavar="DIR",
+        help=f"Directory for persistent lookup caches (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write persistent lookup caches",
+    )
+    parser.add_argument(
+        "--since-last",
+        action="store_true",
+        help="Only report resources added, changed or removed since the last saved snapshot",
+    )
+    parser.add_argument(
+        "--state-file",
+        metavar="FILE",
+        help="Snapshot used by --since-last (default: <cache-dir>/audit_snapshot.json); "
+             "use one per profile/account set",
+    )
+    add_inventory_arguments(parser)
+    add_org_arguments(parser)
+    add_stats_arguments(parser)
+    add_daemon_arguments(parser)
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
@@ -233,30 +1080,129 @@ def main() -> int:
     parser = build_parser()
     args = parser.parse_args()
 
+    if args.output_format != "table" and not args.output:
+        parser.error(f"--format {args.output_format} requires --output")
+    if args.since_last and args.no_cache and not args.state_file:
+        parser.error("--since-last needs a snapshot; drop --no-cache or pass --state-file")
+
+    filters: AuditFilters = {}
+    for key, values in args.filters or []:
+        filters.setdefault(key, []).extend(values)
+    if filters and args.since_last:
+        parser.error("--since-last compares whole inventories and cannot be combined with --filter")
+    sections = [key for key in args.sections if section_supports(key, filters)]
+    if not sections:
+        parser.error("none of the selected sections support the given --filter keys")
+    for key in args.sections:
+        if key not in sections:
+            logger.warning("Skipping %s: it cannot apply the given filters", AUDIT_SECTIONS[key][0])
+
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    logger.info("Starting AWS resource audit (region=%s)", args.region)
+    # The daemon cannot keep this caller's --since-last snapshot, honour
+    # --refresh, --no-inventory, --page-size or --no-cache with its own
+    # inventory and caches, or attribute API calls to this run, so those
+    # run locally.
+    local_only = (
+        args.since_last or args.refresh or args.no_inventory or args.page_size is not None or args.no_cache
+        or args.stats or args.stats_json or args.trace
+    )
+    if not local_only:
+        client = connect_daemon(args)
+        if client is not None and audit_via_daemon(client, args, sections, filters):
+            return 0
+
+    stats = open_stats(args)
     session = get_session(profile=args.profile, region=args.region)
+    regions = [args.region]
+    if args.regions:
+        try:
+            regions = resolve_regions(session, args.regions)
+        except (ClientError, BotoCoreError) as exc:
+            logger.error("Failed to discover regions, falling back to %s: %s", args.region, exc)
 
-    audit_functions = {
-        "ec2": ("EC2 Instances", audit_ec2_instances),
-        "rds": ("RDS Instances", audit_rds_instances),
-        "s3": ("S3 Buckets", audit_s3_buckets),
-        "ebs": ("Unused EBS Volumes", audit_unused_ebs_volumes),
-        "eip": ("Unattached Elastic IPs", audit_unattached_eips),
-    }
+    targets: list[tuple[dict[str, str], boto3.Session]] = [({}, session)]
+    if args.accounts or args.accounts_file:
+        account_ids = load_account_ids(args.accounts, args.accounts_file)
+        if not account_ids:
+            logger.error("No valid account IDs specified")
+            return 1
+        roles = AssumedRoleSessions(session, args.role_name, external_id=args.external_id)
+        targets = [
+            ({"AccountId": account_id, **({"Region": region} if args.regions else {})},
+             roles.session(account_id, region))
+            for account_id in roles.assume_all(account_ids, workers=args.workers)
+            for region in regions
+        ]
+    elif args.regions:
+        targets = [
+            ({"Region": region}, get_session(profile=args.profile, region=region))
+            for region in regions
+        ]
 
-    for section_key in args.sections:
-        title, func = audit_functions[section_key]
-        logger.info("Auditing %s...", title)
-        try:
-            data = func(session)
-            print_section(title, data, args.csv_output)
-        except Exception as exc:
-            logger.error("Error auditing %s: %s", title, exc)
+    logger.info(
+        "Starting AWS resource audit (targets=%d, regions=%s, workers=%d)",
+        len(targets),
+        ",".join(regions),
+        args.workers,
+    )
+
+    inventory = open_inventory(args)
+    audit_sections = build_audit_sections(args, inventory, filters)
+
+    writer = open_writer(args)
+
+    # A filtered run only sees part of the inventory, so it must not
+    # overwrite the snapshot that --since-last compares against.
+    delta: DeltaTracker | None = None
+    if not filters and (args.state_file or not args.no_cache):
+        delta = DeltaTracker(
+            args.state_file or os.path.join(args.cache_dir, AUDIT_SNAPSHOT),
+            snapshot_context(session, args),
+        )
+        if args.since_last:
+            logger.info("Reporting changes since snapshot taken at %s", delta.taken_at or "never")
+
+    started = time.perf_counter()
+    try:
+        runs = run_audit(
+            targets,
+            sections,
+            workers=args.workers,
+            audit_sections=audit_sections,
+            writer=writer,
+            delta=delta,
+            emit_unchanged=not args.since_last,
+        )
+        removed = delta.commit(runs) if delta is not None else {}
+        if args.since_last and writer is not None:
+            for section_key, rows in removed.items():
+                for row in rows:
+                    writer.write(section_key, row)
+    finally:
+        if writer is not None:
+            writer.close()
+    wall_time = time.perf_counter() - started
+    if delta is not None:
+        delta.save()
+
+    if writer is None:
+        for run in runs:
+            if args.since_last and run.section_key in removed:
+                run.rendered_rows = removed.pop(run.section_key)
+        print_report(runs, args.csv_output, wall_time)
+    else:
+        if isinstance(writer, CsvSectionWriter):
+            for section_key, path in writer.paths.items():
+                logger.info("Streamed %s to %s", section_key, path)
+        # Keep stdout clean when NDJSON is being streamed to it.
+        print_timings(runs, wall_time, file=sys.stderr if args.output == "-" else sys.stdout)
 
-    logger.info("Audit complete.")
+    if inventory is not None:
+        inventory.close()
+    report_stats(stats, args)
+    logger.info("Audit complete in %.2fs.", wall_time)
     return 0
 
 
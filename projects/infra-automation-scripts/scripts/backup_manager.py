@@ -16,6 +16,16 @@ from typing import Any
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
+from api_stats import add_stats_arguments, instrument, open_stats, report_stats
+from inventory_store import (
+    InventoryStore,
+    add_inventory_arguments,
+    describe_resources,
+    fetch_resources,
+    open_inventory,
+)
+from snapshot_index import SnapshotIndex, add_snapshot_index_arguments, open_snapshot_index
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -31,7 +41,7 @@ def get_session(profile: str | None = None, region: str | None = None) -> boto3.
         kwargs["profile_name"] = profile
     if region:
         kwargs["region_name"] = region
-    return boto3.Session(**kwargs)
+    return instrument(boto3.Session(**kwargs))
 
 
 def get_volume_name(ec2_client: Any, volume_id: str) -> str:
@@ -46,40 +56,78 @@ def get_volume_name(ec2_client: Any, volume_id: str) -> str:
     return ""
 
 
+def get_volume_names(
+    ec2_client: Any,
+    volume_ids: list[str],
+    inventory: InventoryStore | None = None,
+    account_id: str | None = None,
+) -> dict[str, str]:
+    """Get the Name tags of several EBS volumes with one lookup.
+
+    Names are only used to label snapshots, so they may come from the
+    inventory cache. Volumes the batched lookup cannot resolve fall back to
+    get_volume_name.
+    """
+    names: dict[str, str] = {}
+    try:
+        for vol in describe_resources(ec2_client, "volumes", inventory, account_id, resource_ids=volume_ids):
+            names[vol["VolumeId"]] = next(
+                (tag["Value"] for tag in vol.get("Tags", []) if tag["Key"] == "Name"), ""
+            )
+    except (ClientError, BotoCoreError) as exc:
+        logger.debug("Batched volume lookup failed, falling back to per-volume: %s", exc)
+    for vol_id in volume_ids:
+        if vol_id not in names:
+            names[vol_id] = get_volume_name(ec2_client, vol_id)
+    return names
+
+
 def create_snapshots(
     session: boto3.Session,
     volume_ids: list[str] | None = None,
     tag_filters: dict[str, str] | None = None,
     description_prefix: str = "Automated backup",
     extra_tags: dict[str, str] | None = None,
+    inventory: InventoryStore | None = None,
+    snapshot_index: SnapshotIndex | None = None,
 ) -> list[str]:
     """Create EBS snapshots for specified volumes or volumes matching tag filters.
 
+    Volumes matching tag filters are always listed live from EC2, so a
+    volume tagged since the inventory was cached is not skipped. Created
+    snapshots are added to the snapshot index straight away.
     Returns list of created snapshot IDs.
     """
     ec2 = session.client("ec2")
+    sts = session.client("sts")
+    account_id = None
+    if inventory is not None:
+        account_id = inventory.account_id(sts)
+    elif snapshot_index is not None:
+        account_id = sts.get_caller_identity()["Account"]
     snapshot_ids: list[str] = []
+    created: list[dict[str, Any]] = []
     now = datetime.now(timezone.utc)
     timestamp = now.strftime("%Y-%m-%d_%H%M%S")
 
-    volumes_to_snapshot: list[str] = []
+    volume_names: dict[str, str] = {}
 
     if volume_ids:
-        volumes_to_snapshot = volume_ids
+        volume_names = get_volume_names(ec2, volume_ids, inventory, account_id)
     elif tag_filters:
-        filters = [{"Name": f"tag:{k}", "Values": [v]} for k, v in tag_filters.items()]
-        paginator = ec2.get_paginator("describe_volumes")
-        for page in paginator.paginate(Filters=filters):
-            for vol in page["Volumes"]:
-                volumes_to_snapshot.append(vol["VolumeId"])
+        for vol in fetch_resources(ec2, "volumes", tags=tag_filters):
+            volume_names[vol["VolumeId"]] = next(
+                (tag["Value"] for tag in vol.get("Tags", []) if tag["Key"] == "Name"), ""
+            )
     else:
         logger.warning("No volume IDs or tag filters specified. Nothing to snapshot.")
         return snapshot_ids
 
+    volumes_to_snapshot = volume_ids or list(volume_names)
     logger.info("Creating snapshots for %d volumes", len(volumes_to_snapshot))
 
     for vol_id in volumes_to_snapshot:
-        vol_name = get_volume_name(ec2, vol_id)
+        vol_name = volume_names.get(vol_id, "")
         description = f"{description_prefix} - {vol_name or vol_id} - {timestamp}"
 
         tags = [
@@ -102,10 +150,15 @@ def create_snapshots(
             )
             snap_id = response["SnapshotId"]
             snapshot_ids.append(snap_id)
+            created.append(response)
             logger.info("Created snapshot %s for volume %s (%s)", snap_id, vol_id, vol_name)
         except (ClientError, BotoCoreError) as exc:
             logger.error("Failed to create snapshot for %s: %s", vol_id, exc)
 
+    if inventory is not None and account_id and snapshot_ids:
+        inventory.invalidate(inventory.scope(account_id, ec2.meta.region_name), "snapshots")
+    if snapshot_index is not None and created:
+        snapshot_index.record_created(f"{account_id}:{ec2.meta.region_name}", created)
     return snapshot_ids
 
 
@@ -113,17 +166,22 @@ def delete_old_snapshots(
     session: boto3.Session,
     retention_days: int = 30,
     dry_run: bool = False,
+    inventory: InventoryStore | None = None,
+    snapshot_index: SnapshotIndex | None = None,
 ) -> int:
     """Delete snapshots created by backup_manager older than retention_days.
 
-    Returns count of deleted snapshots.
+    Candidates are always listed live from EC2 with a server-side
+    CreatedBy tag filter, never from the inventory cache, so a snapshot is
+    only deleted on its current tags. Deleted snapshots are dropped from
+    the snapshot index. Returns count of deleted snapshots.
     """
     ec2 = session.client("ec2")
     sts = session.client("sts")
     account_id = sts.get_caller_identity()["Account"]
 
     cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
-    deleted = 0
+    deleted_ids: list[str] = []
 
     logger.info(
         "Deleting snapshots older than %d days (before %s)",
@@ -131,30 +189,29 @@ def delete_old_snapshots(
         cutoff.isoformat(),
     )
 
-    paginator = ec2.get_paginator("describe_snapshots")
-    for page in paginator.paginate(
-        OwnerIds=[account_id],
-        Filters=[{"Name": "tag:CreatedBy", "Values": ["backup_manager"]}],
-    ):
-        for snap in page["Snapshots"]:
-            start_time = snap["StartTime"]
-            if start_time.tzinfo is None:
-                start_time = start_time.replace(tzinfo=timezone.utc)
-
-            if start_time < cutoff:
-                snap_id = snap["SnapshotId"]
-                if dry_run:
-                    logger.info("[DRY RUN] Would delete snapshot %s (created %s)", snap_id, start_time)
-                else:
-                    try:
-                        ec2.delete_snapshot(SnapshotId=snap_id)
-                        logger.info("Deleted snapshot %s (created %s)", snap_id, start_time)
-                        deleted += 1
-                    except (ClientError, BotoCoreError) as exc:
-                        logger.error("Failed to delete snapshot %s: %s", snap_id, exc)
-
-    logger.info("Deleted %d old snapshots", deleted)
-    return deleted
+    for snap in fetch_resources(ec2, "snapshots", tags={"CreatedBy": "backup_manager"}):
+        start_time = snap["StartTime"]
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=timezone.utc)
+
+        if start_time < cutoff:
+            snap_id = snap["SnapshotId"]
+            if dry_run:
+                logger.info("[DRY RUN] Would delete snapshot %s (created %s)", snap_id, start_time)
+            else:
+                try:
+                    ec2.delete_snapshot(SnapshotId=snap_id)
+                    logger.info("Deleted snapshot %s (created %s)", snap_id, start_time)
+                    deleted_ids.append(snap_id)
+                except (ClientError, BotoCoreError) as exc:
+                    logger.error("Failed to delete snapshot %s: %s", snap_id, exc)
+
+    if inventory is not None and deleted_ids:
+        inventory.invalidate(inventory.scope(account_id, ec2.meta.region_name), "snapshots")
+    if snapshot_index is not None and deleted_ids:
+        snapshot_index.record_deleted(f"{account_id}:{ec2.meta.region_name}", deleted_ids)
+    logger.info("Deleted %d old snapshots", len(deleted_ids))
+    return len(deleted_ids)
 
 
 def copy_snapshots_cross_region(
@@ -225,6 +282,9 @@ Examples:
     parser.add_argument("--region", default="us-east-1", help="AWS region (default: us-east-1)")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
     parser.add_argument("-n", "--dry-run", action="store_true", help="Dry run mode")
+    add_inventory_arguments(parser)
+    add_snapshot_index_arguments(parser)
+    add_stats_arguments(parser)
 
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
 
@@ -276,7 +336,10 @@ def main() -> int:
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
+    stats = open_stats(args)
     session = get_session(profile=args.profile, region=args.region)
+    inventory = open_inventory(args)
+    snapshot_index = open_snapshot_index(args)
 
     if args.command == "create":
         tag_filters = parse_key_value_pairs(args.tag_filter) if args.tag_filter else None
@@ -287,11 +350,19 @@ def main() -> int:
             tag_filters=tag_filters,
             description_prefix=args.description,
             extra_tags=extra_tags,
+            inventory=inventory,
+            snapshot_index=snapshot_index,
         )
         logger.info("Created %d snapshots: %s", len(snapshot_ids), ", ".join(snapshot_ids))
 
     elif args.command == "cleanup":
-        deleted = delete_old_snapshots(session, retention_days=args.retention, dry_run=args.dry_run)
+        deleted = delete_old_snapshots(
+            session,
+            retention_days=args.retention,
+            dry_run=args.dry_run,
+            inventory=inventory,
+            snapshot_index=snapshot_index,
+        )
         logger.info("Cleanup complete. Deleted %d snapshots.", deleted)
 
     elif args.command == "copy":
@@ -303,6 +374,11 @@ def main() -> int:
         )
         logger.info("Copied %d snapshots to %s", len(copied), args.dest_region)
 
+    if inventory is not None:
+        inventory.close()
+    if snapshot_index is not None:
+        snapshot_index.close()
+    report_stats(stats, args)
     return 0
 
 
@@ -0,0 +1,226 @@
+"""Persistent certificate check state and expiry-aware scheduling.
+
+ssl_cert_monitor.py records the last result of every host:port in a JSON
+state file, together with when it should next be checked:
+
+- a certificate far from the warning threshold is re-checked after half
+  the days left until it would cross it, so it is always seen again
+  before it needs an alert, but never later than ``max_staleness``;
+- one inside the warning window is due on every run, which also picks up
+  its renewal as soon as it happens;
+- a failed check is retried after an hour, backing off to a day while it
+  keeps failing.
+
+With ``--due-only`` only due hosts are checked; the others are reported
+from their last result with days remaining recomputed. Certificate details
+are stored once per fingerprint, since many hosts share a certificate.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any
+
+logger = logging.getLogger("cert_state")
+
+DEFAULT_STATE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "infra-automation", "ssl_cert_state.json")
+
+DAY = 86400
+
+# Longest a certificate goes unchecked, in days. Lower values notice a
+# replaced certificate sooner at the cost of more handshakes.
+DEFAULT_MAX_STALENESS_DAYS = 30
+
+# Shortest interval between checks of a host, and the retry schedule of a
+# failing one: an hour, doubling per consecutive failure up to a day.
+MIN_RECHECK = 3600
+ERROR_RECHECK = 3600
+ERROR_RECHECK_MAX = DAY
+
+# Intervals are shortened by up to this fraction, fixed per host, so hosts
+# first checked together do not all fall due on the same later run.
+JITTER = 0.1
+
+# Hosts not checked for this long (or twice the max staleness, if longer)
+# have left the domain list and are dropped from the state.
+PRUNE_AFTER = 90 * DAY
+
+# Certificate fields stored once per fingerprint.
+CERT_FIELDS = ("issuer", "subject", "not_before", "not_after", "serial_number", "san")
+
+# Per-address fields stored with each host, and the certificate fields
+# filled back into a cached per-address result.
+ADDRESS_FIELDS = ("address", "status", "fingerprint", "error")
+ADDRESS_CERT_FIELDS = ("subject", "not_after", "serial_number")
+
+
+def host_key(hostname: str, port: int) -> str:
+    """State key of a host and port.
+
+    The hostname is kept exactly as checked: SNI and certificate
+    verification use it verbatim, so e.g. ``example.com.`` can fail where
+    ``example.com`` passes and each needs its own entry.
+    """
+    return f"{hostname}:{port}"
+
+
+def days_remaining(not_after: str, now: float) -> int:
+    """Whole days from ``now`` until an ISO-format expiry."""
+    return (datetime.fromisoformat(not_after) - datetime.fromtimestamp(now, timezone.utc)).days
+
+
+def next_check_interval(
+    result: dict[str, Any],
+    failures: int,
+    warn_days: int,
+    max_staleness: float,
+    key: str = "",
+) -> float:
+    """Seconds until a host should be checked again after ``result``."""
+    if result["status"] not in ("valid", "expired"):
+        return min(ERROR_RECHECK * 2 ** max(0, failures - 1), ERROR_RECHECK_MAX, max_staleness)
+    margin = (result["days_remaining"] - warn_days) * DAY
+    if margin <= 0:
+        return MIN_RECHECK
+    interval = min(margin / 2, max_staleness)
+    spread = (zlib.crc32(key.encode()) & 0xFFFFFFFF) / 0xFFFFFFFF
+    return max(MIN_RECHECK, interval * (1 - JITTER * spread))
+
+
+class CertState:
+    """Last check result and next due time of every host:port, in a JSON file."""
+
+    def __init__(self, path: str = DEFAULT_STATE_FILE, max_staleness_days: float = DEFAULT_MAX_STALENESS_DAYS) -> None:
+        self.path = path
+        self.max_staleness = max_staleness_days * DAY
+        self.hosts: dict[str, dict[str, Any]] = {}
+        self.certs: dict[str, dict[str, Any]] = {}
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            self.hosts = data.get("hosts", {})
+            self.certs = data.get("certs", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as exc:
+            logger.warning("Ignoring unreadable check state %s: %s", path, exc)
+
+    def is_due(self, hostname: str, port: int, warn_days: int, now: float | None = None) -> bool:
+        """Whether a host needs checking: never checked, past its next check, or near expiry."""
+        now = time.time() if now is None else now
+        entry = self.hosts.get(host_key(hostname, port))
+        if entry is None or entry["next_check"] <= now:
+            return True
+        cert = self.certs.get(entry["fingerprint"])
+        # A lowered --warn-days must not leave a certificate unchecked inside the new window.
+        return cert is not None and days_remaining(cert["not_after"], now) <= warn_days
+
+    def cached_result(self, result: dict[str, Any], now: float | None = None) -> dict[str, Any] | None:
+        """Fill a blank result for a host from its last check, or None if it has none.
+
+        Days remaining (and so valid or expired) are recomputed for ``now``;
+        ``last_checked`` says when the certificate was actually seen.
+        """
+        now = time.time() if now is None else now
+        entry = self.hosts.get(host_key(result["hostname"], result["port"]))
+        if entry is None:
+            return None
+        cached = {"status": entry["status"], "fingerprint": entry["fingerprint"]}
+        result.update(self._with_cert(cached, CERT_FIELDS, now))
+        result["error"] = entry["error"]
+        if "addresses" in entry:
+            result["addresses"] = [
+                self._with_cert(dict(address), ADDRESS_CERT_FIELDS, now) for address in entry["addresses"]
+            ]
+        result["last_checked"] = datetime.fromtimestamp(entry["checked_at"], timezone.utc).isoformat()
+        return result
+
+    def _with_cert(self, item: dict[str, Any], fields: tuple[str, ...], now: float) -> dict[str, Any]:
+        cert = self.certs.get(item.get("fingerprint", ""))
+        if cert is None:
+            return item
+        item.update({name: cert[name] for name in fields if name in cert})
+        item["days_remaining"] = days_remaining(cert["not_after"], now)
+        if item["status"] in ("valid", "expired"):
+            item["status"] = "valid" if item["days_remaining"] > 0 else "expired"
+        return item
+
+    def record(self, result: dict[str, Any], warn_days: int, now: float | None = None) -> float:
+        """Store a fresh result and schedule the host's next check; returns that time."""
+        now = time.time() if now is None else now
+        key = host_key(result["hostname"], result["port"])
+        previous = self.hosts.get(key, {})
+        failures = 0 if result["status"] in ("valid", "expired") else previous.get("failures", 0) + 1
+        # The host's own certificate has every field; other addresses' only some.
+        for item in [result, *result.get("addresses", ())]:
+            fingerprint = item.get("fingerprint")
+            if fingerprint and item.get("not_after") and len(self.certs.get(fingerprint, ())) < len(CERT_FIELDS):
+                known = self.certs.get(fingerprint, {})
+                self.certs[fingerprint] = {**{name: item[name] for name in CERT_FIELDS if name in item}, **known}
+
+        next_check = now + next_check_interval(result, failures, warn_days, self.max_staleness, key)
+        entry: dict[str, Any] = {
+            "status": result["status"],
+            "fingerprint": result.get("fingerprint", ""),
+            "error": result["error"],
+            "checked_at": now,
+            "next_check": next_check,
+            "failures": failures,
+        }
+        if "addresses" in result:
+            entry["addresses"] = [{name: a.get(name, "") for name in ADDRESS_FIELDS} for a in result["addresses"]]
+        self.hosts[key] = entry
+        return next_check
+
+    def save(self, now: float | None = None) -> None:
+        """Drop long-unchecked hosts and unreferenced certificates, then write atomically."""
+        now = time.time() if now is None else now
+        horizon = now - max(PRUNE_AFTER, 2 * self.max_staleness)
+        self.hosts = {key: entry for key, entry in self.hosts.items() if entry["checked_at"] >= horizon}
+        referenced = {entry["fingerprint"] for entry in self.hosts.values()}
+        referenced.update(a["fingerprint"] for entry in self.hosts.values() for a in entry.get("addresses", ()))
+        self.certs = {fingerprint: cert for fingerprint, cert in self.certs.items() if fingerprint in referenced}
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"hosts": self.hosts, "certs": self.certs}, fh, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logger.warning("Failed to write check state %s: %s", self.path, exc)
+
+
+def add_state_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the check state and scheduling options."""
+    group = parser.add_argument_group("check schedule")
+    group.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        metavar="FILE",
+        help=f"JSON file recording each host's last result and next check (default: {DEFAULT_STATE_FILE})",
+    )
+    group.add_argument("--no-state", action="store_true", help="Neither read nor record check state")
+    group.add_argument(
+        "--due-only",
+        action="store_true",
+        help="Check only hosts that are due, reporting the rest from their last result",
+    )
+    group.add_argument(
+        "--max-staleness",
+        type=float,
+        default=DEFAULT_MAX_STALENESS_DAYS,
+        metavar="DAYS",
+        help=f"Check every host at least once per DAYS with --due-only (default: {DEFAULT_MAX_STALENESS_DAYS})",
+    )
+
+
+def open_state(args: argparse.Namespace) -> CertState | None:
+    """Load the check state, or None when disabled."""
+    if args.no_state:
+        return None
+    return CertState(args.state_file, args.max_staleness)
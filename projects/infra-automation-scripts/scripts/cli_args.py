@@ -0,0 +1,11 @@
+"""argparse value types shared by the scripts' command lines."""
+
+import argparse
+
+
+def positive_int(value: str) -> int:
+    """argparse type for integers >= 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1, got {value}")
+    return number
@@ -0,0 +1,121 @@
+"""Batched CloudWatch metric fetching.
+
+GetMetricData answers up to 500 metric queries per request, so a fleet's
+metrics cost a handful of calls instead of one GetMetricStatistics call
+per resource. Batches run concurrently on a small pool and each is
+paginated until CloudWatch has returned every datapoint. Callers build
+MetricQuery objects, fetch once, and analyse the returned series
+separately from the fetch.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger("cloudwatch_metrics")
+
+# GetMetricData limit on MetricDataQueries per request.
+MAX_QUERIES_PER_REQUEST = 500
+
+# Concurrent GetMetricData requests; CloudWatch's default quota is 50 TPS.
+DEFAULT_METRIC_WORKERS = 4
+
+
+@dataclass(frozen=True, slots=True)
+class MetricQuery:
+    """One metric statistic to fetch, identified by the caller's ``key``."""
+
+    key: str
+    namespace: str
+    metric_name: str
+    dimensions: tuple[tuple[str, str], ...]
+    stat: str = "Average"
+    period: int = 300
+
+
+@dataclass(slots=True)
+class MetricSeries:
+    """Datapoints of one query, oldest first."""
+
+    timestamps: list[datetime] = field(default_factory=list)
+    values: list[float] = field(default_factory=list)
+
+
+def _fetch_batch(
+    cloudwatch: Any,
+    batch: list[MetricQuery],
+    start_time: datetime,
+    end_time: datetime,
+) -> dict[str, MetricSeries]:
+    """Fetch one batch of at most MAX_QUERIES_PER_REQUEST queries, all pages."""
+    # Query IDs must start with a lowercase letter, so map them back by position.
+    ids = {f"q{index}": query.key for index, query in enumerate(batch)}
+    series: dict[str, MetricSeries] = {query.key: MetricSeries() for query in batch}
+    paginator = cloudwatch.get_paginator("get_metric_data")
+    pages = paginator.paginate(
+        MetricDataQueries=[
+            {
+                "Id": f"q{index}",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": query.namespace,
+                        "MetricName": query.metric_name,
+                        "Dimensions": [{"Name": name, "Value": value} for name, value in query.dimensions],
+                    },
+                    "Period": query.period,
+                    "Stat": query.stat,
+                },
+                "ReturnData": True,
+            }
+            for index, query in enumerate(batch)
+        ],
+        StartTime=start_time,
+        EndTime=end_time,
+        ScanBy="TimestampAscending",
+    )
+    for page in pages:
+        for result in page.get("MetricDataResults", []):
+            target = series[ids[result["Id"]]]
+            target.timestamps.extend(result.get("Timestamps", []))
+            target.values.extend(result.get("Values", []))
+    return series
+
+
+def get_metric_series(
+    cloudwatch: Any,
+    queries: list[MetricQuery],
+    start_time: datetime,
+    end_time: datetime,
+    workers: int = DEFAULT_METRIC_WORKERS,
+) -> dict[str, MetricSeries]:
+    """Fetch every query's datapoints, keyed by MetricQuery.key.
+
+    Every query of a fetched batch has a series, empty when CloudWatch has
+    no datapoints. A batch that fails is logged and its keys are left out
+    of the result, so callers can tell metrics they could not read from
+    metrics that are zero.
+    """
+    batches = [
+        queries[start:start + MAX_QUERIES_PER_REQUEST]
+        for start in range(0, len(queries), MAX_QUERIES_PER_REQUEST)
+    ]
+    if not batches:
+        return {}
+
+    def _fetch(batch: list[MetricQuery]) -> dict[str, MetricSeries]:
+        try:
+            return _fetch_batch(cloudwatch, batch, start_time, end_time)
+        except (ClientError, BotoCoreError) as exc:
+            logger.warning("Failed to fetch %d metrics (%s...): %s", len(batch), batch[0].key, exc)
+            return {}
+
+    series: dict[str, MetricSeries] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        for result in pool.map(_fetch, batches):
+            series.update(result)
+    logger.debug("Fetched %d metric series in %d GetMetricData batches", len(series), len(batches))
+    return series
@@ -11,16 +11,54 @@ Identifies cost optimization opportunities across an AWS account:
 """
 
 import argparse
+import heapq
 import json
 import logging
+import queue
 import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator
 
 import boto3
+import numpy as np
 from botocore.exceptions import BotoCoreError, ClientError
 from tabulate import tabulate
 
+from api_stats import add_stats_arguments, instrument, open_stats, report_stats
+from aws_org import Target, add_org_arguments, build_targets, get_client, resolve_regions
+from cli_args import positive_int
+from cloudwatch_metrics import DEFAULT_METRIC_WORKERS, get_metric_series
+from daemon_client import DaemonClient, add_daemon_arguments, target_identity
+from daemon_client import connect as connect_daemon
+from findings_store import FindingsStore, add_history_arguments, open_history, run_scope
+from inventory_store import (
+    RESOURCE_SPECS,
+    InventoryStore,
+    add_inventory_arguments,
+    describe_resources,
+    open_inventory,
+)
+from load_balancers import (
+    LoadBalancer,
+    describe_load_balancers,
+    load_balancer_tags,
+    summarize_traffic,
+    traffic_queries,
+)
+from pricing_catalog import DEFAULT_PRICING_DB, HOURS_PER_MONTH, PriceBook, add_pricing_arguments, open_pricing
+from snapshot_index import SnapshotIndex, add_snapshot_index_arguments, open_snapshot_index
+from utilization import (
+    UtilizationRule,
+    analyze_fleet,
+    default_rules,
+    metric_queries,
+    rule_arg,
+    rule_metrics,
+    underutilized,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -28,23 +66,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger("cost_optimizer")
 
-INSTANCE_HOURLY_COSTS: dict[str, float] = {
-    "t2.micro": 0.0116, "t2.small": 0.023, "t2.medium": 0.0464,
-    "t3.micro": 0.0104, "t3.small": 0.0208, "t3.medium": 0.0416,
-    "t3.large": 0.0832, "t3.xlarge": 0.1664,
-    "m5.large": 0.096, "m5.xlarge": 0.192, "m5.2xlarge": 0.384,
-    "c5.large": 0.085, "c5.xlarge": 0.17, "c5.2xlarge": 0.34,
-    "r5.large": 0.126, "r5.xlarge": 0.252, "r5.2xlarge": 0.504,
-}
-
-EBS_GB_MONTH_COST: dict[str, float] = {
-    "gp2": 0.10, "gp3": 0.08, "io1": 0.125, "io2": 0.125,
-    "st1": 0.045, "sc1": 0.015, "standard": 0.05,
-}
-
-EIP_HOURLY_COST = 0.005
-SNAPSHOT_GB_MONTH_COST = 0.05
-
 
 def get_session(profile: str | None = None, region: str | None = None) -> boto3.Session:
     """Create a boto3 session."""
@@ -53,7 +74,7 @@ def get_session(profile: str | None = None, region: str | None = None) -> boto3.
         kwargs["profile_name"] = profile
     if region:
         kwargs["region_name"] = region
-    return boto3.Session(**kwargs)
+    return instrument(boto3.Session(**kwargs))
 
 
 def get_tag_value(tags: list[dict[str, str]] | None, key: str = "Name") -> str:
@@ -64,112 +85,242 @@ def get_tag_value(tags: list[dict[str, str]] | None, key: str = "Name") -> str:
     return ""
 
 
-def find_stopped_instances(ec2_client: Any, stopped_days: int = 7) -> list[dict[str, Any]]:
-    """Find EC2 instances stopped for more than N days."""
-    results: list[dict[str, Any]] = []
-    cutoff = datetime.now(timezone.utc) - timedelta(days=stopped_days)
+def tag_map(tags: list[dict[str, str]] | None) -> dict[str, str]:
+    """Convert a list of AWS tags into a key -> value dict."""
+    return {tag["Key"]: tag["Value"] for tag in (tags or [])}
+
+
+@dataclass(slots=True)
+class Finding:
+    """One cost optimization opportunity.
 
+    The estimated waste stays a float so totals and sorting never re-parse
+    strings; it is only formatted as dollars by render(). ``account_id`` and
+    ``region`` are filled in by the caller that knows the scan target;
+    ``az`` and ``tags`` are kept for --group-by and are not report columns.
+    """
+
+    resource_type: str
+    resource_id: str
+    name: str
+    details: str
+    monthly_waste: float
+    recommendation: str
+    account_id: str = ""
+    region: str = ""
+    az: str = ""
+    tags: dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the finding's report columns with native values, for JSON."""
+        return {
+            "ResourceType": self.resource_type,
+            "ResourceId": self.resource_id,
+            "Name": self.name,
+            "Details": self.details,
+            "EstMonthlyWaste": round(self.monthly_waste, 2),
+            "Recommendation": self.recommendation,
+        }
+
+    def render(self) -> dict[str, str]:
+        """Return the finding's report columns formatted for a table."""
+        return {**self.to_dict(), "EstMonthlyWaste": f"${self.monthly_waste:.2f}"}
+
+
+def stopped_instance_findings(instances: list[dict[str, Any]], region: str, prices: PriceBook) -> list[Finding]:
+    """Turn stopped instances into findings priced at their on-demand rate."""
+    results: list[Finding] = []
+    for inst in instances:
+        transition_reason = inst.get("StateTransitionReason", "")
+        instance_type = inst["InstanceType"]
+        hourly_cost = prices.instance_hourly(region, inst)
+        monthly_waste = hourly_cost * HOURS_PER_MONTH
+
+        results.append(Finding(
+            resource_type="EC2 (Stopped)",
+            resource_id=inst["InstanceId"],
+            name=get_tag_value(inst.get("Tags")),
+            details=f"{instance_type}, stopped since ~{transition_reason[:30]}",
+            monthly_waste=monthly_waste,
+            recommendation="Terminate or create AMI and terminate",
+            az=inst.get("Placement", {}).get("AvailabilityZone", ""),
+            tags=tag_map(inst.get("Tags")),
+        ))
+    return results
+
+
+def find_stopped_instances(
+    ec2_client: Any,
+    stopped_days: int = 7,
+    inventory: InventoryStore | None = None,
+    account_id: str | None = None,
+    prices: PriceBook | None = None,
+) -> list[Finding]:
+    """Find EC2 instances stopped for more than N days."""
     try:
-        paginator = ec2_client.get_paginator("describe_instances")
-        for page in paginator.paginate(Filters=[{"Name": "instance-state-name", "Values": ["stopped"]}]):
-            for reservation in page["Reservations"]:
-                for inst in reservation["Instances"]:
-                    transition_reason = inst.get("StateTransitionReason", "")
-                    launch_time = inst.get("LaunchTime", datetime.now(timezone.utc))
-                    instance_type = inst["InstanceType"]
-                    hourly_cost = INSTANCE_HOURLY_COSTS.get(instance_type, 0.05)
-                    monthly_waste = hourly_cost * 730
-
-                    results.append({
-                        "ResourceType": "EC2 (Stopped)",
-                        "ResourceId": inst["InstanceId"],
-                        "Name": get_tag_value(inst.get("Tags")),
-                        "Details": f"{instance_type}, stopped since ~{transition_reason[:30]}",
-                        "EstMonthlyWaste": f"${monthly_waste:.2f}",
-                        "Recommendation": "Terminate or create AMI and terminate",
-                    })
+        instances = list(describe_resources(ec2_client, "instances", inventory, account_id, state="stopped"))
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to find stopped instances: %s", exc)
+        return []
+    return stopped_instance_findings(instances, ec2_client.meta.region_name, prices or PriceBook())
 
+
+def analyze_utilization(
+    instances: list[dict[str, Any]],
+    stats: dict[str, dict[str, np.ndarray]],
+    rules: list[UtilizationRule],
+    region: str,
+    prices: PriceBook,
+) -> list[Finding]:
+    """Turn fleet utilization statistics into findings for instances matching every rule."""
+    cpu = stats["cpu"]
+    results: list[Finding] = []
+    for index in underutilized(stats, rules):
+        inst = instances[index]
+        instance_type = inst["InstanceType"]
+        hourly_cost = prices.instance_hourly(region, inst)
+        monthly_cost = hourly_cost * HOURS_PER_MONTH
+        potential_savings = monthly_cost * 0.5
+
+        results.append(Finding(
+            resource_type="EC2 (Underutilized)",
+            resource_id=inst["InstanceId"],
+            name=get_tag_value(inst.get("Tags")),
+            details=(
+                f"{instance_type}, avg CPU: {cpu['mean'][index]:.1f}%, "
+                f"p95 {cpu['p95'][index]:.1f}%, peak {cpu['peak'][index]:.1f}%, "
+                f"trend {cpu['trend'][index]:+.2f}%/day"
+            ),
+            monthly_waste=potential_savings,
+            recommendation="Downsize or use Spot/Reserved",
+            az=inst.get("Placement", {}).get("AvailabilityZone", ""),
+            tags=tag_map(inst.get("Tags")),
+        ))
     return results
 
 
-def find_underutilized_instances(
+def utilization_findings(
     session: boto3.Session,
+    instances: list[dict[str, Any]],
     cpu_threshold: float = 10.0,
     days: int = 14,
-) -> list[dict[str, Any]]:
-    """Find running instances with low average CPU utilization."""
-    ec2 = session.client("ec2")
-    cloudwatch = session.client("cloudwatch")
-    results: list[dict[str, Any]] = []
-    end_time = datetime.now(timezone.utc)
+    rules: list[UtilizationRule] | None = None,
+    metric_workers: int = DEFAULT_METRIC_WORKERS,
+    prices: PriceBook | None = None,
+) -> list[Finding]:
+    """Fetch hourly metrics for running instances and apply the utilization rules.
+
+    Without explicit rules, mean CPU must be below ``cpu_threshold`` and
+    p99 CPU below 50%.
+    """
+    if not instances:
+        return []
+    rules = rules or default_rules(cpu_threshold)
+    end_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
     start_time = end_time - timedelta(days=days)
+    instance_ids = [inst["InstanceId"] for inst in instances]
+    metrics = rule_metrics(rules)
+    series = get_metric_series(
+        get_client(session, "cloudwatch"),
+        metric_queries(instance_ids, metrics),
+        start_time,
+        end_time,
+        workers=metric_workers,
+    )
+    stats = analyze_fleet(instance_ids, series, metrics, start_time, end_time)
+    return analyze_utilization(instances, stats, rules, session.region_name, prices or PriceBook())
 
-    try:
-        paginator = ec2.get_paginator("describe_instances")
-        for page in paginator.paginate(Filters=[{"Name": "instance-state-name", "Values": ["running"]}]):
-            for reservation in page["Reservations"]:
-                for inst in reservation["Instances"]:
-                    instance_id = inst["InstanceId"]
-                    instance_type = inst["InstanceType"]
 
-                    try:
-                        metrics = cloudwatch.get_metric_statistics(
-                            Namespace="AWS/EC2",
-                            MetricName="CPUUtilization",
-                            Dimensions=[{"Name": "InstanceId", "Value": instance_id}],
-                            StartTime=start_time,
-                            EndTime=end_time,
-                            Period=86400,
-                            Statistics=["Average"],
-                        )
-                        datapoints = metrics.get("Datapoints", [])
-                        if datapoints:
-                            avg_cpu = sum(d["Average"] for d in datapoints) / len(datapoints)
-                            if avg_cpu < cpu_threshold:
-                                hourly_cost = INSTANCE_HOURLY_COSTS.get(instance_type, 0.05)
-                                monthly_cost = hourly_cost * 730
-                                potential_savings = monthly_cost * 0.5
-
-                                results.append({
-                                    "ResourceType": "EC2 (Underutilized)",
-                                    "ResourceId": instance_id,
-                                    "Name": get_tag_value(inst.get("Tags")),
-                                    "Details": f"{instance_type}, avg CPU: {avg_cpu:.1f}%",
-                                    "EstMonthlyWaste": f"${potential_savings:.2f}",
-                                    "Recommendation": "Downsize or use Spot/Reserved",
-                                })
-                    except (ClientError, BotoCoreError) as exc:
-                        logger.debug("Failed to get metrics for %s: %s", instance_id, exc)
+def find_underutilized_instances(
+    session: boto3.Session,
+    cpu_threshold: float = 10.0,
+    days: int = 14,
+    inventory: InventoryStore | None = None,
+    account_id: str | None = None,
+    rules: list[UtilizationRule] | None = None,
+    metric_workers: int = DEFAULT_METRIC_WORKERS,
+    prices: PriceBook | None = None,
+) -> list[Finding]:
+    """Find running instances whose utilization satisfies every rule.
+
+    Hourly series for the metrics the rules need are fetched for the whole
+    fleet with batched GetMetricData calls and analysed in one vectorized
+    pass.
+    """
+    ec2 = get_client(session, "ec2")
+    try:
+        instances = list(describe_resources(ec2, "instances", inventory, account_id, state="running"))
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to find underutilized instances: %s", exc)
+        return []
+    return utilization_findings(session, instances, cpu_threshold, days, rules, metric_workers, prices)
+
+
+def unattached_volume_findings(volumes: list[dict[str, Any]], region: str, prices: PriceBook) -> list[Finding]:
+    """Turn available (unattached) volumes into findings."""
+    results: list[Finding] = []
+    for vol in volumes:
+        vol_type = vol["VolumeType"]
+        size = vol["Size"]
+        monthly_cost = prices.volume_gb_month(region, vol_type) * size
 
+        results.append(Finding(
+            resource_type="EBS Volume",
+            resource_id=vol["VolumeId"],
+            name=get_tag_value(vol.get("Tags")),
+            details=f"{size} GB {vol_type}, unattached",
+            monthly_waste=monthly_cost,
+            recommendation="Delete or snapshot and delete",
+            az=vol.get("AvailabilityZone", ""),
+            tags=tag_map(vol.get("Tags")),
+        ))
     return results
 
 
-def find_unattached_volumes(ec2_client: Any) -> list[dict[str, Any]]:
+def find_unattached_volumes(
+    ec2_client: Any,
+    inventory: InventoryStore | None = None,
+    account_id: str | None = None,
+    prices: PriceBook | None = None,
+) -> list[Finding]:
     """Find EBS volumes not attached to any instance."""
-    results: list[dict[str, Any]] = []
     try:
-        paginator = ec2_client.get_paginator("describe_volumes")
-        for page in paginator.paginate(Filters=[{"Name": "status", "Values": ["available"]}]):
-            for vol in page["Volumes"]:
-                vol_type = vol["VolumeType"]
-                size = vol["Size"]
-                monthly_cost = EBS_GB_MONTH_COST.get(vol_type, 0.10) * size
-
-                results.append({
-                    "ResourceType": "EBS Volume",
-                    "ResourceId": vol["VolumeId"],
-                    "Name": get_tag_value(vol.get("Tags")),
-                    "Details": f"{size} GB {vol_type}, unattached",
-                    "EstMonthlyWaste": f"${monthly_cost:.2f}",
-                    "Recommendation": "Delete or snapshot and delete",
-                })
+        volumes = list(describe_resources(ec2_client, "volumes", inventory, account_id, state="available"))
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to find unattached volumes: %s", exc)
+        return []
+    return unattached_volume_findings(volumes, ec2_client.meta.region_name, prices or PriceBook())
+
 
+def old_snapshot_findings(
+    snapshots: list[dict[str, Any]],
+    region: str,
+    prices: PriceBook,
+    age_days: int = 90,
+) -> list[Finding]:
+    """Turn snapshots older than N days into findings."""
+    results: list[Finding] = []
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=age_days)
+    for snap in snapshots:
+        start_time = snap["StartTime"]
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=timezone.utc)
+
+        if start_time < cutoff:
+            size = snap.get("VolumeSize", 0)
+            monthly_cost = prices.snapshot_gb_month(region, snap.get("StorageTier", "standard")) * size
+            age = (now - start_time).days
+
+            results.append(Finding(
+                resource_type="EBS Snapshot",
+                resource_id=snap["SnapshotId"],
+                name=get_tag_value(snap.get("Tags")),
+                details=f"{size} GB, {age} days old",
+                monthly_waste=monthly_cost,
+                recommendation="Review and delete if unneeded",
+                tags=tag_map(snap.get("Tags")),
+            ))
     return results
 
 
@@ -177,59 +328,702 @@ def find_old_snapshots(
     ec2_client: Any,
     account_id: str,
     age_days: int = 90,
-) -> list[dict[str, Any]]:
-    """Find EBS snapshots older than N days."""
-    results: list[dict[str, Any]] = []
-    cutoff = datetime.now(timezone.utc) - timedelta(days=age_days)
+    inventory: InventoryStore | None = None,
+    prices: PriceBook | None = None,
+    snapshot_index: SnapshotIndex | None = None,
+) -> list[Finding]:
+    """Find EBS snapshots older than N days.
 
+    With a snapshot index, only the old snapshots are read, by a range scan
+    of the index after an incremental sync.
+    """
     try:
-        paginator = ec2_client.get_paginator("describe_snapshots")
-        for page in paginator.paginate(OwnerIds=[account_id]):
-            for snap in page["Snapshots"]:
-                start_time = snap["StartTime"]
-                if start_time.tzinfo is None:
-                    start_time = start_time.replace(tzinfo=timezone.utc)
-
-                if start_time < cutoff:
-                    size = snap.get("VolumeSize", 0)
-                    monthly_cost = SNAPSHOT_GB_MONTH_COST * size
-                    age = (datetime.now(timezone.utc) - start_time).days
-
-                    results.append({
-                        "ResourceType": "EBS Snapshot",
-                        "ResourceId": snap["SnapshotId"],
-                        "Name": get_tag_value(snap.get("Tags")),
-                        "Details": f"{size} GB, {age} days old",
-                        "EstMonthlyWaste": f"${monthly_cost:.2f}",
-                        "Recommendation": "Review and delete if unneeded",
-                    })
+        if snapshot_index is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=age_days)
+            snapshots = list(snapshot_index.describe_older_than(ec2_client, account_id, cutoff))
+        else:
+            snapshots = list(describe_resources(ec2_client, "snapshots", inventory, account_id))
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to find old snapshots: %s", exc)
+        return []
+    return old_snapshot_findings(snapshots, ec2_client.meta.region_name, prices or PriceBook(), age_days)
 
-    return results
 
+def unattached_eip_findings(addresses: list[dict[str, Any]], region: str, prices: PriceBook) -> list[Finding]:
+    """Turn unassociated Elastic IPs into findings."""
+    monthly_cost = prices.ip_hourly(region) * HOURS_PER_MONTH
+    return [
+        Finding(
+            resource_type="Elastic IP",
+            resource_id=addr.get("AllocationId", "N/A"),
+            name=addr.get("PublicIp", "N/A"),
+            details=f"Unattached EIP: {addr.get('PublicIp', 'N/A')}",
+            monthly_waste=monthly_cost,
+            recommendation="Release if unused",
+            tags=tag_map(addr.get("Tags")),
+        )
+        for addr in addresses
+    ]
 
-def find_unattached_eips(ec2_client: Any) -> list[dict[str, Any]]:
-    """Find Elastic IPs not associated with any resource."""
-    results: list[dict[str, Any]] = []
-    monthly_cost = EIP_HOURLY_COST * 730
+
+def idle_load_balancer_findings(
+    session: boto3.Session,
+    load_balancers: list[LoadBalancer],
+    days: int = 14,
+    min_requests: float = 100.0,
+    prices: PriceBook | None = None,
+    metric_workers: int = DEFAULT_METRIC_WORKERS,
+) -> list[Finding]:
+    """Fetch daily traffic for the load balancers and flag idle ones and ones without targets.
+
+    A load balancer is idle when it served fewer than ``min_requests``
+    requests (new flows for network and gateway load balancers) in the last
+    ``days``. Ones created within that window are skipped, and so are ones
+    whose metrics could not be fetched, unless they have no targets at all.
+    """
+    end_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    start_time = end_time - timedelta(days=days)
+    candidates = [lb for lb in load_balancers if lb.created is None or lb.created <= start_time]
+    if not candidates:
+        return []
+    prices = prices or PriceBook()
+    region = session.region_name
+    series = get_metric_series(
+        get_client(session, "cloudwatch"),
+        traffic_queries(candidates),
+        start_time,
+        end_time,
+        workers=metric_workers,
+    )
+
+    flagged: list[tuple[LoadBalancer, str, str, str]] = []
+    unknown = 0
+    for lb, traffic in zip(candidates, summarize_traffic(candidates, series)):
+        if not lb.has_targets:
+            reason = "no registered instances" if lb.lb_class == "classic" else "no target groups"
+            flagged.append((lb, "Load Balancer (No targets)", reason, "Delete, or attach targets if still needed"))
+        elif traffic is None:
+            unknown += 1
+        elif traffic.healthy_hosts == 0:
+            reason = f"no healthy targets in {days}d"
+            flagged.append((lb, "Load Balancer (No targets)", reason, "Fix or remove targets, or delete"))
+        elif traffic.requests < min_requests:
+            unit = "requests" if lb.lb_class in ("application", "classic") else "new flows"
+            reason = f"{traffic.requests:.0f} {unit}, {traffic.processed_bytes / 1e6:.1f} MB in {days}d"
+            flagged.append((lb, "Load Balancer (Idle)", reason, "Delete if unused"))
+    if unknown:
+        logger.warning("[%s] Skipped %d load balancers whose traffic metrics could not be fetched", region, unknown)
+    if not flagged:
+        return []
 
     try:
-        response = ec2_client.describe_addresses()
-        for addr in response.get("Addresses", []):
-            if not addr.get("AssociationId"):
-                results.append({
-                    "ResourceType": "Elastic IP",
-                    "ResourceId": addr.get("AllocationId", "N/A"),
-                    "Name": addr.get("PublicIp", "N/A"),
-                    "Details": f"Unattached EIP: {addr.get('PublicIp', 'N/A')}",
-                    "EstMonthlyWaste": f"${monthly_cost:.2f}",
-                    "Recommendation": "Release if unused",
-                })
+        tags = load_balancer_tags(session, [lb for lb, *_ in flagged])
+    except (ClientError, BotoCoreError) as exc:
+        logger.warning("Failed to read load balancer tags: %s", exc)
+        tags = {}
+    return [
+        Finding(
+            resource_type=resource_type,
+            resource_id=lb.resource_id,
+            name=lb.name,
+            details=f"{lb.lb_class}, {reason}",
+            monthly_waste=prices.load_balancer_hourly(region, lb.lb_class) * HOURS_PER_MONTH,
+            recommendation=recommendation,
+            tags=tag_map(tags.get(lb.resource_id)),
+        )
+        for lb, resource_type, reason, recommendation in flagged
+    ]
+
+
+def find_idle_load_balancers(
+    session: boto3.Session,
+    days: int = 14,
+    min_requests: float = 100.0,
+    prices: PriceBook | None = None,
+    metric_workers: int = DEFAULT_METRIC_WORKERS,
+) -> list[Finding]:
+    """Find load balancers without traffic or without targets."""
+    try:
+        load_balancers = describe_load_balancers(session)
+    except (ClientError, BotoCoreError) as exc:
+        logger.error("Failed to find idle load balancers: %s", exc)
+        return []
+    return idle_load_balancer_findings(session, load_balancers, days, min_requests, prices, metric_workers)
+
+
+def find_unattached_eips(
+    ec2_client: Any,
+    inventory: InventoryStore | None = None,
+    account_id: str | None = None,
+    prices: PriceBook | None = None,
+) -> list[Finding]:
+    """Find Elastic IPs not associated with any resource."""
+    try:
+        addresses = list(describe_resources(ec2_client, "addresses", inventory, account_id, state="unassociated"))
     except (ClientError, BotoCoreError) as exc:
         logger.error("Failed to find unattached EIPs: %s", exc)
+        return []
+    return unattached_eip_findings(addresses, ec2_client.meta.region_name, prices or PriceBook())
 
-    return results
+
+@dataclass
+class ScanContext:
+    """What a finder needs besides the resources it is fed."""
+
+    session: boto3.Session
+    account_id: str
+    region: str
+    args: argparse.Namespace
+    prices: PriceBook
+    snapshot_index: SnapshotIndex | None = None
+
+    def indexed(self, resource_type: str) -> bool:
+        """Whether a local index can answer lookups for a resource type."""
+        return resource_type == "snapshots" and self.snapshot_index is not None
+
+
+@dataclass(frozen=True)
+class Finder:
+    """A cost check fed from the shared scan of one resource type.
+
+    ``states`` selects the resources it receives (None for all of them).
+    ``lookup``, when set and the context has an index for the resource
+    type, reads the finder's resources from that index instead.
+    """
+
+    label: str
+    resource_type: str
+    states: tuple[str, ...] | None
+    run: Callable[[ScanContext, list[Any]], list[Finding]]
+    lookup: Callable[[ScanContext], list[dict[str, Any]]] | None = None
+
+    def uses_index(self, ctx: ScanContext) -> bool:
+        """Whether this finder reads from an index rather than the shared scan."""
+        return self.lookup is not None and ctx.indexed(self.resource_type)
+
+
+def indexed_old_snapshots(ctx: ScanContext) -> list[dict[str, Any]]:
+    """Snapshots older than --snapshot-age, range-scanned from the snapshot index."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ctx.args.snapshot_age)
+    ec2 = get_client(ctx.session, "ec2")
+    return list(ctx.snapshot_index.describe_older_than(ec2, ctx.account_id, cutoff))
+
+
+# One resource type's scan results, grouped by the inventory's state column.
+ResourcesByState = dict[str, list[dict[str, Any]]]
+
+# Resource types listed directly rather than through the EC2 inventory.
+# Their finders receive every listed resource, so ``states`` must be None.
+DIRECT_SCANS: dict[str, Callable[[boto3.Session], list[Any]]] = {
+    "load_balancers": describe_load_balancers,
+}
+
+# Every check scan_account() runs, in report order. Finders of the same
+# resource type share one scan.
+FINDERS: tuple[Finder, ...] = (
+    Finder(
+        "stopped instances",
+        "instances",
+        ("stopped",),
+        lambda ctx, items: stopped_instance_findings(items, ctx.region, ctx.prices),
+    ),
+    Finder(
+        "underutilized instances",
+        "instances",
+        ("running",),
+        lambda ctx, items: utilization_findings(
+            ctx.session,
+            items,
+            cpu_threshold=ctx.args.cpu_threshold,
+            days=ctx.args.utilization_days,
+            rules=ctx.args.utilization_rules,
+            prices=ctx.prices,
+        ),
+    ),
+    Finder(
+        "unattached EBS volumes",
+        "volumes",
+        ("available",),
+        lambda ctx, items: unattached_volume_findings(items, ctx.region, ctx.prices),
+    ),
+    Finder(
+        "old snapshots",
+        "snapshots",
+        None,
+        lambda ctx, items: old_snapshot_findings(items, ctx.region, ctx.prices, age_days=ctx.args.snapshot_age),
+        lookup=indexed_old_snapshots,
+    ),
+    Finder(
+        "unattached Elastic IPs",
+        "addresses",
+        ("unassociated",),
+        lambda ctx, items: unattached_eip_findings(items, ctx.region, ctx.prices),
+    ),
+    Finder(
+        "idle load balancers",
+        "load_balancers",
+        None,
+        lambda ctx, items: idle_load_balancer_findings(
+            ctx.session,
+            items,
+            days=ctx.args.lb_days,
+            min_requests=ctx.args.lb_min_requests,
+            prices=ctx.prices,
+        ),
+    ),
+)
+
+
+def scan_account(
+    session: boto3.Session,
+    account_id: str,
+    args: argparse.Namespace,
+    inventory: InventoryStore | None = None,
+    prices: PriceBook | None = None,
+    finders: tuple[Finder, ...] = FINDERS,
+    snapshot_index: SnapshotIndex | None = None,
+) -> Iterator[Finding]:
+    """Run every finder against one account/region session, yielding findings.
+
+    Each resource type the finders need is described once, all types
+    concurrently, and split by state in memory. A type's finders start as
+    soon as its scan completes, so the report costs about as much as its
+    slowest scan. Finders with an index lookup skip the shared scan and
+    query their index concurrently with it. Each finder's findings are
+    yielded as soon as it finishes, in completion order. The inventory and
+    the snapshot index are only used when the account ID is known, since
+    they are keyed by account and region.
+    """
+    ec2 = get_client(session, "ec2")
+    label = f"{account_id}/{session.region_name}"
+    if account_id == "self":
+        inventory = None
+        snapshot_index = None
+    ctx = ScanContext(session, account_id, session.region_name, args, prices or PriceBook(), snapshot_index)
+    indexed = [finder.uses_index(ctx) for finder in finders]
+    resource_types = list(dict.fromkeys(
+        finder.resource_type for finder, uses_index in zip(finders, indexed) if not uses_index
+    ))
+
+    def _scan(resource_type: str) -> tuple[list[Any], ResourcesByState]:
+        if resource_type in DIRECT_SCANS:
+            return DIRECT_SCANS[resource_type](session), {}
+        state_of = RESOURCE_SPECS[resource_type].state
+        resources = list(describe_resources(ec2, resource_type, inventory, account_id))
+        by_state: ResourcesByState = {}
+        for resource in resources:
+            by_state.setdefault(state_of(resource), []).append(resource)
+        return resources, by_state
+
+    def _find(finder: Finder, resources: list[Any], by_state: ResourcesByState) -> list[Finding]:
+        items = resources if finder.states is None else [r for state in finder.states for r in by_state.get(state, [])]
+        logger.info("[%s] Checking for %s...", label, finder.label)
+        return finder.run(ctx, items)
+
+    def _look_up(finder: Finder) -> list[Finding]:
+        logger.info("[%s] Checking for %s (indexed)...", label, finder.label)
+        return finder.run(ctx, finder.lookup(ctx))
+
+    with ThreadPoolExecutor(max_workers=len(resource_types) + len(finders)) as pool:
+        # Each pending future maps to the resource type it scans or the finder it runs.
+        pending: dict[Future[Any], str | Finder] = {
+            pool.submit(_look_up, finder): finder
+            for finder, uses_index in zip(finders, indexed)
+            if uses_index
+        }
+        pending.update({pool.submit(_scan, resource_type): resource_type for resource_type in resource_types})
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                if isinstance(job, Finder):
+                    try:
+                        yield from future.result()
+                    except Exception as exc:
+                        logger.error("[%s] Checking for %s failed: %s", label, job.label, exc)
+                    continue
+                try:
+                    resources, by_state = future.result()
+                except (ClientError, BotoCoreError) as exc:
+                    logger.error("[%s] Failed to scan %s: %s", label, job, exc)
+                    continue
+                logger.debug("[%s] Scanned %d %s", label, len(resources), job)
+                pending.update({
+                    pool.submit(_find, finder, resources, by_state): finder
+                    for finder, uses_index in zip(finders, indexed)
+                    if finder.resource_type == job and not uses_index
+                })
+
+
+def iter_findings(
+    targets: list[Target],
+    args: argparse.Namespace,
+    inventory: InventoryStore | None = None,
+    prices: PriceBook | None = None,
+    snapshot_index: SnapshotIndex | None = None,
+) -> Iterator[Finding]:
+    """Scan every target on a bounded pool and yield findings tagged with their target.
+
+    Findings are yielded as each finder of each target finishes, in
+    completion order, so a consumer that aggregates them only ever holds
+    the findings it has not consumed yet rather than whole targets.
+    """
+    # Workers hand findings over as they are found; None marks a finished target.
+    results: "queue.SimpleQueue[Finding | None]" = queue.SimpleQueue()
+
+    def _scan(target: Target) -> None:
+        target_account, target_region, target_session = target
+        try:
+            for finding in scan_account(
+                target_session,
+                target_account,
+                args,
+                inventory=inventory,
+                prices=prices,
+                snapshot_index=snapshot_index,
+            ):
+                finding.account_id = target_account
+                finding.region = target_region
+                results.put(finding)
+        except Exception as exc:
+            logger.error("Error scanning %s/%s: %s", target_account, target_region, exc)
+        finally:
+            results.put(None)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(targets) or 1))) as pool:
+        for target in targets:
+            pool.submit(_scan, target)
+        remaining = len(targets)
+        while remaining:
+            finding = results.get()
+            if finding is None:
+                remaining -= 1
+            else:
+                yield finding
+
+
+def report_order(finding: Finding) -> tuple[str, str, str, str]:
+    """Sort key giving a full report a stable order: by target, then resource."""
+    return (finding.account_id, finding.region, finding.resource_type, finding.resource_id)
+
+
+def scan_targets(
+    targets: list[Target],
+    args: argparse.Namespace,
+    inventory: InventoryStore | None = None,
+    prices: PriceBook | None = None,
+    snapshot_index: SnapshotIndex | None = None,
+) -> list[Finding]:
+    """Scan every target and return all findings, in report order."""
+    return sorted(iter_findings(targets, args, inventory, prices, snapshot_index), key=report_order)
+
+
+GROUP_BY_FIELDS = ("type", "account", "region", "az")
+
+
+def group_by_arg(value: str) -> str:
+    """argparse type for --group-by."""
+    if value in GROUP_BY_FIELDS or (value.startswith("tag:") and len(value) > len("tag:")):
+        return value
+    raise argparse.ArgumentTypeError(f"expected one of {', '.join(GROUP_BY_FIELDS)} or tag:KEY, got {value!r}")
+
+
+def group_key(finding: Finding, group_by: str) -> str:
+    """Return the group a finding falls into for a --group-by value."""
+    if group_by.startswith("tag:"):
+        return finding.tags.get(group_by[len("tag:"):]) or "(untagged)"
+    value = {
+        "type": finding.resource_type,
+        "account": finding.account_id,
+        "region": finding.region,
+        "az": finding.az,
+    }[group_by]
+    return value or "(none)"
+
+
+@dataclass(slots=True)
+class GroupTotal:
+    """Number of findings and estimated waste of one group."""
+
+    key: str
+    count: int = 0
+    monthly_waste: float = 0.0
+
+
+class FindingsAggregate:
+    """Totals, per-group totals and the top N findings of a stream, in one pass.
+
+    Only the N largest findings seen so far are kept, in a min-heap whose
+    root is the cheapest of them, so summarizing any number of findings
+    needs memory for the groups and N findings only.
+    """
+
+    def __init__(self, group_by: str | None = None, top: int | None = None) -> None:
+        self.group_by = group_by
+        self.top = top
+        self.count = 0
+        self.monthly_waste = 0.0
+        self.groups: dict[str, GroupTotal] = {}
+        self._heap: list[tuple[float, int, Finding]] = []
+
+    def add(self, finding: Finding) -> None:
+        """Account for one finding."""
+        self.count += 1
+        self.monthly_waste += finding.monthly_waste
+        if self.group_by:
+            key = group_key(finding, self.group_by)
+            total = self.groups.get(key)
+            if total is None:
+                total = self.groups[key] = GroupTotal(key)
+            total.count += 1
+            total.monthly_waste += finding.monthly_waste
+        if self.top:
+            # The negated sequence number breaks ties in favour of earlier
+            # findings and keeps Finding objects out of the comparison.
+            entry = (finding.monthly_waste, -self.count, finding)
+            if len(self._heap) < self.top:
+                heapq.heappush(self._heap, entry)
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+
+    def top_findings(self) -> list[Finding]:
+        """The top N findings, most expensive first."""
+        return [finding for _, _, finding in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def group_totals(self) -> list[GroupTotal]:
+        """Per-group totals, most expensive group first."""
+        return sorted(self.groups.values(), key=lambda total: (-total.monthly_waste, total.key))
+
+
+def write_json(data: Any, args: argparse.Namespace) -> None:
+    """Print a JSON report, or write it to --output."""
+    output = json.dumps(data, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(output)
+        logger.info("JSON report written to %s", args.output)
+    else:
+        print(output)
+
+
+def print_report(
+    findings: Iterable[Finding],
+    args: argparse.Namespace,
+    regions: list[str],
+    account_label: str,
+) -> int:
+    """Print the findings as a table, or write them as JSON with --json.
+
+    With --group-by or --top the findings are consumed as a stream and only
+    the group totals and top N are reported. Returns the number of findings.
+    """
+    org_mode = bool(args.accounts or args.accounts_file)
+    aggregate = FindingsAggregate(args.group_by, args.top)
+    if args.group_by or args.top:
+        listed: list[Finding] = []
+        for finding in findings:
+            aggregate.add(finding)
+        if args.top:
+            listed = aggregate.top_findings()
+    else:
+        listed = sorted(findings, key=report_order)
+        for finding in listed:
+            aggregate.add(finding)
+
+    def _scope(finding: Finding) -> dict[str, str]:
+        scope: dict[str, str] = {}
+        if org_mode:
+            scope["AccountId"] = finding.account_id
+        if args.regions:
+            scope["Region"] = finding.region
+        return scope
+
+    def _group_rows(totals: list[GroupTotal], monthly_waste: Callable[[float], Any]) -> list[dict[str, Any]]:
+        return [
+            {"Group": total.key, "Findings": total.count, "EstMonthlyWaste": monthly_waste(total.monthly_waste)}
+            for total in totals
+        ]
+
+    if args.json:
+        records = [{**_scope(finding), **finding.to_dict()} for finding in listed]
+        if args.group_by or args.top:
+            summary: dict[str, Any] = {
+                "TotalFindings": aggregate.count,
+                "EstMonthlyWaste": round(aggregate.monthly_waste, 2),
+            }
+            if args.group_by:
+                summary["GroupBy"] = args.group_by
+                summary["Groups"] = _group_rows(aggregate.group_totals(), lambda waste: round(waste, 2))
+            if args.top:
+                summary["Top"] = records
+            write_json(summary, args)
+        else:
+            write_json(records, args)
+        return aggregate.count
+
+    print(f"\n{'=' * 80}")
+    print("  AWS Cost Optimization Report")
+    print(f"  Region: {', '.join(regions)} | Account: {account_label}")
+    print(f"  Generated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}")
+    print(f"{'=' * 80}")
+
+    if aggregate.count:
+        if args.group_by:
+            print(f"\n  Estimated monthly waste by {args.group_by}")
+            rows = _group_rows(aggregate.group_totals(), lambda waste: f"${waste:.2f}")
+            print(tabulate(rows, headers="keys", tablefmt="grid", disable_numparse=True))
+        if args.top:
+            print(f"\n  Top {len(listed)} findings by estimated monthly waste")
+        if listed:
+            rows = [{**_scope(finding), **finding.render()} for finding in listed]
+            print(tabulate(rows, headers="keys", tablefmt="grid", maxcolwidths=40, disable_numparse=True))
+        print(f"\n  Total findings: {aggregate.count}")
+        print(f"  Estimated monthly waste: ${aggregate.monthly_waste:.2f}")
+    else:
+        print("\n  No optimization opportunities found. Your AWS account looks efficient!")
+
+    print(f"\n{'=' * 80}")
+    return aggregate.count
+
+
+def cost_params(args: argparse.Namespace) -> dict[str, Any]:
+    """The thresholds and rules that decide what this command line reports as waste."""
+    return {
+        "cpu_threshold": args.cpu_threshold,
+        "snapshot_age": args.snapshot_age,
+        "stopped_days": args.stopped_days,
+        "utilization_days": args.utilization_days,
+        "utilization_rule": [str(rule) for rule in args.utilization_rules or []],
+        "lb_days": args.lb_days,
+        "lb_min_requests": args.lb_min_requests,
+    }
+
+
+def history_scope(args: argparse.Namespace) -> str:
+    """History scope of this command line's runs.
+
+    Runs with other thresholds report different findings, so they are kept
+    apart and a trend only ever compares runs that applied the same ones.
+    """
+    return run_scope({**target_identity(args), "thresholds": cost_params(args)})
+
+
+def recorded(
+    findings: Iterable[Finding],
+    history: FindingsStore | None,
+    args: argparse.Namespace,
+    regions: list[str],
+    account_label: str,
+    run_ts: float | None = None,
+) -> Iterable[Finding]:
+    """Record the findings as one run in the history as they stream past."""
+    if history is None:
+        return findings
+    label = f"{account_label} ({', '.join(regions)})"
+    return history.record(history_scope(args), label, findings, run_ts)
+
+
+def print_trend(history: FindingsStore, args: argparse.Namespace) -> int:
+    """Report waste over the --trend period from the recorded runs of this command's scope."""
+    scope = history_scope(args)
+    latest = history.latest_run(scope)
+    if latest is None:
+        logger.error("No recorded runs for these accounts, regions and thresholds in %s", args.history_db)
+        return 1
+    since = datetime.now(timezone.utc) - timedelta(days=args.trend)
+    runs = history.runs(scope, since.timestamp())
+
+    def _day(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+    # The last run of each day stands for that day.
+    daily = list({_day(run.run_ts): run for run in runs}.values())
+    by_type = args.group_by == "type"
+    type_totals = history.type_totals([run.run_id for run in daily]) if by_type else {}
+    resource_types = sorted({rt for totals in type_totals.values() for rt in totals})
+    current = history.finding_history(latest)
+    new = [item for item in current if item.first_seen >= since.timestamp()]
+    listed = current[:args.top] if args.top else current
+    org_mode = bool(args.accounts or args.accounts_file)
+
+    def _series_row(run: Any, monthly_waste: Callable[[float], Any]) -> dict[str, Any]:
+        row = {"Date": _day(run.run_ts), "Findings": run.findings, "EstMonthlyWaste": monthly_waste(run.monthly_waste)}
+        for resource_type in resource_types:
+            row[resource_type] = monthly_waste(type_totals[run.run_id].get(resource_type, (0, 0.0))[1])
+        return row
+
+    def _finding_row(item: Any, monthly_waste: Callable[[float], Any]) -> dict[str, Any]:
+        return {
+            **({"AccountId": item.account_id} if org_mode else {}),
+            **({"Region": item.region} if args.regions else {}),
+            "ResourceType": item.resource_type,
+            "ResourceId": item.resource_id,
+            "Name": item.name,
+            "FirstSeen": _day(item.first_seen),
+            "DaysOpen": int((latest.run_ts - item.first_seen) // 86400),
+            "EstMonthlyWaste": monthly_waste(item.monthly_waste),
+        }
+
+    new_waste = sum(item.monthly_waste for item in new)
+    if args.json:
+        write_json({
+            "Scope": latest.label,
+            "Since": since.isoformat(),
+            "LatestRun": datetime.fromtimestamp(latest.run_ts, timezone.utc).isoformat(),
+            "Runs": [_series_row(run, lambda waste: round(waste, 2)) for run in daily],
+            "Findings": [_finding_row(item, lambda waste: round(waste, 2)) for item in listed],
+            "NewFindings": len(new),
+            "NewMonthlyWaste": round(new_waste, 2),
+        }, args)
+        return 0
+
+    print(f"\n{'=' * 80}")
+    print(f"  AWS Cost Optimization Trend (last {args.trend} days)")
+    print(f"  Scope: {latest.label} | Runs: {len(runs)}")
+    print(f"  Latest run: {datetime.fromtimestamp(latest.run_ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}")
+    print(f"{'=' * 80}")
+
+    print("\n  Estimated monthly waste over time (last run of each day)")
+    rows = [_series_row(run, lambda waste: f"${waste:.2f}") for run in daily]
+    print(tabulate(rows, headers="keys", tablefmt="grid", disable_numparse=True))
+    if len(daily) > 1:
+        change = daily[-1].monthly_waste - daily[0].monthly_waste
+        print(f"\n  Change since {_day(daily[0].run_ts)}: {'+' if change >= 0 else '-'}${abs(change):.2f}/month")
+
+    if listed:
+        print(f"\n  Current findings by age{f' (oldest {len(listed)})' if args.top else ''}")
+        rows = [_finding_row(item, lambda waste: f"${waste:.2f}") for item in listed]
+        print(tabulate(rows, headers="keys", tablefmt="grid", maxcolwidths=40, disable_numparse=True))
+    print(f"\n  New in the last {args.trend} days: {len(new)} findings, ${new_waste:.2f}/month")
+    print(f"\n{'=' * 80}")
+    return 0
+
+
+def report_via_daemon(client: DaemonClient, args: argparse.Namespace) -> bool:
+    """Print the report served by the inventory daemon.
+
+    Returns False, having printed nothing, if the daemon could not answer,
+    so the caller can fall back to scanning directly.
+    """
+    try:
+        report = client.get("/cost", cost_params(args))
+        findings = [Finding(**record) for record in report["findings"]]
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        logger.warning("Inventory daemon request failed, scanning directly: %s", exc)
+        return False
+    logger.info("Report served by the inventory daemon (generated %s)", report["generated_at"])
+    regions, account_label = report["regions"], report["account_label"]
+    history = open_history(args)
+    try:
+        # The report's timestamp identifies it, so a cached report is recorded once.
+        run_ts = datetime.fromisoformat(report["generated_at"]).timestamp()
+        findings = recorded(findings, history, args, regions, account_label, run_ts)
+        count = print_report(findings, args, regions, account_label)
+    finally:
+        if history is not None:
+            history.close()
+    logger.info("Cost optimization analysis complete. Found %d opportunities.", count)
+    return True
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -242,15 +1036,73 @@ Examples:
   %(prog)s --region us-east-1
   %(prog)s --profile prod --cpu-threshold 15 --snapshot-age 60
   %(prog)s --json --output report.json
+  %(prog)s --group-by tag:Team --top 20
+  %(prog)s --trend 90d --group-by type
+  %(prog)s --utilization-days 30 --utilization-rule 'cpu.p95<20' --utilization-rule 'memory.p95<40'
+  %(prog)s --accounts-file accounts.txt --role-name AuditRole --regions us-east-1,eu-west-1 --workers 32
         """,
     )
     parser.add_argument("--profile", help="AWS CLI profile")
     parser.add_argument("--region", default="us-east-1", help="AWS region (default: us-east-1)")
+    parser.add_argument(
+        "--regions",
+        metavar="all|R1,R2,...",
+        help="Scan several regions ('all' discovers the enabled regions)",
+    )
+    parser.add_argument("--workers", type=positive_int, default=8, help="Account/region scans to run in parallel (default: 8)")
     parser.add_argument("--cpu-threshold", type=float, default=10.0, help="CPU underutilization threshold %% (default: 10)")
+    parser.add_argument(
+        "--utilization-days",
+        type=int,
+        default=14,
+        help="Days of hourly metrics analysed per instance (default: 14)",
+    )
+    parser.add_argument(
+        "--utilization-rule",
+        dest="utilization_rules",
+        action="append",
+        type=rule_arg,
+        metavar="METRIC.STAT<N",
+        help="Flag a running instance only if every rule holds; repeatable. Metrics: "
+             "cpu, memory (CloudWatch agent), network_in, network_out (MB/h); stats: "
+             "mean, p95, p99, peak, trend (per day). Default: cpu.mean<THRESHOLD, cpu.p99<50",
+    )
+    parser.add_argument(
+        "--lb-days",
+        type=int,
+        default=14,
+        help="Days of load balancer traffic analysed (default: 14)",
+    )
+    parser.add_argument(
+        "--lb-min-requests",
+        type=float,
+        default=100.0,
+        metavar="N",
+        help="Flag load balancers with fewer requests (new flows for NLB/GWLB) over --lb-days (default: 100)",
+    )
     parser.add_argument("--snapshot-age", type=int, default=90, help="Snapshot age threshold in days (default: 90)")
     parser.add_argument("--stopped-days", type=int, default=7, help="Days an instance has been stopped (default: 7)")
+    parser.add_argument(
+        "--group-by",
+        type=group_by_arg,
+        metavar="type|account|region|az|tag:KEY",
+        help="Summarize the estimated waste per resource type, account, region, AZ or tag value",
+    )
+    parser.add_argument(
+        "--top",
+        type=positive_int,
+        metavar="N",
+        help="List only the N findings with the highest estimated waste",
+    )
     parser.add_argument("--json", action="store_true", help="Output as JSON")
     parser.add_argument("--output", metavar="FILE", help="Write results to file")
+    add_inventory_arguments(parser)
+    add_snapshot_index_arguments(parser)
+    add_pricing_arguments(parser)
+    add_history_arguments(parser)
+    add_org_arguments(parser)
+    add_stats_arguments(parser)
+    add_daemon_arguments(parser)
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
     return parser
 
@@ -263,65 +1115,63 @@ def main() -> int:
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    logger.info("Starting cost optimization analysis (region=%s)", args.region)
-
-    session = get_session(profile=args.profile, region=args.region)
-    ec2 = session.client("ec2")
-
-    try:
-        sts = session.client("sts")
-        account_id = sts.get_caller_identity()["Account"]
-    except (ClientError, BotoCoreError) as exc:
-        logger.error("Failed to get account ID: %s", exc)
-        account_id = "self"
+    if args.trend:
+        history = open_history(args)
+        if history is None:
+            return 1
+        try:
+            return print_trend(history, args)
+        finally:
+            history.close()
 
-    all_findings: list[dict[str, Any]] = []
-
-    logger.info("Checking for stopped instances...")
-    all_findings.extend(find_stopped_instances(ec2, stopped_days=args.stopped_days))
-
-    logger.info("Checking for underutilized instances...")
-    all_findings.extend(find_underutilized_instances(session, cpu_threshold=args.cpu_threshold))
+    # --refresh, --no-inventory, --no-snapshot-index and --pricing-db change how
+    # the daemon would have to scan and price; the API stats options describe
+    # this process's own calls.
+    local_only = (
+        args.refresh or args.no_inventory or args.no_snapshot_index or args.pricing_db != DEFAULT_PRICING_DB
+        or args.stats or args.stats_json or args.trace
+    )
+    if not local_only:
+        client = connect_daemon(args)
+        if client is not None and report_via_daemon(client, args):
+            return 0
 
-    logger.info("Checking for unattached EBS volumes...")
-    all_findings.extend(find_unattached_volumes(ec2))
+    logger.info("Starting cost optimization analysis (region=%s)", args.region)
 
-    logger.info("Checking for old snapshots...")
-    all_findings.extend(find_old_snapshots(ec2, account_id, age_days=args.snapshot_age))
+    stats = open_stats(args)
+    session = get_session(profile=args.profile, region=args.region)
+    regions = [args.region]
+    if args.regions:
+        try:
+            regions = resolve_regions(session, args.regions)
+        except (ClientError, BotoCoreError) as exc:
+            logger.error("Failed to discover regions, falling back to %s: %s", args.region, exc)
 
-    logger.info("Checking for unattached Elastic IPs...")
-    all_findings.extend(find_unattached_eips(ec2))
+    org_mode = bool(args.accounts or args.accounts_file)
+    targets = build_targets(session, regions, args, lambda region: get_session(profile=args.profile, region=region))
+    if org_mode and not targets:
+        return 1
+    account_label = f"{len({t[0] for t in targets})} accounts" if org_mode else targets[0][0]
 
-    if args.json:
-        output = json.dumps(all_findings, indent=2, default=str)
-        if args.output:
-            with open(args.output, "w", encoding="utf-8") as fh:
-                fh.write(output)
-            logger.info("JSON report written to %s", args.output)
-        else:
-            print(output)
-    else:
-        print(f"\n{'=' * 80}")
-        print("  AWS Cost Optimization Report")
-        print(f"  Region: {args.region} | Account: {account_id}")
-        print(f"  Generated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}")
-        print(f"{'=' * 80}")
-
-        if all_findings:
-            print(tabulate(all_findings, headers="keys", tablefmt="grid", maxcolwidths=40))
-            total_waste = sum(
-                float(f["EstMonthlyWaste"].replace("$", ""))
-                for f in all_findings
-                if "EstMonthlyWaste" in f
-            )
-            print(f"\n  Total findings: {len(all_findings)}")
-            print(f"  Estimated monthly waste: ${total_waste:.2f}")
-        else:
-            print("\n  No optimization opportunities found. Your AWS account looks efficient!")
-
-        print(f"\n{'=' * 80}")
+    inventory = open_inventory(args)
+    snapshot_index = open_snapshot_index(args)
+    prices = open_pricing(args)
+    history = open_history(args)
+    try:
+        findings = iter_findings(targets, args, inventory, prices, snapshot_index)
+        findings = recorded(findings, history, args, regions, account_label)
+        count = print_report(findings, args, regions, account_label)
+    finally:
+        if history is not None:
+            history.close()
+        prices.close()
+        if snapshot_index is not None:
+            snapshot_index.close()
+        if inventory is not None:
+            inventory.close()
 
-    logger.info("Cost optimization analysis complete. Found %d opportunities.", len(all_findings))
+    report_stats(stats, args)
+    logger.info("Cost optimization analysis complete. Found %d opportunities.", count)
     return 0
 
 
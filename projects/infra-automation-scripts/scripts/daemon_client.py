@@ -0,0 +1,87 @@
+"""Client side of the inventory daemon (see inventory_daemon.py).
+
+aws_resource_audit.py and cost_optimizer.py call connect() first. When a
+daemon is listening and serves the same profile, regions and accounts as
+the command line asks for, the report is fetched from it instead of being
+built from AWS in this process; otherwise the script runs as before.
+"""
+
+import argparse
+import json
+import logging
+import os
+import urllib.request
+from typing import Any
+from urllib.parse import urlencode
+
+from aws_org import load_account_ids
+
+logger = logging.getLogger("daemon_client")
+
+DEFAULT_DAEMON_URL = os.environ.get("INFRA_DAEMON_URL", "http://127.0.0.1:8765")
+
+# Seconds to wait for the health check; a local daemon answers in milliseconds.
+CONNECT_TIMEOUT = 0.5
+
+
+def target_identity(args: argparse.Namespace) -> dict[str, Any]:
+    """Describe which accounts and regions a command line targets.
+
+    The daemon publishes the same structure for itself, so a client only
+    uses a daemon whose inventory covers exactly what it would have scanned.
+    """
+    org_mode = bool(args.accounts or args.accounts_file)
+    return {
+        "profile": args.profile,
+        "region": args.region,
+        "regions": args.regions,
+        "accounts": load_account_ids(args.accounts, args.accounts_file) if org_mode else None,
+        "role_name": args.role_name if org_mode else None,
+    }
+
+
+class DaemonClient:
+    """Minimal JSON-over-HTTP client for the daemon's endpoints."""
+
+    def __init__(self, url: str, timeout: float = 300.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, path: str, params: dict[str, Any] | None = None, timeout: float | None = None) -> dict[str, Any]:
+        """GET an endpoint and decode its JSON body.
+
+        Raises OSError (including urllib's URLError/HTTPError) or ValueError.
+        """
+        url = f"{self.url}{path}"
+        if params:
+            url += "?" + urlencode(params, doseq=True)
+        with urllib.request.urlopen(url, timeout=timeout or self.timeout) as response:
+            return json.load(response)
+
+
+def add_daemon_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the inventory daemon options shared by the scripts."""
+    group = parser.add_argument_group("inventory daemon")
+    group.add_argument(
+        "--daemon-url",
+        default=DEFAULT_DAEMON_URL,
+        metavar="URL",
+        help=f"Inventory daemon to use when it is running (default: {DEFAULT_DAEMON_URL}, or $INFRA_DAEMON_URL)",
+    )
+    group.add_argument("--no-daemon", action="store_true", help="Never use the inventory daemon")
+
+
+def connect(args: argparse.Namespace) -> DaemonClient | None:
+    """Return a client if a daemon is running for this command's targets."""
+    if args.no_daemon:
+        return None
+    client = DaemonClient(args.daemon_url)
+    try:
+        health = client.get("/health", timeout=CONNECT_TIMEOUT)
+    except (OSError, ValueError) as exc:
+        logger.debug("No inventory daemon at %s: %s", args.daemon_url, exc)
+        return None
+    if health.get("identity") != target_identity(args):
+        logger.info("Inventory daemon at %s serves other accounts/regions; running locally", args.daemon_url)
+        return None
+    return client
@@ -0,0 +1,362 @@
+"""Local history of cost optimizer findings.
+
+Every cost_optimizer.py run is appended to a SQLite store as one run of
+findings, keyed by the scope it scanned (profile, regions and accounts)
+and the thresholds it applied, so ``--trend`` can show how waste developed
+without calling AWS:
+
+- waste over time, read from per-run totals written with each run;
+- how long each current finding has persisted, from the first run of its
+  current unbroken streak, which each finding carries over from the
+  previous run as it is recorded;
+- which current findings are new within the trend window.
+
+Trend queries never aggregate the raw findings of past runs, so they stay
+fast as years of daily runs across many accounts accumulate.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+logger = logging.getLogger("findings_store")
+
+DEFAULT_HISTORY_DB = os.path.join(os.path.expanduser("~"), ".cache", "infra-automation", "findings.db")
+
+# Findings written (and committed) per batch while a run streams through.
+INSERT_BATCH = 1000
+
+# Runs left pending this long were abandoned by a process that died mid-run.
+STALE_PENDING_RUN = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    label TEXT NOT NULL,
+    run_ts REAL NOT NULL,
+    findings INTEGER NOT NULL,
+    monthly_waste REAL NOT NULL,
+    complete INTEGER NOT NULL,
+    UNIQUE (scope, run_ts)
+);
+CREATE TABLE IF NOT EXISTS run_totals (
+    run_id INTEGER NOT NULL,
+    resource_type TEXT NOT NULL,
+    findings INTEGER NOT NULL,
+    monthly_waste REAL NOT NULL,
+    PRIMARY KEY (run_id, resource_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    run_ts REAL NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    monthly_waste REAL NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_findings_run ON findings (run_id);
+CREATE INDEX IF NOT EXISTS idx_findings_resource ON findings (resource_id, run_ts);
+"""
+
+_PERIOD_RE = re.compile(r"^\s*(\d+)\s*([dw]?)\s*$")
+
+
+def period_arg(value: str) -> int:
+    """argparse type for --trend: a number of days, e.g. 90d or 12w."""
+    match = _PERIOD_RE.match(value)
+    if not match or int(match.group(1)) < 1:
+        raise argparse.ArgumentTypeError(f"expected a period like 90d or 12w, got {value!r}")
+    return int(match.group(1)) * (7 if match.group(2) == "w" else 1)
+
+
+def run_scope(identity: dict[str, Any]) -> str:
+    """Stable key for the accounts and regions a command line targets."""
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@dataclass(slots=True)
+class RunSummary:
+    """Totals of one recorded run."""
+
+    run_id: int
+    run_ts: float
+    label: str
+    findings: int
+    monthly_waste: float
+
+
+@dataclass(slots=True)
+class FindingHistory:
+    """A finding of the latest run and the run its current streak began in."""
+
+    resource_type: str
+    resource_id: str
+    name: str
+    account_id: str
+    region: str
+    monthly_waste: float
+    first_seen: float
+
+
+class FindingsStore:
+    """SQLite history of findings, one run per cost optimizer report."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_DB) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def record(
+        self,
+        scope: str,
+        label: str,
+        findings: Iterable[Any],
+        run_ts: float | None = None,
+    ) -> Iterator[Any]:
+        """Yield the findings unchanged while storing them as one run.
+
+        The run is stored as pending and its findings are committed in
+        batches, so the database is never locked for the length of a scan
+        and other runs can record alongside it. It is marked complete once
+        the stream is exhausted, and discarded if the stream is abandoned
+        or fails part-way; queries only see complete runs. A run already
+        stored for the same scope and timestamp (a daemon report served
+        twice) is not stored again. Database errors are logged and the
+        findings still flow through unrecorded.
+
+        A finding that was in the scope's previous complete run keeps the
+        first_seen it had there; any other starts a new streak at this run.
+        """
+        run_ts = time.time() if run_ts is None else run_ts
+        previous: tuple[int, float] | None = None
+        try:
+            run_id = self._begin_run(scope, label, run_ts)
+            previous = self._previous_run(scope, run_ts)
+        except sqlite3.Error as exc:
+            logger.warning("Not recording this run in %s: %s", self.path, exc)
+            run_id = None
+        if run_id is None:
+            yield from findings
+            return
+
+        totals: dict[str, list[float]] = {}
+        batch: list[tuple[Any, ...]] = []
+        recording = True
+        completed = False
+        try:
+            for finding in findings:
+                batch.append((
+                    run_id,
+                    scope,
+                    run_ts,
+                    finding.resource_type,
+                    finding.resource_id,
+                    finding.name,
+                    finding.account_id,
+                    finding.region,
+                    finding.monthly_waste,
+                ))
+                total = totals.setdefault(finding.resource_type, [0, 0.0])
+                total[0] += 1
+                total[1] += finding.monthly_waste
+                if len(batch) >= INSERT_BATCH:
+                    recording = recording and self._write_batch(batch, previous)
+                    batch.clear()
+                yield finding
+            completed = True
+        finally:
+            if completed and recording and self._complete_run(run_id, batch, previous, totals):
+                logger.info("Recorded %d findings in %s", sum(t[0] for t in totals.values()), self.path)
+            else:
+                self._discard_run(run_id)
+
+    def _begin_run(self, scope: str, label: str, run_ts: float) -> int | None:
+        """Insert a pending run, or return None if this run is already stored."""
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM findings WHERE run_id IN"
+                " (SELECT run_id FROM runs WHERE scope = ? AND complete = 0 AND run_ts < ?)",
+                (scope, run_ts - STALE_PENDING_RUN),
+            )
+            self._conn.execute(
+                "DELETE FROM runs WHERE scope = ? AND complete = 0 AND run_ts < ?",
+                (scope, run_ts - STALE_PENDING_RUN),
+            )
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO runs (scope, label, run_ts, findings, monthly_waste, complete)"
+                " VALUES (?, ?, ?, 0, 0, 0)",
+                (scope, label, run_ts),
+            )
+        if not cursor.rowcount:
+            logger.debug("Run of %s at %s is already recorded", label, run_ts)
+            return None
+        return cursor.lastrowid
+
+    def _previous_run(self, scope: str, run_ts: float) -> tuple[int, float] | None:
+        """(run_id, run_ts) of the scope's last complete run before ``run_ts``, if any."""
+        return self._conn.execute(
+            "SELECT run_id, run_ts FROM runs WHERE scope = ? AND complete = 1 AND run_ts < ?"
+            " ORDER BY run_ts DESC LIMIT 1",
+            (scope, run_ts),
+        ).fetchone()
+
+    def _with_first_seen(
+        self,
+        batch: list[tuple[Any, ...]],
+        previous: tuple[int, float] | None,
+    ) -> list[tuple[Any, ...]]:
+        """Append each row's first_seen, carried over from the previous run or this run's timestamp."""
+        carried: dict[tuple[str, str], float] = {}
+        if previous is not None:
+            resource_ids = sorted({row[4] for row in batch})
+            for start in range(0, len(resource_ids), 500):
+                chunk = resource_ids[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT resource_type, resource_id, first_seen FROM findings"
+                    f" WHERE resource_id IN ({', '.join('?' * len(chunk))}) AND run_ts = ? AND run_id = ?",
+                    (*chunk, previous[1], previous[0]),
+                )
+                for resource_type, resource_id, first_seen in rows:
+                    carried[(resource_type, resource_id)] = first_seen
+        return [(*row, carried.get((row[3], row[4]), row[2])) for row in batch]
+
+    def _write_batch(self, batch: list[tuple[Any, ...]], previous: tuple[int, float] | None) -> bool:
+        """Commit a batch of a pending run's findings; False if the write failed."""
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._with_first_seen(batch, previous),
+                )
+            return True
+        except sqlite3.Error as exc:
+            logger.warning("Failed to record findings in %s, discarding this run: %s", self.path, exc)
+            return False
+
+    def _complete_run(
+        self,
+        run_id: int,
+        batch: list[tuple[Any, ...]],
+        previous: tuple[int, float] | None,
+        totals: dict[str, list[float]],
+    ) -> bool:
+        """Write the last batch and the run's totals, and mark it complete."""
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._with_first_seen(batch, previous),
+                )
+                self._conn.executemany(
+                    "INSERT INTO run_totals VALUES (?, ?, ?, ?)",
+                    [(run_id, resource_type, count, waste) for resource_type, (count, waste) in totals.items()],
+                )
+                self._conn.execute(
+                    "UPDATE runs SET findings = ?, monthly_waste = ?, complete = 1 WHERE run_id = ?",
+                    (sum(t[0] for t in totals.values()), sum(t[1] for t in totals.values()), run_id),
+                )
+            return True
+        except sqlite3.Error as exc:
+            logger.warning("Failed to record findings in %s: %s", self.path, exc)
+            return False
+
+    def _discard_run(self, run_id: int) -> None:
+        """Delete a pending run and the findings written for it so far."""
+        try:
+            with self._conn:
+                self._conn.execute("DELETE FROM findings WHERE run_id = ?", (run_id,))
+                self._conn.execute("DELETE FROM run_totals WHERE run_id = ?", (run_id,))
+                self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        except sqlite3.Error as exc:
+            logger.warning("Failed to discard an incomplete run from %s: %s", self.path, exc)
+
+    def runs(self, scope: str, since: float) -> list[RunSummary]:
+        """Runs of a scope since a timestamp, oldest first."""
+        rows = self._conn.execute(
+            "SELECT run_id, run_ts, label, findings, monthly_waste FROM runs"
+            " WHERE scope = ? AND complete = 1 AND run_ts >= ? ORDER BY run_ts",
+            (scope, since),
+        ).fetchall()
+        return [RunSummary(*row) for row in rows]
+
+    def latest_run(self, scope: str) -> RunSummary | None:
+        """The scope's most recent run, or None if it has none."""
+        row = self._conn.execute(
+            "SELECT run_id, run_ts, label, findings, monthly_waste FROM runs"
+            " WHERE scope = ? AND complete = 1 ORDER BY run_ts DESC LIMIT 1",
+            (scope,),
+        ).fetchone()
+        return None if row is None else RunSummary(*row)
+
+    def type_totals(self, run_ids: list[int]) -> dict[int, dict[str, tuple[int, float]]]:
+        """Per-resource-type (findings, waste) of the given runs."""
+        totals: dict[int, dict[str, tuple[int, float]]] = {run_id: {} for run_id in run_ids}
+        for start in range(0, len(run_ids), 500):
+            chunk = run_ids[start:start + 500]
+            rows = self._conn.execute(
+                "SELECT run_id, resource_type, findings, monthly_waste FROM run_totals"
+                f" WHERE run_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for run_id, resource_type, count, waste in rows:
+                totals[run_id][resource_type] = (count, waste)
+        return totals
+
+    def finding_history(self, run: RunSummary) -> list[FindingHistory]:
+        """The run's findings with the run each current streak began in, longest-standing first."""
+        rows = self._conn.execute(
+            "SELECT resource_type, resource_id, name, account_id, region, monthly_waste, first_seen"
+            " FROM findings WHERE run_id = ?",
+            (run.run_id,),
+        ).fetchall()
+        history = [FindingHistory(*row) for row in rows]
+        history.sort(key=lambda item: (item.first_seen, -item.monthly_waste))
+        return history
+
+
+def add_history_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the findings history options."""
+    group = parser.add_argument_group("findings history")
+    group.add_argument(
+        "--history-db",
+        default=DEFAULT_HISTORY_DB,
+        metavar="FILE",
+        help=f"SQLite store every run's findings are recorded in (default: {DEFAULT_HISTORY_DB})",
+    )
+    group.add_argument("--no-history", action="store_true", help="Do not record this run's findings")
+    group.add_argument(
+        "--trend",
+        type=period_arg,
+        metavar="PERIOD",
+        help="Report waste over the last PERIOD (e.g. 90d, 12w) from recorded runs instead of scanning",
+    )
+
+
+def open_history(args: argparse.Namespace) -> FindingsStore | None:
+    """Open the findings history, or None when disabled or unavailable."""
+    if args.no_history and not args.trend:
+        return None
+    try:
+        return FindingsStore(args.history_db)
+    except (OSError, sqlite3.Error) as exc:
+        logger.warning("Findings history unavailable (%s): %s", args.history_db, exc)
+        return None
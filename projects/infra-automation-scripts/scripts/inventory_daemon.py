@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""Inventory daemon.
+
+Keeps warm sessions, assumed roles and an EC2 inventory for a fixed set of
+accounts and regions, refreshes each resource type in the background on
+its own interval, and serves audit and cost reports from a local HTTP
+endpoint. Reports are rebuilt in the background too, so a request is
+usually answered from memory instead of paying for discovery, role
+assumption and describe calls on every run.
+
+aws_resource_audit.py and cost_optimizer.py use the daemon automatically
+when it serves the profile, regions and accounts they were asked for (see
+daemon_client.py); pass --no-daemon to bypass it.
+
+Endpoints (all GET, JSON responses):
+  /health                                        identity and job status
+  /audit?sections=ec2,ebs&filter=tag:Team=x      audit report
+  /cost?cpu_threshold=10&snapshot_age=90&stopped_days=7&utilization_days=14
+       &utilization_rule=cpu.p95<20              cost report
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_org import Target, add_org_arguments, build_targets, get_client, resolve_regions
+from aws_resource_audit import (
+    AUDIT_SECTIONS,
+    DEFAULT_CACHE_DIR,
+    AuditFilters,
+    build_audit_sections,
+    filter_arg,
+    get_session,
+    run_audit,
+    section_supports,
+)
+from cli_args import positive_int
+from cost_optimizer import scan_targets
+from daemon_client import target_identity
+from inventory_store import DEFAULT_TTLS, RESOURCE_SPECS, InventoryStore
+from pricing_catalog import add_pricing_arguments, open_pricing
+from snapshot_index import add_snapshot_index_arguments, open_snapshot_index
+from utilization import UtilizationRule
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger("inventory_daemon")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Cost thresholds of the background-warmed report; cost_optimizer.py's defaults.
+DEFAULT_COST_PARAMS: dict[str, float] = {
+    "cpu_threshold": 10.0,
+    "snapshot_age": 90,
+    "stopped_days": 7,
+    "utilization_days": 14,
+    "lb_days": 14,
+    "lb_min_requests": 100.0,
+}
+
+
+@dataclass
+class Job:
+    """A background task that re-runs a fixed interval after it finishes."""
+
+    name: str
+    interval: float
+    func: Callable[[], Any]
+    runs: int = 0
+    failures: int = 0
+    last_run: float | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+
+    def run(self) -> None:
+        """Run once, recording the outcome; errors never escape."""
+        started = time.perf_counter()
+        try:
+            self.func()
+            self.last_error = None
+        except Exception as exc:
+            logger.error("Job %s failed: %s", self.name, exc)
+            self.failures += 1
+            self.last_error = str(exc)
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_duration = time.perf_counter() - started
+
+    def status(self) -> dict[str, Any]:
+        """Return the job's state for /health."""
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": datetime.fromtimestamp(self.last_run, timezone.utc).isoformat() if self.last_run else None,
+            "last_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Run jobs on a bounded worker pool from a time-ordered heap.
+
+    A job is rescheduled only once its run finishes, so a slow refresh
+    never overlaps with itself however short its interval.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.jobs: list[Job] = []
+        self._queue: list[tuple[float, int, Job]] = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+
+    def add(self, job: Job, delay: float = 0.0) -> None:
+        """Register a job, first running ``delay`` seconds from now."""
+        with self._cond:
+            self.jobs.append(job)
+            self._push(job, delay)
+
+    def _push(self, job: Job, delay: float) -> None:
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._order), job))
+        self._cond.notify()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scheduling and wait for running jobs to finish."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _loop(self) -> None:
+        with self._cond:
+            while not self._stopping:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                due, _, job = self._queue[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                self._pool.submit(self._run, job)
+
+    def _run(self, job: Job) -> None:
+        job.run()
+        with self._cond:
+            if not self._stopping:
+                self._push(job, job.interval)
+
+
+class ReportCache:
+    """Built reports keyed by their parameters.
+
+    Concurrent requests for the same stale report wait for one build
+    instead of each scanning AWS.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[Any, ...], tuple[float, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[Any, ...], threading.Lock] = {}
+
+    def get(self, key: tuple[Any, ...], max_age: float, build: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+        """Return the cached report if younger than ``max_age``, else rebuild it."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= max_age:
+                report = {**build(), "generated_at": datetime.now(timezone.utc).isoformat()}
+                entry = (time.monotonic(), report)
+                self._entries[key] = entry
+            return entry[1]
+
+
+class InventoryDaemon:
+    """Warm state for one set of targets plus the jobs that keep it fresh."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.org_mode = bool(args.accounts or args.accounts_file)
+        self.identity = target_identity(args)
+        self.started_at = datetime.now(timezone.utc).isoformat()
+
+        session = get_session(profile=args.profile, region=args.region)
+        self.regions = [args.region]
+        if args.regions:
+            try:
+                self.regions = resolve_regions(session, args.regions)
+            except (ClientError, BotoCoreError) as exc:
+                logger.error("Failed to discover regions, falling back to %s: %s", args.region, exc)
+        self.targets: list[Target] = build_targets(
+            session, self.regions, args, lambda region: get_session(profile=args.profile, region=region),
+        )
+
+        ttls = {
+            resource_type: max(DEFAULT_TTLS[resource_type], int(2 * interval))
+            for resource_type, interval in args.intervals.items()
+        }
+        self.inventory = InventoryStore(args.inventory_db, ttls=ttls)
+        self.snapshot_index = open_snapshot_index(args)
+        self.prices = open_pricing(args)
+        self.reports = ReportCache()
+        self.scheduler = Scheduler(args.workers)
+
+    @property
+    def account_label(self) -> str:
+        if self.org_mode:
+            return f"{len({target[0] for target in self.targets})} accounts"
+        return self.targets[0][0] if self.targets else "self"
+
+    def audit_targets(self) -> list[tuple[dict[str, str], boto3.Session]]:
+        """Return the targets in run_audit's (scope, session) form."""
+        return [
+            (
+                {
+                    **({"AccountId": account_id} if self.org_mode else {}),
+                    **({"Region": region} if self.args.regions else {}),
+                },
+                session,
+            )
+            for account_id, region, session in self.targets
+        ]
+
+    def schedule(self) -> None:
+        """Register the refresh and report jobs and start the scheduler."""
+        for account_id, region, session in self.targets:
+            # Without an account ID the inventory has no scope to store under.
+            if account_id == "self":
+                continue
+            scope = self.inventory.scope(account_id, region)
+            for resource_type, interval in self.args.intervals.items():
+                self.scheduler.add(Job(
+                    f"refresh {resource_type} {scope}",
+                    interval,
+                    lambda s=session, sc=scope, rt=resource_type: self.inventory.refresh(
+                        get_client(s, "ec2"), sc, rt, self.args.page_size,
+                    ),
+                ))
+            if self.snapshot_index is not None:
+                # sync() fetches only new snapshots, reconciling once a day.
+                self.scheduler.add(Job(
+                    f"sync snapshot index {scope}",
+                    self.snapshot_index.sync_interval,
+                    lambda s=session, sc=scope: self.snapshot_index.sync(
+                        get_client(s, "ec2"), sc, self.args.page_size,
+                    ),
+                ))
+        sections = list(AUDIT_SECTIONS)
+        self.scheduler.add(Job(
+            "report audit",
+            self.args.report_interval,
+            lambda: self.audit_report(sections, {}, max_age=0),
+        ))
+        self.scheduler.add(Job(
+            "report cost",
+            self.args.cost_interval,
+            lambda: self.cost_report(DEFAULT_COST_PARAMS, max_age=0),
+        ))
+        self.scheduler.start()
+
+    def audit_report(self, sections: list[str], filters: AuditFilters, max_age: float | None = None) -> dict[str, Any]:
+        """Return the audit report for the given sections and filters."""
+
+        def _build() -> dict[str, Any]:
+            started = time.perf_counter()
+            runs = run_audit(
+                self.audit_targets(),
+                sections,
+                workers=self.args.workers,
+                audit_sections=build_audit_sections(self.args, self.inventory, filters or None),
+            )
+            return {
+                "wall_time": time.perf_counter() - started,
+                "runs": [
+                    {
+                        "section_key": run.section_key,
+                        "scope": run.scope,
+                        "title": run.title,
+                        "count": run.count,
+                        "elapsed": run.elapsed,
+                        "failed": run.failed,
+                        "rows": list(run.rendered()),
+                    }
+                    for run in runs
+                ],
+            }
+
+        key = ("audit", tuple(sections), tuple(sorted((k, tuple(v)) for k, v in filters.items())))
+        return self.reports.get(key, self.args.report_interval if max_age is None else max_age, _build)
+
+    def cost_report(
+        self,
+        params: dict[str, float],
+        rules: list[UtilizationRule] | None = None,
+        max_age: float | None = None,
+    ) -> dict[str, Any]:
+        """Return the cost report for the given thresholds and utilization rules."""
+
+        def _build() -> dict[str, Any]:
+            scan_args = argparse.Namespace(**{**vars(self.args), **params, "utilization_rules": rules or None})
+            findings = scan_targets(self.targets, scan_args, self.inventory, self.prices, self.snapshot_index)
+            return {
+                "regions": self.regions,
+                "account_label": self.account_label,
+                "findings": [asdict(finding) for finding in findings],
+            }
+
+        key = ("cost", *(params[name] for name in DEFAULT_COST_PARAMS), *map(str, rules or []))
+        return self.reports.get(key, self.args.cost_interval if max_age is None else max_age, _build)
+
+    def handle_health(self, query: dict[str, list[str]]) -> dict[str, Any]:
+        return {
+            "identity": self.identity,
+            "started_at": self.started_at,
+            "targets": len(self.targets),
+            "regions": self.regions,
+            "jobs": [job.status() for job in self.scheduler.jobs],
+        }
+
+    def handle_audit(self, query: dict[str, list[str]]) -> dict[str, Any]:
+        sections = [key for key in ",".join(query.get("sections", [])).split(",") if key] or list(AUDIT_SECTIONS)
+        unknown = [key for key in sections if key not in AUDIT_SECTIONS]
+        if unknown:
+            raise ValueError(f"unknown sections: {', '.join(unknown)}")
+        filters: AuditFilters = {}
+        for raw in query.get("filter", []):
+            try:
+                key, values = filter_arg(raw)
+            except argparse.ArgumentTypeError as exc:
+                raise ValueError(str(exc)) from exc
+            filters.setdefault(key, []).extend(values)
+        sections = [key for key in sections if section_supports(key, filters)]
+        if not sections:
+            raise ValueError("none of the selected sections support the given filters")
+        return self.audit_report(sections, filters)
+
+    def handle_cost(self, query: dict[str, list[str]]) -> dict[str, Any]:
+        params = {
+            name: type(default)(query[name][0]) if name in query else default
+            for name, default in DEFAULT_COST_PARAMS.items()
+        }
+        rules = [UtilizationRule.parse(text) for text in query.get("utilization_rule", [])]
+        return self.cost_report(params, rules)
+
+    def routes(self) -> dict[str, Callable[[dict[str, list[str]]], dict[str, Any]]]:
+        return {"/health": self.handle_health, "/audit": self.handle_audit, "/cost": self.handle_cost}
+
+    def close(self) -> None:
+        self.scheduler.stop()
+        self.inventory.close()
+        if self.snapshot_index is not None:
+            self.snapshot_index.close()
+        self.prices.close()
+
+
+def make_handler(daemon: InventoryDaemon) -> type[BaseHTTPRequestHandler]:
+    """Build the request handler class bound to a daemon."""
+    routes = daemon.routes()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            route = routes.get(url.path)
+            if route is None:
+                self._send(404, {"error": f"unknown path {url.path}"})
+                return
+            try:
+                self._send(200, route(parse_qs(url.query)))
+            except ValueError as exc:
+                self._send(400, {"error": str(exc)})
+            except Exception as exc:
+                logger.exception("Error serving %s", self.path)
+                self._send(500, {"error": str(exc)})
+
+        def _send(self, status: int, body: dict[str, Any]) -> None:
+            payload = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("%s %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def interval_arg(value: str) -> tuple[str, float]:
+    """argparse type for --interval TYPE=SECONDS."""
+    resource_type, sep, raw = value.partition("=")
+    if not sep or resource_type not in RESOURCE_SPECS:
+        raise argparse.ArgumentTypeError(
+            f"expected TYPE=SECONDS with TYPE one of {', '.join(RESOURCE_SPECS)}, got {value!r}"
+        )
+    try:
+        seconds = float(raw)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid seconds in {value!r}")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"interval must be > 0, got {value!r}")
+    return resource_type, seconds
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the CLI argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Keep an AWS inventory warm and serve reports from a local endpoint.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""\
+Examples:
+  %(prog)s --region us-east-1
+  %(prog)s --regions all --workers 20 --interval instances=120 --interval volumes=600
+  %(prog)s --accounts-file accounts.txt --role-name AuditRole --regions all --port 8800
+  %(prog)s --inventory-db ~/.cache/infra-automation/daemon.db --report-interval 120
+        """,
+    )
+    parser.add_argument("--profile", help="AWS CLI profile to use")
+    parser.add_argument("--region", default="us-east-1", help="AWS region (default: us-east-1)")
+    parser.add_argument(
+        "--regions",
+        metavar="all|R1,R2,...",
+        help="Serve several regions ('all' discovers the regions enabled for the account)",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=8,
+        metavar="N",
+        help="Concurrent refresh jobs, and targets scanned in parallel per report (default: 8)",
+    )
+    parser.add_argument(
+        "--inventory-db",
+        default=":memory:",
+        metavar="FILE",
+        help="SQLite inventory to keep warm (default: in memory)",
+    )
+    parser.add_argument(
+        "--interval",
+        dest="interval_overrides",
+        action="append",
+        type=interval_arg,
+        default=[],
+        metavar="TYPE=SECONDS",
+        help="Background refresh interval per resource type; repeatable (default: half of each type's "
+             "inventory TTL; snapshots only with --no-snapshot-index, the index is synced instead)",
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="Rebuild audit reports this often; requests reuse younger ones (default: 300)",
+    )
+    parser.add_argument(
+        "--cost-interval",
+        type=float,
+        default=3600.0,
+        metavar="SECONDS",
+        help="Rebuild cost reports this often; requests reuse younger ones (default: 3600)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=positive_int,
+        metavar="N",
+        help="Resources per describe call (clamped to each API's limits)",
+    )
+    parser.add_argument(
+        "--s3-lookup-workers",
+        type=positive_int,
+        default=16,
+        metavar="N",
+        help="Concurrent S3 bucket location lookups (default: 16)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        metavar="DIR",
+        help=f"Directory for persistent lookup caches (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write persistent lookup caches")
+    add_snapshot_index_arguments(parser)
+    add_pricing_arguments(parser)
+    add_org_arguments(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
+    return parser
+
+
+def main() -> int:
+    """Run the inventory daemon until interrupted."""
+    parser = build_parser()
+    args = parser.parse_args()
+    # Cost reports read snapshots from the snapshot index, which has its own
+    # sync job; refreshing the full list too is only needed without it.
+    args.intervals = {
+        resource_type: ttl / 2
+        for resource_type, ttl in DEFAULT_TTLS.items()
+        if resource_type != "snapshots" or args.no_snapshot_index
+    }
+    args.intervals.update(args.interval_overrides)
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    daemon = InventoryDaemon(args)
+    if (args.accounts or args.accounts_file) and not daemon.targets:
+        return 1
+    try:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(daemon))
+    except OSError as exc:
+        logger.error("Cannot listen on %s:%d: %s", args.host, args.port, exc)
+        daemon.close()
+        return 1
+    server.daemon_threads = True
+
+    # serve_forever() must be stopped from another thread.
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    daemon.schedule()
+    logger.info(
+        "Serving %d targets (regions=%s) on http://%s:%d",
+        len(daemon.targets),
+        ",".join(daemon.regions),
+        args.host,
+        args.port,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Shutting down...")
+        server.server_close()
+        daemon.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
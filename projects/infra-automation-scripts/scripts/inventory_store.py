@@ -0,0 +1,506 @@
+"""Local EC2 resource inventory cache.
+
+A SQLite-backed store of describe_instances / describe_volumes /
+describe_snapshots / describe_addresses results, shared by
+aws_resource_audit.py, cost_optimizer.py and backup_manager.py. Each
+(account, region, resource type) is refreshed from AWS only when its entry
+is older than the type's TTL or a refresh is forced; every other read is
+answered from indexed local tables.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger("inventory_store")
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "infra-automation", "inventory.db")
+
+# Seconds an inventory snapshot stays fresh, per resource type.
+DEFAULT_TTLS: dict[str, int] = {
+    "instances": 15 * 60,
+    "volumes": 15 * 60,
+    "snapshots": 60 * 60,
+    "addresses": 15 * 60,
+}
+
+# Resources written per batch while a refresh streams in. Batches land in
+# a staging scope that replaces the live rows in one short transaction, so
+# neither memory nor the write lock grows with the resource count.
+REFRESH_BATCH = 1000
+
+# Each refresh stages under its own "<scope>:refreshing:<started>:<id>", so
+# refreshes of one scope from several processes never touch each other's
+# rows. Staged rows older than STALE_STAGING were left by a dead refresh.
+STAGING_MARKER = ":refreshing:"
+STALE_STAGING = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class ResourceSpec:
+    """How to fetch and index one EC2 resource type."""
+
+    operation: str
+    result_key: str
+    id_key: str
+    state: Callable[[dict[str, Any]], str]
+    subtype: Callable[[dict[str, Any]], str]
+    az: Callable[[dict[str, Any]], str]
+    state_filter: str | None = None
+    subtype_filter: str | None = None
+    az_filter: str | None = None
+    paginated: bool = True
+    max_page_size: int = 1000
+    list_kwargs: tuple[tuple[str, Any], ...] = ()
+
+
+RESOURCE_SPECS: dict[str, ResourceSpec] = {
+    "instances": ResourceSpec(
+        operation="describe_instances",
+        result_key="Reservations",
+        id_key="InstanceId",
+        state=lambda r: r["State"]["Name"],
+        subtype=lambda r: r.get("InstanceType", ""),
+        az=lambda r: r.get("Placement", {}).get("AvailabilityZone", ""),
+        state_filter="instance-state-name",
+        subtype_filter="instance-type",
+        az_filter="availability-zone",
+    ),
+    "volumes": ResourceSpec(
+        operation="describe_volumes",
+        result_key="Volumes",
+        id_key="VolumeId",
+        state=lambda r: r.get("State", ""),
+        subtype=lambda r: r.get("VolumeType", ""),
+        az=lambda r: r.get("AvailabilityZone", ""),
+        state_filter="status",
+        subtype_filter="volume-type",
+        az_filter="availability-zone",
+        max_page_size=500,
+    ),
+    "snapshots": ResourceSpec(
+        operation="describe_snapshots",
+        result_key="Snapshots",
+        id_key="SnapshotId",
+        state=lambda r: r.get("State", ""),
+        subtype=lambda r: r.get("StorageTier", ""),
+        az=lambda r: "",
+        state_filter="status",
+        list_kwargs=(("OwnerIds", ("self",)),),
+    ),
+    "addresses": ResourceSpec(
+        operation="describe_addresses",
+        result_key="Addresses",
+        id_key="AllocationId",
+        state=lambda r: "associated" if r.get("AssociationId") else "unassociated",
+        subtype=lambda r: r.get("Domain", ""),
+        az=lambda r: r.get("NetworkBorderGroup", ""),
+        subtype_filter="domain",
+        az_filter="network-border-group",
+        paginated=False,
+    ),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    scope TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    subtype TEXT NOT NULL,
+    az TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (scope, resource_type, resource_id)
+);
+CREATE INDEX IF NOT EXISTS idx_resources_state ON resources (scope, resource_type, state);
+CREATE INDEX IF NOT EXISTS idx_resources_subtype ON resources (scope, resource_type, subtype);
+CREATE INDEX IF NOT EXISTS idx_resources_az ON resources (scope, resource_type, az);
+CREATE TABLE IF NOT EXISTS resource_tags (
+    scope TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resource_tags ON resource_tags (scope, resource_type, key, value, resource_id);
+CREATE TABLE IF NOT EXISTS refreshes (
+    scope TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (scope, resource_type)
+);
+"""
+
+
+def _encode(value: Any) -> Any:
+    """JSON default hook that keeps datetimes round-trippable."""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: dict[str, Any]) -> Any:
+    """JSON object hook that restores datetimes written by _encode."""
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def as_list(value: str | list[str] | None) -> list[str] | None:
+    """Normalize a filter value that may be a single string or a list."""
+    return [value] if isinstance(value, str) else value
+
+
+def fetch_resources(
+    client: Any,
+    resource_type: str,
+    state: str | list[str] | None = None,
+    subtype: str | list[str] | None = None,
+    az: str | list[str] | None = None,
+    tags: dict[str, str | list[str]] | None = None,
+    resource_ids: list[str] | None = None,
+    page_size: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield resources of one type directly from the EC2 API, page by page.
+
+    Filters are pushed down to the API where it supports them and applied
+    client-side otherwise. describe_instances reservations are flattened.
+    ``page_size`` sets MaxResults on paginated calls, clamped to the range
+    the API accepts; it is ignored when looking up explicit IDs, which the
+    API does not allow together with MaxResults.
+    """
+    spec = RESOURCE_SPECS[resource_type]
+    kwargs: dict[str, Any] = {key: list(value) for key, value in spec.list_kwargs}
+    filters: list[dict[str, Any]] = []
+    checks: list[Callable[[dict[str, Any]], bool]] = []
+    for values, name, attr in (
+        (as_list(state), spec.state_filter, spec.state),
+        (as_list(subtype), spec.subtype_filter, spec.subtype),
+        (as_list(az), spec.az_filter, spec.az),
+    ):
+        if values is None:
+            continue
+        if name:
+            filters.append({"Name": name, "Values": values})
+        else:
+            checks.append(lambda r, attr=attr, values=values: attr(r) in values)
+    for key, values in (tags or {}).items():
+        filters.append({"Name": f"tag:{key}", "Values": as_list(values)})
+    if filters:
+        kwargs["Filters"] = filters
+    if resource_ids:
+        kwargs[f"{spec.id_key}s"] = resource_ids
+
+    if spec.paginated:
+        pagination: dict[str, int] = {}
+        if page_size and not resource_ids:
+            pagination["PageSize"] = max(5, min(page_size, spec.max_page_size))
+        pages: Iterable[dict[str, Any]] = client.get_paginator(spec.operation).paginate(
+            PaginationConfig=pagination, **kwargs
+        )
+    else:
+        pages = [getattr(client, spec.operation)(**kwargs)]
+
+    for page in pages:
+        for item in page.get(spec.result_key, []):
+            for resource in item["Instances"] if resource_type == "instances" else (item,):
+                if all(check(resource) for check in checks):
+                    yield resource
+
+
+class InventoryStore:
+    """SQLite inventory of EC2 resources keyed by account, region and type.
+
+    Safe to share between worker threads: writes go through one connection
+    guarded by a lock, queries stream from a per-thread read connection, and
+    concurrent readers of the same stale entry wait for a single refresh
+    instead of each calling AWS.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        ttls: dict[str, int] | None = None,
+        force_refresh: bool = False,
+    ) -> None:
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.force_refresh = force_refresh
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._key_locks: dict[tuple[str, str], threading.RLock] = {}
+        self._forced: set[tuple[str, str]] = set()
+        self._accounts: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+
+    def close(self) -> None:
+        """Close the underlying database connections."""
+        with self._lock:
+            for reader in self._readers:
+                reader.close()
+            self._conn.close()
+
+    def _reader(self) -> sqlite3.Connection | None:
+        """Return this thread's read connection (None for in-memory stores).
+
+        WAL mode lets readers stream rows without holding the write lock or
+        seeing a half-applied refresh.
+        """
+        if self.path == ":memory:":
+            return None
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._local.reader = reader
+            with self._lock:
+                self._readers.append(reader)
+        return reader
+
+    def account_id(self, sts_client: Any) -> str:
+        """Return the account ID behind an STS client (one call per client)."""
+        with self._lock:
+            if sts_client not in self._accounts:
+                self._accounts[sts_client] = sts_client.get_caller_identity()["Account"]
+            return self._accounts[sts_client]
+
+    @staticmethod
+    def scope(account_id: str, region: str) -> str:
+        """Return the key under which an account/region's inventory is stored."""
+        return f"{account_id}:{region}"
+
+    def age(self, scope: str, resource_type: str) -> float | None:
+        """Seconds since the entry was refreshed, or None if never fetched."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT refreshed_at FROM refreshes WHERE scope = ? AND resource_type = ?",
+                (scope, resource_type),
+            ).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def is_fresh(self, scope: str, resource_type: str) -> bool:
+        """Whether an entry exists and is younger than its TTL."""
+        age = self.age(scope, resource_type)
+        return age is not None and age < self.ttls[resource_type]
+
+    def invalidate(self, scope: str, resource_type: str) -> None:
+        """Mark an entry stale, e.g. after the caller created or deleted resources."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM refreshes WHERE scope = ? AND resource_type = ?",
+                (scope, resource_type),
+            )
+
+    def _key_lock(self, scope: str, resource_type: str) -> threading.RLock:
+        """Return the lock serializing refreshes of one entry."""
+        with self._lock:
+            return self._key_locks.setdefault((scope, resource_type), threading.RLock())
+
+    def _delete_rows(self, scope: str, resource_type: str) -> None:
+        """Delete an entry's resources and tags; the caller holds the write lock."""
+        params = (scope, resource_type)
+        self._conn.execute("DELETE FROM resources WHERE scope = ? AND resource_type = ?", params)
+        self._conn.execute("DELETE FROM resource_tags WHERE scope = ? AND resource_type = ?", params)
+
+    def _write_batch(self, rows: list[tuple[Any, ...]], tag_rows: list[tuple[Any, ...]]) -> None:
+        """Insert resource and tag rows; the caller holds the write lock."""
+        self._conn.executemany("INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self._conn.executemany("INSERT INTO resource_tags VALUES (?, ?, ?, ?, ?)", tag_rows)
+
+    def _delete_stale_staging(self, scope: str, resource_type: str) -> None:
+        """Drop rows staged for an entry by refreshes that died long ago."""
+        prefix = scope + STAGING_MARKER
+        # Every staging scope sorts between the prefix and the prefix with its last ':' bumped to ';'.
+        staged = self._conn.execute(
+            "SELECT DISTINCT scope FROM resources WHERE scope > ? AND scope < ? AND resource_type = ?",
+            (prefix, prefix[:-1] + ";", resource_type),
+        ).fetchall()
+        cutoff = time.time() - STALE_STAGING
+        for (staging,) in staged:
+            started = staging[len(prefix):].partition(":")[0]
+            if not started.isdigit() or int(started) < cutoff:
+                self._delete_rows(staging, resource_type)
+
+    def refresh(self, client: Any, scope: str, resource_type: str, page_size: int | None = None) -> int:
+        """Re-fetch one resource type from AWS and replace its stored rows.
+
+        Pages are written in batches of REFRESH_BATCH to this refresh's own
+        staging scope as they arrive; readers keep seeing the previous rows
+        until the last batch is in and the staged rows are swapped in.
+        """
+        spec = RESOURCE_SPECS[resource_type]
+        started = time.perf_counter()
+        staging = f"{scope}{STAGING_MARKER}{int(time.time())}:{uuid.uuid4().hex}"
+        count = 0
+        rows: list[tuple[Any, ...]] = []
+        tag_rows: list[tuple[Any, ...]] = []
+        with self._key_lock(scope, resource_type):
+            try:
+                with self._lock, self._conn:
+                    self._delete_stale_staging(scope, resource_type)
+                for resource in fetch_resources(client, resource_type, page_size=page_size):
+                    resource_id = resource.get(spec.id_key) or resource.get("PublicIp", "")
+                    rows.append((
+                        staging,
+                        resource_type,
+                        resource_id,
+                        spec.state(resource),
+                        spec.subtype(resource),
+                        spec.az(resource),
+                        json.dumps(resource, default=_encode),
+                    ))
+                    tag_rows.extend(
+                        (staging, resource_type, resource_id, tag["Key"], tag["Value"])
+                        for tag in resource.get("Tags", [])
+                    )
+                    if len(rows) >= REFRESH_BATCH:
+                        with self._lock, self._conn:
+                            self._write_batch(rows, tag_rows)
+                        count += len(rows)
+                        rows, tag_rows = [], []
+
+                with self._lock, self._conn:
+                    self._write_batch(rows, tag_rows)
+                    count += len(rows)
+                    self._delete_rows(scope, resource_type)
+                    params = (scope, staging, resource_type)
+                    self._conn.execute(
+                        "UPDATE resources SET scope = ? WHERE scope = ? AND resource_type = ?", params,
+                    )
+                    self._conn.execute(
+                        "UPDATE resource_tags SET scope = ? WHERE scope = ? AND resource_type = ?", params,
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?)",
+                        (scope, resource_type, time.time()),
+                    )
+            except BaseException:
+                with self._lock, self._conn:
+                    self._delete_rows(staging, resource_type)
+                raise
+        logger.info(
+            "Refreshed %s for %s: %d resources in %.2fs",
+            resource_type,
+            scope,
+            count,
+            time.perf_counter() - started,
+        )
+        return count
+
+    def ensure_fresh(self, client: Any, scope: str, resource_type: str, page_size: int | None = None) -> None:
+        """Refresh an entry if it is stale, or once per run when forced."""
+        key = (scope, resource_type)
+        with self._key_lock(scope, resource_type):
+            forced = self.force_refresh and key not in self._forced
+            if forced or not self.is_fresh(scope, resource_type):
+                self.refresh(client, scope, resource_type, page_size)
+                self._forced.add(key)
+
+    def query(
+        self,
+        scope: str,
+        resource_type: str,
+        state: str | list[str] | None = None,
+        subtype: str | list[str] | None = None,
+        az: str | list[str] | None = None,
+        tags: dict[str, str | list[str]] | None = None,
+        resource_ids: list[str] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield stored resources matching the given indexed filters."""
+        sql = "SELECT data FROM resources r WHERE scope = ? AND resource_type = ?"
+        params: list[Any] = [scope, resource_type]
+        for column, values in (("state", as_list(state)), ("subtype", as_list(subtype)), ("az", as_list(az))):
+            if values is not None:
+                sql += f" AND {column} IN ({', '.join('?' * len(values))})"
+                params.extend(values)
+        if resource_ids:
+            sql += f" AND resource_id IN ({', '.join('?' * len(resource_ids))})"
+            params.extend(resource_ids)
+        for key, value in (tags or {}).items():
+            values = as_list(value)
+            sql += (
+                " AND EXISTS (SELECT 1 FROM resource_tags t WHERE t.scope = r.scope"
+                " AND t.resource_type = r.resource_type AND t.key = ?"
+                f" AND t.value IN ({', '.join('?' * len(values))})"
+                " AND t.resource_id = r.resource_id)"
+            )
+            params.extend([key, *values])
+        reader = self._reader()
+        if reader is None:
+            with self._lock:
+                rows: Iterable[tuple[str]] = self._conn.execute(sql, params).fetchall()
+        else:
+            rows = reader.execute(sql, params)
+        for (data,) in rows:
+            yield json.loads(data, object_hook=_decode)
+
+    def describe(
+        self,
+        client: Any,
+        account_id: str,
+        resource_type: str,
+        page_size: int | None = None,
+        **filters: Any,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield resources for the client's region, refreshing from AWS if stale."""
+        scope = self.scope(account_id, client.meta.region_name)
+        self.ensure_fresh(client, scope, resource_type, page_size)
+        return self.query(scope, resource_type, **filters)
+
+
+def describe_resources(
+    client: Any,
+    resource_type: str,
+    inventory: InventoryStore | None = None,
+    account_id: str | None = None,
+    page_size: int | None = None,
+    **filters: Any,
+) -> Iterator[dict[str, Any]]:
+    """Read resources from the inventory when available, else from the API.
+
+    Filters are answered from the inventory's indexes, or pushed down to the
+    API when there is no inventory. ``page_size`` only affects API calls.
+    A stale or missing entry is refreshed in full, whatever the filters, so
+    the first filtered read of a type (e.g. with --filter) lists every
+    resource of it; later reads within the TTL are answered locally.
+    """
+    if inventory is not None and account_id:
+        return inventory.describe(client, account_id, resource_type, page_size, **filters)
+    return fetch_resources(client, resource_type, page_size=page_size, **filters)
+
+
+def add_inventory_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the inventory cache options shared by the scripts."""
+    group = parser.add_argument_group("inventory cache")
+    group.add_argument(
+        "--inventory-db",
+        default=DEFAULT_DB_PATH,
+        metavar="FILE",
+        help=f"SQLite inventory cache (default: {DEFAULT_DB_PATH})",
+    )
+    group.add_argument("--refresh", action="store_true", help="Re-fetch inventory from AWS, ignoring TTLs")
+    group.add_argument("--no-inventory", action="store_true", help="Always query AWS directly")
+
+
+def open_inventory(args: argparse.Namespace) -> InventoryStore | None:
+    """Open the inventory selected on the command line, or None if disabled."""
+    if args.no_inventory:
+        return None
+    try:
+        return InventoryStore(args.inventory_db, force_refresh=args.refresh)
+    except (OSError, sqlite3.Error) as exc:
+        logger.warning("Inventory cache unavailable (%s), querying AWS directly: %s", args.inventory_db, exc)
+        return None
@@ -0,0 +1,227 @@
+"""Load balancer inventory and traffic metrics for idle-LB detection.
+
+Application, network and gateway load balancers (ELBv2), their target
+groups and Classic load balancers are listed with three concurrent
+paginations. Traffic and target health for every load balancer then come
+from batched GetMetricData queries (see cloudwatch_metrics.py), daily
+datapoints over the analysis window, so thousands of load balancers cost
+a few dozen requests rather than several per load balancer.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+import boto3
+
+from aws_org import get_client
+from cloudwatch_metrics import MetricQuery, MetricSeries
+
+logger = logging.getLogger("load_balancers")
+
+DAY = 86400
+
+# Largest PageSize describe_load_balancers / describe_target_groups accept.
+MAX_PAGE_SIZE = 400
+
+# describe_tags accepts at most 20 load balancers per call.
+TAGS_BATCH_SIZE = 20
+
+# Concurrent describe_tags calls; the ELB APIs are throttled well below EC2.
+TAGS_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class TrafficMetrics:
+    """CloudWatch metrics describing a load balancer class's traffic."""
+
+    namespace: str
+    requests: str
+    processed_bytes: str
+
+
+# Load balancer class -> its metrics. Network and gateway load balancers
+# count new flows rather than requests.
+TRAFFIC_METRICS: dict[str, TrafficMetrics] = {
+    "application": TrafficMetrics("AWS/ApplicationELB", "RequestCount", "ProcessedBytes"),
+    "network": TrafficMetrics("AWS/NetworkELB", "NewFlowCount", "ProcessedBytes"),
+    "gateway": TrafficMetrics("AWS/GatewayELB", "NewFlowCount", "ProcessedBytes"),
+    "classic": TrafficMetrics("AWS/ELB", "RequestCount", "EstimatedProcessedBytes"),
+}
+
+
+@dataclass(slots=True)
+class LoadBalancer:
+    """A load balancer of any class with the target groups routing to it.
+
+    ``dimension`` is the CloudWatch dimension (name, value) identifying it;
+    ``target_groups`` holds the TargetGroup dimension values of ELBv2 load
+    balancers, and ``instances`` the registered instances of Classic ones.
+    """
+
+    lb_class: str
+    name: str
+    resource_id: str
+    dimension: tuple[str, str]
+    created: datetime | None
+    target_groups: list[str] = field(default_factory=list)
+    instances: int = 0
+
+    @property
+    def has_targets(self) -> bool:
+        return bool(self.target_groups) if self.lb_class != "classic" else self.instances > 0
+
+
+@dataclass(slots=True)
+class LoadBalancerTraffic:
+    """Traffic totals and peak healthy targets over the analysis window."""
+
+    requests: float
+    processed_bytes: float
+    healthy_hosts: float
+
+
+def _paginate(client: Any, operation: str, result_key: str) -> list[dict[str, Any]]:
+    pages = client.get_paginator(operation).paginate(PaginationConfig={"PageSize": MAX_PAGE_SIZE})
+    return [item for page in pages for item in page.get(result_key, [])]
+
+
+def _arn_suffix(arn: str, marker: str) -> str:
+    """CloudWatch dimension value of an ELBv2 ARN, e.g. app/name/id for loadbalancer/."""
+    return arn.split(marker, 1)[1]
+
+
+def describe_load_balancers(session: boto3.Session) -> list[LoadBalancer]:
+    """List ELBv2 and Classic load balancers, with ELBv2 target groups attached.
+
+    The three listings run concurrently. Raises ClientError/BotoCoreError
+    if any of them fails.
+    """
+    elbv2 = get_client(session, "elbv2")
+    elb = get_client(session, "elb")
+    listings: dict[str, Callable[[], list[dict[str, Any]]]] = {
+        "v2": lambda: _paginate(elbv2, "describe_load_balancers", "LoadBalancers"),
+        "target_groups": lambda: _paginate(elbv2, "describe_target_groups", "TargetGroups"),
+        "classic": lambda: _paginate(elb, "describe_load_balancers", "LoadBalancerDescriptions"),
+    }
+    with ThreadPoolExecutor(max_workers=len(listings)) as pool:
+        futures = {key: pool.submit(listing) for key, listing in listings.items()}
+        results = {key: future.result() for key, future in futures.items()}
+
+    groups_by_lb: dict[str, list[str]] = {}
+    for group in results["target_groups"]:
+        for lb_arn in group.get("LoadBalancerArns", []):
+            groups_by_lb.setdefault(lb_arn, []).append(_arn_suffix(group["TargetGroupArn"], ":targetgroup/"))
+
+    load_balancers = [
+        LoadBalancer(
+            lb_class=lb.get("Type", "application"),
+            name=lb["LoadBalancerName"],
+            resource_id=lb["LoadBalancerArn"],
+            dimension=("LoadBalancer", _arn_suffix(lb["LoadBalancerArn"], ":loadbalancer/")),
+            created=lb.get("CreatedTime"),
+            target_groups=groups_by_lb.get(lb["LoadBalancerArn"], []),
+        )
+        for lb in results["v2"]
+    ]
+    load_balancers.extend(
+        LoadBalancer(
+            lb_class="classic",
+            name=lb["LoadBalancerName"],
+            resource_id=lb["LoadBalancerName"],
+            dimension=("LoadBalancerName", lb["LoadBalancerName"]),
+            created=lb.get("CreatedTime"),
+            instances=len(lb.get("Instances", [])),
+        )
+        for lb in results["classic"]
+    )
+    return load_balancers
+
+
+def traffic_queries(load_balancers: list[LoadBalancer]) -> list[MetricQuery]:
+    """Daily request, byte and healthy-host queries for every load balancer.
+
+    Keys are "<metric>/<resource id>"; ELBv2 healthy hosts are reported per
+    target group and keyed "healthy/<resource id>/<target group>".
+    """
+    queries: list[MetricQuery] = []
+    for lb in load_balancers:
+        metrics = TRAFFIC_METRICS[lb.lb_class]
+        for key, metric_name in (("requests", metrics.requests), ("bytes", metrics.processed_bytes)):
+            queries.append(MetricQuery(
+                f"{key}/{lb.resource_id}", metrics.namespace, metric_name, (lb.dimension,), "Sum", DAY,
+            ))
+        if lb.lb_class == "classic":
+            queries.append(MetricQuery(
+                f"healthy/{lb.resource_id}", metrics.namespace, "HealthyHostCount", (lb.dimension,), "Maximum", DAY,
+            ))
+        for group in lb.target_groups:
+            queries.append(MetricQuery(
+                f"healthy/{lb.resource_id}/{group}",
+                metrics.namespace,
+                "HealthyHostCount",
+                (("TargetGroup", group), lb.dimension),
+                "Maximum",
+                DAY,
+            ))
+    return queries
+
+
+def summarize_traffic(
+    load_balancers: list[LoadBalancer],
+    series: dict[str, MetricSeries],
+) -> list[LoadBalancerTraffic | None]:
+    """Total requests and bytes and peak healthy hosts; follows ``load_balancers``.
+
+    A load balancer whose metrics are missing from ``series`` (their
+    GetMetricData batch failed) gets None rather than zero traffic.
+    """
+    results: list[LoadBalancerTraffic | None] = []
+    for lb in load_balancers:
+        healthy_keys = (
+            [f"healthy/{lb.resource_id}"]
+            if lb.lb_class == "classic"
+            else [f"healthy/{lb.resource_id}/{group}" for group in lb.target_groups]
+        )
+        keys = [f"requests/{lb.resource_id}", f"bytes/{lb.resource_id}", *healthy_keys]
+        if not all(key in series for key in keys):
+            results.append(None)
+            continue
+        results.append(LoadBalancerTraffic(
+            requests=sum(series[f"requests/{lb.resource_id}"].values),
+            processed_bytes=sum(series[f"bytes/{lb.resource_id}"].values),
+            healthy_hosts=max((max(series[key].values, default=0.0) for key in healthy_keys), default=0.0),
+        ))
+    return results
+
+
+def load_balancer_tags(session: boto3.Session, load_balancers: list[LoadBalancer]) -> dict[str, list[dict[str, str]]]:
+    """Tags of the given load balancers keyed by resource ID, 20 per describe_tags call.
+
+    Tags are only looked up for the load balancers being reported, so a
+    large fleet with few findings costs few calls.
+    """
+    v2_arns = [lb.resource_id for lb in load_balancers if lb.lb_class != "classic"]
+    classic_names = [lb.resource_id for lb in load_balancers if lb.lb_class == "classic"]
+    batches = [
+        (client, param, id_key, ids[start:start + TAGS_BATCH_SIZE])
+        for client, ids, param, id_key in (
+            (get_client(session, "elbv2"), v2_arns, "ResourceArns", "ResourceArn"),
+            (get_client(session, "elb"), classic_names, "LoadBalancerNames", "LoadBalancerName"),
+        )
+        for start in range(0, len(ids), TAGS_BATCH_SIZE)
+    ]
+
+    def _describe(batch: tuple[Any, str, str, list[str]]) -> dict[str, list[dict[str, str]]]:
+        client, param, id_key, ids = batch
+        response = client.describe_tags(**{param: ids})
+        return {description[id_key]: description.get("Tags", []) for description in response.get("TagDescriptions", [])}
+
+    tags: dict[str, list[dict[str, str]]] = {}
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(TAGS_WORKERS, len(batches))) as pool:
+            for result in pool.map(_describe, batches):
+                tags.update(result)
+    return tags
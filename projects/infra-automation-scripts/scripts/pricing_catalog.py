@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""Offline AWS pricing catalog.
+
+Builds a compact SQLite index of on-demand prices from the AWS bulk price
+list files and answers the price lookups cost_optimizer.py needs for its
+findings. The price list is read from local disk in its CSV form, e.g.
+
+  https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonEC2/current/index.csv
+  https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AWSELB/current/index.csv
+
+(plain or gzipped). The CSV has one row per SKU and price dimension, so a
+multi-GB file is parsed one row at a time and only the on-demand prices
+of interest are kept. Opening the catalog is one SQLite connection, and
+every lookup is a primary-key read cached in memory.
+
+When no catalog has been built, or it has no price for a key, PriceBook
+falls back to the built-in us-east-1 list prices and logs what it could
+not price.
+
+Usage:
+  pricing_catalog.py build AmazonEC2.csv.gz AWSELB.csv
+  pricing_catalog.py show --region eu-west-1 --instance-type m5.large
+"""
+
+import argparse
+import csv
+import gzip
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import IO, Any, Iterator
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger("pricing_catalog")
+
+DEFAULT_PRICING_DB = os.path.join(os.path.expanduser("~"), ".cache", "infra-automation", "pricing.db")
+
+HOURS_PER_MONTH = 730
+
+# Built-in us-east-1 Linux on-demand prices, used without a catalog.
+INSTANCE_HOURLY_COSTS: dict[str, float] = {
+    "t2.micro": 0.0116, "t2.small": 0.023, "t2.medium": 0.0464,
+    "t3.micro": 0.0104, "t3.small": 0.0208, "t3.medium": 0.0416,
+    "t3.large": 0.0832, "t3.xlarge": 0.1664,
+    "m5.large": 0.096, "m5.xlarge": 0.192, "m5.2xlarge": 0.384,
+    "c5.large": 0.085, "c5.xlarge": 0.17, "c5.2xlarge": 0.34,
+    "r5.large": 0.126, "r5.xlarge": 0.252, "r5.2xlarge": 0.504,
+}
+DEFAULT_INSTANCE_HOURLY_COST = 0.05
+
+EBS_GB_MONTH_COST: dict[str, float] = {
+    "gp2": 0.10, "gp3": 0.08, "io1": 0.125, "io2": 0.125,
+    "st1": 0.045, "sc1": 0.015, "standard": 0.05,
+}
+DEFAULT_EBS_GB_MONTH_COST = 0.10
+
+SNAPSHOT_GB_MONTH_COST: dict[str, float] = {"standard": 0.05, "archive": 0.0125}
+EIP_HOURLY_COST = 0.005
+
+# Hourly charge per load balancer class, excluding capacity units.
+LOAD_BALANCER_HOURLY_COST: dict[str, float] = {
+    "application": 0.0225, "network": 0.0225, "gateway": 0.0125, "classic": 0.025,
+}
+
+# describe_instances PlatformDetails -> catalog OS key (see os_key()): the
+# price list "Operating System", plus its pre-installed SQL Server edition
+# and whether the license is brought by the customer. Platforms missing
+# here are priced from the built-in list with a missing-price warning.
+PLATFORM_OS: dict[str, str] = {
+    "Linux/UNIX": "Linux",
+    "Red Hat BYOL Linux": "RHEL (BYOL)",
+    "Red Hat Enterprise Linux": "RHEL",
+    "Red Hat Enterprise Linux with HA": "Red Hat Enterprise Linux with HA",
+    "Red Hat Enterprise Linux with SQL Server Standard": "RHEL with SQL Std",
+    "Red Hat Enterprise Linux with SQL Server Enterprise": "RHEL with SQL Ent",
+    "Red Hat Enterprise Linux with SQL Server Web": "RHEL with SQL Web",
+    "Red Hat Enterprise Linux with SQL Server Standard and HA": "Red Hat Enterprise Linux with HA with SQL Std",
+    "Red Hat Enterprise Linux with SQL Server Enterprise and HA": "Red Hat Enterprise Linux with HA with SQL Ent",
+    "SUSE Linux": "SUSE",
+    "Ubuntu Pro": "Ubuntu Pro",
+    "Windows": "Windows",
+    "Windows BYOL": "Windows (BYOL)",
+    "Windows with SQL Server Standard": "Windows with SQL Std",
+    "Windows with SQL Server Enterprise": "Windows with SQL Ent",
+    "Windows with SQL Server Web": "Windows with SQL Web",
+}
+
+# describe_instances Placement.Tenancy -> price list "Tenancy".
+TENANCY: dict[str, str] = {"default": "Shared", "dedicated": "Dedicated", "host": "Host"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instance_prices (
+    region TEXT NOT NULL,
+    instance_type TEXT NOT NULL,
+    os TEXT NOT NULL,
+    tenancy TEXT NOT NULL,
+    hourly REAL NOT NULL,
+    PRIMARY KEY (region, instance_type, os, tenancy)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS usage_prices (
+    region TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    class TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (region, kind, class)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Price list "Product Family" of load balancer SKUs -> usage_prices class.
+LOAD_BALANCER_FAMILIES: dict[str, str] = {
+    "Load Balancer": "classic",
+    "Load Balancer-Application": "application",
+    "Load Balancer-Network": "network",
+    "Load Balancer-Gateway": "gateway",
+}
+
+
+def open_text(path: str) -> IO[str]:
+    """Open a price list file, transparently decompressing .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_price_rows(path: str) -> Iterator[dict[str, str]]:
+    """Stream the on-demand USD rows of a bulk price list CSV.
+
+    The file starts with a few metadata lines before the column header;
+    rows are yielded one at a time as dicts of the columns used here.
+    """
+    wanted = (
+        "Product Family", "Region Code", "Instance Type", "Operating System", "Tenancy",
+        "CapacityStatus", "Pre Installed S/W", "License Model", "Volume API Name",
+        "usageType", "Unit", "PricePerUnit",
+    )
+    with open_text(path) as fh:
+        reader = csv.reader(fh)
+        for header in reader:
+            if header and header[0] == "SKU":
+                break
+        else:
+            raise ValueError(f"{path}: no SKU header row, not a bulk price list CSV")
+        columns = {name: index for index, name in enumerate(header)}
+        if "Region Code" not in columns:
+            raise ValueError(f"{path}: no 'Region Code' column; download a current price list")
+        term_type, currency = columns["TermType"], columns["Currency"]
+        picks = [(name, columns[name]) for name in wanted if name in columns]
+        for row in reader:
+            if len(row) != len(header) or row[term_type] != "OnDemand" or row[currency] != "USD":
+                continue
+            yield {name: row[index] for name, index in picks}
+
+
+def os_key(operating_system: str, software: str = "NA", license_model: str = "") -> str:
+    """Catalog OS key of a price row, e.g. ``Windows with SQL Std`` or ``RHEL (BYOL)``."""
+    key = operating_system
+    if software != "NA":
+        key += f" with {software}"
+    if license_model == "Bring your own license":
+        key += " (BYOL)"
+    return key
+
+
+def classify(row: dict[str, str]) -> tuple[str, tuple[Any, ...]] | None:
+    """Map a price row to (table, key) or None if it is not a price we index."""
+    family = row.get("Product Family", "")
+    region = row.get("Region Code", "")
+    usage = row.get("usageType", "")
+    if not region:
+        return None
+    if family == "Compute Instance":
+        if row.get("CapacityStatus") != "Used":
+            return None
+        os_name = os_key(row["Operating System"], row.get("Pre Installed S/W") or "NA", row.get("License Model", ""))
+        return "instance", (region, row["Instance Type"], os_name, row["Tenancy"])
+    if family == "Storage" and row.get("Volume API Name") and row.get("Unit") == "GB-Mo":
+        return "usage", (region, "volume", row["Volume API Name"], "GB-Mo")
+    if family == "Storage Snapshot" and row.get("Unit") == "GB-Mo":
+        if usage.endswith("EBS:SnapshotUsage"):
+            return "usage", (region, "snapshot", "standard", "GB-Mo")
+        if "SnapshotArchiveStorage" in usage:
+            return "usage", (region, "snapshot", "archive", "GB-Mo")
+        return None
+    if family == "IP Address" and "IdleAddress" in usage:
+        return "usage", (region, "ip", "idle", "Hrs")
+    if family in LOAD_BALANCER_FAMILIES and usage.endswith("LoadBalancerUsage"):
+        return "usage", (region, "load_balancer", LOAD_BALANCER_FAMILIES[family], "Hrs")
+    return None
+
+
+def build_catalog(sources: list[str], db_path: str, batch_size: int = 10000) -> dict[str, int]:
+    """Index the given price list files into a fresh catalog at ``db_path``.
+
+    The catalog is written to a temporary file and renamed into place, so
+    readers never see a half-built catalog. Tiered prices keep the highest
+    tier price, which is what a single resource is billed at.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+    statements = {
+        "instance": "INSERT INTO instance_prices VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT DO UPDATE SET hourly = max(hourly, excluded.hourly)",
+        "usage": "INSERT INTO usage_prices VALUES (?, ?, ?, ?, ?) "
+                 "ON CONFLICT DO UPDATE SET price = max(price, excluded.price)",
+    }
+    pending: dict[str, list[tuple[Any, ...]]] = {"instance": [], "usage": []}
+    counts = {"rows": 0, "instance": 0, "usage": 0}
+    started = time.perf_counter()
+
+    def _flush() -> None:
+        for table, rows in pending.items():
+            if rows:
+                conn.executemany(statements[table], rows)
+                rows.clear()
+
+    try:
+        with conn:
+            for source in sources:
+                logger.info("Indexing %s...", source)
+                for row in read_price_rows(source):
+                    counts["rows"] += 1
+                    match = classify(row)
+                    if match is None:
+                        continue
+                    try:
+                        price = float(row["PricePerUnit"])
+                    except ValueError:
+                        continue
+                    table, key = match
+                    pending[table].append((*key, price))
+                    counts[table] += 1
+                    if len(pending[table]) >= batch_size:
+                        _flush()
+            _flush()
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("built_at", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())), ("sources", ",".join(sources))],
+            )
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    logger.info(
+        "Catalog %s built from %d on-demand rows (%d instance, %d usage prices) in %.1fs",
+        db_path,
+        counts["rows"],
+        counts["instance"],
+        counts["usage"],
+        time.perf_counter() - started,
+    )
+    return counts
+
+
+class PricingCatalog:
+    """Read-only lookups against a built catalog; safe to share between threads."""
+
+    def __init__(self, path: str = DEFAULT_PRICING_DB) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._cache: dict[tuple[Any, ...], float | None] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _lookup(self, sql: str, key: tuple[Any, ...]) -> float | None:
+        with self._lock:
+            if key not in self._cache:
+                row = self._conn.execute(sql, key).fetchone()
+                self._cache[key] = None if row is None else row[0]
+            return self._cache[key]
+
+    def instance_hourly(self, region: str, instance_type: str, os_name: str, tenancy: str) -> float | None:
+        """On-demand hourly price, or None if the catalog has none."""
+        return self._lookup(
+            "SELECT hourly FROM instance_prices WHERE region = ? AND instance_type = ? AND os = ? AND tenancy = ?",
+            (region, instance_type, os_name, tenancy),
+        )
+
+    def usage_price(self, region: str, kind: str, price_class: str) -> float | None:
+        """Price per unit (GB-month or hour) of a storage/IP/LB class, or None."""
+        return self._lookup(
+            "SELECT price FROM usage_prices WHERE region = ? AND kind = ? AND class = ?",
+            (region, kind, price_class),
+        )
+
+
+class PriceBook:
+    """Prices for findings: the catalog when it has them, else the built-in list prices."""
+
+    def __init__(self, catalog: PricingCatalog | None = None) -> None:
+        self.catalog = catalog
+        self._missing: set[tuple[str, ...]] = set()
+        self._lock = threading.Lock()
+
+    def _fallback(self, key: tuple[str, ...], price: float) -> float:
+        if self.catalog is not None:
+            with self._lock:
+                if key not in self._missing:
+                    self._missing.add(key)
+                    logger.warning("No catalog price for %s, using built-in $%g", "/".join(key), price)
+        return price
+
+    def _usage(self, region: str, kind: str, price_class: str, default: float) -> float:
+        price = self.catalog.usage_price(region, kind, price_class) if self.catalog else None
+        return price if price is not None else self._fallback((region, kind, price_class), default)
+
+    def instance_hourly(self, region: str, instance: dict[str, Any]) -> float:
+        """Hourly on-demand price of a described instance.
+
+        An unmapped PlatformDetails is never looked up as Linux; it gets the
+        built-in price and the missing-price warning under its own name.
+        """
+        instance_type = instance.get("InstanceType", "")
+        platform = instance.get("PlatformDetails", "Linux/UNIX")
+        os_name = PLATFORM_OS.get(platform)
+        tenancy = TENANCY.get(instance.get("Placement", {}).get("Tenancy", "default"), "Shared")
+        price = None
+        if self.catalog and os_name is not None:
+            price = self.catalog.instance_hourly(region, instance_type, os_name, tenancy)
+        if price is not None:
+            return price
+        default = INSTANCE_HOURLY_COSTS.get(instance_type, DEFAULT_INSTANCE_HOURLY_COST)
+        return self._fallback((region, instance_type, os_name or platform, tenancy), default)
+
+    def volume_gb_month(self, region: str, volume_type: str) -> float:
+        default = EBS_GB_MONTH_COST.get(volume_type, DEFAULT_EBS_GB_MONTH_COST)
+        return self._usage(region, "volume", volume_type, default)
+
+    def snapshot_gb_month(self, region: str, tier: str = "standard") -> float:
+        tier = "archive" if tier == "archive" else "standard"
+        return self._usage(region, "snapshot", tier, SNAPSHOT_GB_MONTH_COST[tier])
+
+    def ip_hourly(self, region: str) -> float:
+        return self._usage(region, "ip", "idle", EIP_HOURLY_COST)
+
+    def load_balancer_hourly(self, region: str, lb_class: str) -> float:
+        default = LOAD_BALANCER_HOURLY_COST.get(lb_class, LOAD_BALANCER_HOURLY_COST["application"])
+        return self._usage(region, "load_balancer", lb_class, default)
+
+    def close(self) -> None:
+        if self.catalog is not None:
+            self.catalog.close()
+
+
+def add_pricing_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the pricing catalog option shared by the scripts."""
+    parser.add_argument(
+        "--pricing-db",
+        default=DEFAULT_PRICING_DB,
+        metavar="FILE",
+        help=f"Pricing catalog built by pricing_catalog.py (default: {DEFAULT_PRICING_DB}); "
+             "built-in us-east-1 prices are used without one",
+    )
+
+
+def open_pricing(args: argparse.Namespace) -> PriceBook:
+    """Open the catalog selected on the command line, or fall back to built-in prices."""
+    if not os.path.exists(args.pricing_db):
+        logger.info("No pricing catalog at %s, using built-in us-east-1 prices", args.pricing_db)
+        return PriceBook()
+    try:
+        return PriceBook(PricingCatalog(args.pricing_db))
+    except sqlite3.Error as exc:
+        logger.warning("Pricing catalog unavailable (%s), using built-in prices: %s", args.pricing_db, exc)
+        return PriceBook()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the CLI argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Build and query the offline AWS pricing catalog.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""\
+Examples:
+  %(prog)s build AmazonEC2.csv.gz AWSELB.csv.gz
+  %(prog)s --pricing-db /tmp/pricing.db build AmazonEC2.csv
+  %(prog)s show --region eu-west-1 --instance-type m5.large --os Windows
+  %(prog)s show --region eu-west-1 --volume-type gp3
+        """,
+    )
+    add_pricing_arguments(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Index bulk price list CSV files")
+    build.add_argument("sources", nargs="+", metavar="FILE", help="Price list CSV files (.csv or .csv.gz)")
+
+    show = subparsers.add_parser("show", help="Look up prices in the catalog")
+    show.add_argument("--region", default="us-east-1", help="Region code (default: us-east-1)")
+    show.add_argument("--instance-type", help="Instance type, e.g. m5.large")
+    show.add_argument(
+        "--os",
+        default="Linux",
+        help="Operating system, with any SQL Server edition or BYOL, e.g. 'Windows with SQL Std' (default: Linux)",
+    )
+    show.add_argument("--tenancy", default="Shared", help="Tenancy (default: Shared)")
+    show.add_argument("--volume-type", help="EBS volume type, e.g. gp3")
+    return parser
+
+
+def main() -> int:
+    """Run the pricing catalog CLI."""
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    if args.command == "build":
+        try:
+            build_catalog(args.sources, args.pricing_db)
+        except (OSError, ValueError, sqlite3.Error) as exc:
+            logger.error("Failed to build catalog: %s", exc)
+            return 1
+        return 0
+
+    try:
+        catalog = PricingCatalog(args.pricing_db)
+    except sqlite3.Error as exc:
+        logger.error("Cannot open catalog %s: %s", args.pricing_db, exc)
+        return 1
+    if args.instance_type:
+        price = catalog.instance_hourly(args.region, args.instance_type, args.os, args.tenancy)
+        print(f"{args.instance_type} {args.os}/{args.tenancy} in {args.region}: "
+              + (f"${price}/hr" if price is not None else "not in catalog"))
+    if args.volume_type:
+        price = catalog.usage_price(args.region, "volume", args.volume_type)
+        print(f"{args.volume_type} in {args.region}: "
+              + (f"${price}/GB-month" if price is not None else "not in catalog"))
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+"""Incrementally synced index of an account's EBS snapshots.
+
+Accounts with hundreds of thousands of snapshots spend most of a cost
+report paging through describe_snapshots. This index keeps one row per
+snapshot in SQLite, ordered by StartTime, and keeps it current with two
+kinds of sync:
+
+- incremental: only snapshots started since the watermark (when the last
+  listing began, so every snapshot started earlier is indexed) are
+  fetched, using describe_snapshots' ``start-time`` filter with one
+  wildcard value per day, e.g. ``2024-05-01*``. A snapshot's StartTime
+  never changes, so this picks up every new snapshot.
+- reconciliation: every ``reconcile_interval`` the full list is streamed
+  into a scratch scope and swapped in for the scope's rows, which is how
+  deleted snapshots are dropped.
+
+backup_manager.py also records the snapshots it creates and deletes as it
+goes, so the index does not wait for the next sync to reflect them.
+
+"Older than N days" is then a range scan over the start-time index.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Iterator
+
+logger = logging.getLogger("snapshot_index")
+
+DEFAULT_SNAPSHOT_DB = os.path.join(os.path.expanduser("~"), ".cache", "infra-automation", "snapshots.db")
+
+# Seconds between incremental syncs, and between full reconciliations.
+DEFAULT_SYNC_INTERVAL = 15 * 60
+DEFAULT_RECONCILE_INTERVAL = 24 * 60 * 60
+
+# Incremental syncs re-read the day before the watermark too, so snapshots
+# started just before the last listing but not yet visible are not missed.
+WATERMARK_OVERLAP = timedelta(days=1)
+
+# EC2 accepts at most 200 values per filter; a longer gap is reconciled.
+MAX_FILTER_VALUES = 200
+
+# Reconciliations write the full listing in batches of RECONCILE_BATCH rows.
+RECONCILE_BATCH = 1000
+
+# Each reconciliation writes under its own "<scope>:reconciling:<started>:<id>"
+# and swaps the rows in at the end, like InventoryStore.refresh; rows older
+# than STALE_SCRATCH were left by a reconciliation that died.
+SCRATCH_MARKER = ":reconciling:"
+STALE_SCRATCH = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    scope TEXT NOT NULL,
+    snapshot_id TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    state TEXT NOT NULL,
+    volume_id TEXT NOT NULL,
+    volume_size INTEGER NOT NULL,
+    storage_tier TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    PRIMARY KEY (scope, snapshot_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_snapshots_start ON snapshots (scope, start_time);
+CREATE TABLE IF NOT EXISTS snapshot_syncs (
+    scope TEXT PRIMARY KEY,
+    watermark REAL NOT NULL,
+    synced_at REAL NOT NULL,
+    reconciled_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = "snapshot_id, start_time, state, volume_id, volume_size, storage_tier, tags"
+
+
+def _row(scope: str, snapshot: dict[str, Any]) -> tuple[Any, ...]:
+    """Flatten a describe_snapshots item into an index row."""
+    start_time = snapshot["StartTime"]
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=timezone.utc)
+    return (
+        scope,
+        snapshot["SnapshotId"],
+        start_time.timestamp(),
+        snapshot.get("State", ""),
+        snapshot.get("VolumeId", ""),
+        snapshot.get("VolumeSize", 0),
+        snapshot.get("StorageTier", "standard"),
+        json.dumps(snapshot.get("Tags", [])),
+    )
+
+
+def _snapshot(row: tuple[Any, ...]) -> dict[str, Any]:
+    """Rebuild the describe_snapshots fields the cost checks use from a row."""
+    snapshot_id, start_time, state, volume_id, volume_size, storage_tier, tags = row
+    return {
+        "SnapshotId": snapshot_id,
+        "StartTime": datetime.fromtimestamp(start_time, timezone.utc),
+        "State": state,
+        "VolumeId": volume_id,
+        "VolumeSize": volume_size,
+        "StorageTier": storage_tier,
+        "Tags": json.loads(tags),
+    }
+
+
+def start_time_prefixes(since: datetime, until: datetime) -> list[str]:
+    """``start-time`` filter values matching every day from ``since`` to ``until``."""
+    day = since.astimezone(timezone.utc).date()
+    last = until.astimezone(timezone.utc).date()
+    prefixes = []
+    while day <= last:
+        prefixes.append(f"{day.isoformat()}*")
+        day += timedelta(days=1)
+    return prefixes
+
+
+def fetch_snapshots(
+    client: Any,
+    start_time_values: list[str] | None = None,
+    page_size: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield the account's own snapshots, optionally only those matching start-time values."""
+    kwargs: dict[str, Any] = {"OwnerIds": ["self"]}
+    if start_time_values:
+        kwargs["Filters"] = [{"Name": "start-time", "Values": start_time_values}]
+    pagination = {"PageSize": max(5, min(page_size, 1000))} if page_size else {}
+    for page in client.get_paginator("describe_snapshots").paginate(PaginationConfig=pagination, **kwargs):
+        yield from page.get("Snapshots", [])
+
+
+class SnapshotIndex:
+    """SQLite index of snapshots per account/region scope, sorted by StartTime.
+
+    Shared between worker threads like InventoryStore: writes go through one
+    locked connection, reads use a per-thread connection, and concurrent
+    callers of sync() for the same scope wait for a single sync.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_SNAPSHOT_DB,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        reconcile_interval: float = DEFAULT_RECONCILE_INTERVAL,
+        force_reconcile: bool = False,
+    ) -> None:
+        self.path = path
+        self.sync_interval = sync_interval
+        self.reconcile_interval = reconcile_interval
+        self.force_reconcile = force_reconcile
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._scope_locks: dict[str, threading.Lock] = {}
+        self._forced: set[str] = set()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+
+    def close(self) -> None:
+        """Close the underlying database connections."""
+        with self._lock:
+            for reader in self._readers:
+                reader.close()
+            self._conn.close()
+
+    def _reader(self) -> sqlite3.Connection | None:
+        """Return this thread's read connection (None for in-memory indexes)."""
+        if self.path == ":memory:":
+            return None
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._local.reader = reader
+            with self._lock:
+                self._readers.append(reader)
+        return reader
+
+    def _sync_state(self, scope: str) -> tuple[float, float, float] | None:
+        """Return (watermark, synced_at, reconciled_at), or None if never synced."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT watermark, synced_at, reconciled_at FROM snapshot_syncs WHERE scope = ?",
+                (scope,),
+            ).fetchone()
+
+    def _delete_stale_scratch(self, scope: str) -> None:
+        """Drop rows written for a scope by reconciliations that died long ago."""
+        prefix = scope + SCRATCH_MARKER
+        # Every scratch scope sorts between the prefix and the prefix with its last ':' bumped to ';'.
+        scratch = self._conn.execute(
+            "SELECT DISTINCT scope FROM snapshots WHERE scope > ? AND scope < ?",
+            (prefix, prefix[:-1] + ";"),
+        ).fetchall()
+        cutoff = time.time() - STALE_SCRATCH
+        for (stale,) in scratch:
+            started = stale[len(prefix):].partition(":")[0]
+            if not started.isdigit() or int(started) < cutoff:
+                self._conn.execute("DELETE FROM snapshots WHERE scope = ?", (stale,))
+
+    def reconcile(self, client: Any, scope: str, page_size: int | None = None) -> int:
+        """Replace the scope's rows with the full snapshot list; returns the count.
+
+        Pages are written in batches of RECONCILE_BATCH to a scratch scope as
+        they arrive, so memory stays flat however many snapshots the account
+        has; readers see the previous rows until the scratch rows are swapped in.
+        """
+        started = time.perf_counter()
+        watermark = time.time()
+        scratch = f"{scope}{SCRATCH_MARKER}{int(watermark)}:{uuid.uuid4().hex}"
+        count = 0
+        rows: list[tuple[Any, ...]] = []
+        try:
+            with self._lock, self._conn:
+                self._delete_stale_scratch(scope)
+            for snapshot in fetch_snapshots(client, page_size=page_size):
+                rows.append(_row(scratch, snapshot))
+                if len(rows) >= RECONCILE_BATCH:
+                    with self._lock, self._conn:
+                        self._conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    count += len(rows)
+                    rows = []
+
+            now = time.time()
+            with self._lock, self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                count += len(rows)
+                before = self._conn.execute("SELECT COUNT(*) FROM snapshots WHERE scope = ?", (scope,)).fetchone()[0]
+                self._conn.execute("DELETE FROM snapshots WHERE scope = ?", (scope,))
+                self._conn.execute("UPDATE snapshots SET scope = ? WHERE scope = ?", (scope, scratch))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshot_syncs VALUES (?, ?, ?, ?)",
+                    (scope, watermark, now, now),
+                )
+        except BaseException:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM snapshots WHERE scope = ?", (scratch,))
+            raise
+        logger.info(
+            "Reconciled snapshots for %s: %d indexed (%+d) in %.2fs",
+            scope,
+            count,
+            count - before,
+            time.perf_counter() - started,
+        )
+        return count
+
+    def sync_incremental(self, client: Any, scope: str, watermark: float, page_size: int | None = None) -> int:
+        """Add snapshots started since the watermark; returns how many were fetched."""
+        started = time.perf_counter()
+        since = datetime.fromtimestamp(watermark, timezone.utc) - WATERMARK_OVERLAP
+        watermark = time.time()
+        values = start_time_prefixes(since, datetime.fromtimestamp(watermark, timezone.utc))
+        rows = [_row(scope, snapshot) for snapshot in fetch_snapshots(client, values, page_size)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute(
+                "UPDATE snapshot_syncs SET watermark = ?, synced_at = ? WHERE scope = ?",
+                (watermark, time.time(), scope),
+            )
+        logger.info(
+            "Synced snapshots for %s since %s: %d fetched in %.2fs",
+            scope,
+            since.date().isoformat(),
+            len(rows),
+            time.perf_counter() - started,
+        )
+        return len(rows)
+
+    def record_created(self, scope: str, snapshots: Iterable[dict[str, Any]]) -> None:
+        """Index snapshots just created (create_snapshot responses) in the scope."""
+        rows = [_row(scope, snapshot) for snapshot in snapshots]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def record_deleted(self, scope: str, snapshot_ids: Iterable[str]) -> None:
+        """Drop snapshots just deleted from the scope."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM snapshots WHERE scope = ? AND snapshot_id = ?",
+                [(scope, snapshot_id) for snapshot_id in snapshot_ids],
+            )
+
+    def sync(self, client: Any, scope: str, page_size: int | None = None) -> None:
+        """Bring a scope up to date, reconciling or syncing incrementally as due."""
+        with self._lock:
+            scope_lock = self._scope_locks.setdefault(scope, threading.Lock())
+        with scope_lock:
+            state = self._sync_state(scope)
+            now = time.time()
+            forced = self.force_reconcile and scope not in self._forced
+            if forced or state is None or now - state[2] >= self.reconcile_interval:
+                self.reconcile(client, scope, page_size)
+                self._forced.add(scope)
+                return
+            watermark, synced_at, _ = state
+            if now - synced_at < self.sync_interval:
+                return
+            since = datetime.fromtimestamp(watermark, timezone.utc) - WATERMARK_OVERLAP
+            if len(start_time_prefixes(since, datetime.now(timezone.utc))) > MAX_FILTER_VALUES:
+                self.reconcile(client, scope, page_size)
+            else:
+                self.sync_incremental(client, scope, watermark, page_size)
+
+    def older_than(self, scope: str, cutoff: datetime) -> Iterator[dict[str, Any]]:
+        """Yield the scope's snapshots started before ``cutoff``, oldest first."""
+        sql = f"SELECT {_COLUMNS} FROM snapshots WHERE scope = ? AND start_time < ? ORDER BY start_time"
+        params = (scope, cutoff.timestamp())
+        reader = self._reader()
+        if reader is None:
+            with self._lock:
+                rows: Iterable[tuple[Any, ...]] = self._conn.execute(sql, params).fetchall()
+        else:
+            rows = reader.execute(sql, params)
+        for row in rows:
+            yield _snapshot(row)
+
+    def describe_older_than(
+        self,
+        client: Any,
+        account_id: str,
+        cutoff: datetime,
+        page_size: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Sync the client's account/region, then yield its snapshots started before ``cutoff``."""
+        scope = f"{account_id}:{client.meta.region_name}"
+        self.sync(client, scope, page_size)
+        return self.older_than(scope, cutoff)
+
+
+def add_snapshot_index_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the snapshot index options."""
+    group = parser.add_argument_group("snapshot index")
+    group.add_argument(
+        "--snapshot-db",
+        default=DEFAULT_SNAPSHOT_DB,
+        metavar="FILE",
+        help=f"SQLite snapshot index synced incrementally (default: {DEFAULT_SNAPSHOT_DB})",
+    )
+    group.add_argument(
+        "--snapshot-reconcile-hours",
+        type=float,
+        default=DEFAULT_RECONCILE_INTERVAL / 3600,
+        metavar="H",
+        help="Hours between full snapshot listings that drop deleted snapshots "
+             f"(default: {DEFAULT_RECONCILE_INTERVAL // 3600})",
+    )
+    group.add_argument("--no-snapshot-index", action="store_true", help="List snapshots from AWS on every run")
+
+
+def open_snapshot_index(args: argparse.Namespace) -> SnapshotIndex | None:
+    """Open the snapshot index selected on the command line, or None if disabled.
+
+    --refresh, where the script has it, forces one reconciliation per scope.
+    """
+    if args.no_snapshot_index:
+        return None
+    try:
+        return SnapshotIndex(
+            args.snapshot_db,
+            reconcile_interval=args.snapshot_reconcile_hours * 3600,
+            force_reconcile=getattr(args, "refresh", False),
+        )
+    except (OSError, sqlite3.Error) as exc:
+        logger.warning("Snapshot index unavailable (%s), listing snapshots from AWS: %s", args.snapshot_db, exc)
+        return None
@@ -7,17 +7,27 @@ are expiring within a configurable threshold.
 """
 
 import argparse
+import asyncio
+import functools
+import hashlib
+import itertools
 import json
 import logging
+import os
 import socket
 import ssl
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
-from typing import Any
+from typing import Any, AsyncIterator, Iterable, Iterator
 
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
+from cert_state import add_state_arguments, open_state
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -25,13 +35,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ssl_cert_monitor")
 
+# TLS connections in flight at once, one per resolved address being checked;
+# also bounds the hostnames being resolved or checked at once.
+DEFAULT_CONCURRENCY = 200
 
-def get_cert_info(hostname: str, port: int = 443, timeout: int = 10) -> dict[str, Any]:
-    """Retrieve SSL certificate information for a hostname.
+# Seconds a DNS answer is reused; the system resolver does not expose record TTLs.
+DEFAULT_DNS_TTL = 300
 
-    Returns dict with certificate details or error information.
-    """
-    result: dict[str, Any] = {
+# --address-family choice -> getaddrinfo family.
+ADDRESS_FAMILIES = {"all": socket.AF_UNSPEC, "ipv4": socket.AF_INET, "ipv6": socket.AF_INET6}
+
+# Error of hosts the run deadline left unchecked; they keep their recorded state.
+UNCHECKED_ERROR = "Not checked before the run deadline"
+
+# Hosts listed per shared certificate in the text report.
+SHARED_HOSTS_SHOWN = 10
+
+# Hosts per --processes shard, in multiples of --concurrency.
+SHARD_WINDOWS = 5
+
+
+def new_result(hostname: str, port: int) -> dict[str, Any]:
+    """Return the result record for a host that has not been checked yet."""
+    return {
         "hostname": hostname,
         "port": port,
         "status": "unknown",
@@ -42,78 +68,563 @@ def get_cert_info(hostname: str, port: int = 443, timeout: int = 10) -> dict[str
         "days_remaining": -1,
         "serial_number": "",
         "san": [],
+        "fingerprint": "",
         "error": "",
     }
 
-    context = ssl.create_default_context()
 
-    try:
-        with socket.create_connection((hostname, port), timeout=timeout) as sock:
-            with context.wrap_socket(sock, server_hostname=hostname) as tls_sock:
-                cert = tls_sock.getpeercert()
-
-                if not cert:
-                    result["status"] = "error"
-                    result["error"] = "No certificate returned"
-                    return result
-
-                not_after_str = cert.get("notAfter", "")
-                not_before_str = cert.get("notBefore", "")
-
-                not_after = datetime.strptime(not_after_str, "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
-                not_before = datetime.strptime(not_before_str, "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
-
-                now = datetime.now(timezone.utc)
-                days_remaining = (not_after - now).days
-
-                issuer_parts = []
-                for rdn in cert.get("issuer", ()):
-                    for attr_type, attr_value in rdn:
-                        issuer_parts.append(f"{attr_type}={attr_value}")
-
-                subject_parts = []
-                for rdn in cert.get("subject", ()):
-                    for attr_type, attr_value in rdn:
-                        subject_parts.append(f"{attr_type}={attr_value}")
-
-                san_list = []
-                for san_type, san_value in cert.get("subjectAltName", ()):
-                    san_list.append(san_value)
-
-                result.update({
-                    "status": "valid" if days_remaining > 0 else "expired",
-                    "issuer": ", ".join(issuer_parts),
-                    "subject": ", ".join(subject_parts),
-                    "not_before": not_before.isoformat(),
-                    "not_after": not_after.isoformat(),
-                    "days_remaining": days_remaining,
-                    "serial_number": cert.get("serialNumber", ""),
-                    "san": san_list,
-                })
-
-    except ssl.SSLCertVerificationError as exc:
+@dataclass(frozen=True, slots=True)
+class CertDetails:
+    """The parsed fields of one certificate, shared by every host serving it."""
+
+    issuer: str
+    subject: str
+    not_before: datetime
+    not_after: datetime
+    serial_number: str
+    san: tuple[str, ...]
+
+
+def parse_cert(cert: dict[str, Any]) -> CertDetails:
+    """Parse a peer certificate as returned by getpeercert()."""
+    not_after = datetime.strptime(cert.get("notAfter", ""), "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
+    not_before = datetime.strptime(cert.get("notBefore", ""), "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
+
+    issuer_parts = []
+    for rdn in cert.get("issuer", ()):
+        for attr_type, attr_value in rdn:
+            issuer_parts.append(f"{attr_type}={attr_value}")
+
+    subject_parts = []
+    for rdn in cert.get("subject", ()):
+        for attr_type, attr_value in rdn:
+            subject_parts.append(f"{attr_type}={attr_value}")
+
+    return CertDetails(
+        issuer=", ".join(issuer_parts),
+        subject=", ".join(subject_parts),
+        not_before=not_before,
+        not_after=not_after,
+        serial_number=cert.get("serialNumber", ""),
+        san=tuple(san_value for _, san_value in cert.get("subjectAltName", ())),
+    )
+
+
+# Parsed certificates by SHA-256 fingerprint of their DER encoding. Wildcard
+# and multi-SAN certificates served by many hosts are parsed once per process.
+_PARSED_CERTS: dict[str, CertDetails | None] = {}
+
+
+def peer_cert_details(tls: ssl.SSLObject | ssl.SSLSocket) -> tuple[str, CertDetails | None]:
+    """Fingerprint and parsed details of the certificate a TLS peer presented."""
+    der = tls.getpeercert(binary_form=True)
+    if not der:
+        return "", None
+    fingerprint = hashlib.sha256(der).hexdigest()
+    if fingerprint not in _PARSED_CERTS:
+        cert = tls.getpeercert()
+        _PARSED_CERTS[fingerprint] = parse_cert(cert) if cert else None
+    return fingerprint, _PARSED_CERTS[fingerprint]
+
+
+def fill_cert_details(result: dict[str, Any], fingerprint: str, details: CertDetails | None) -> dict[str, Any]:
+    """Fill a result from the certificate the host presented."""
+    if details is None:
+        result["status"] = "error"
+        result["error"] = "No certificate returned"
+        return result
+
+    days_remaining = (details.not_after - datetime.now(timezone.utc)).days
+    result.update({
+        "status": "valid" if days_remaining > 0 else "expired",
+        "issuer": details.issuer,
+        "subject": details.subject,
+        "not_before": details.not_before.isoformat(),
+        "not_after": details.not_after.isoformat(),
+        "days_remaining": days_remaining,
+        "serial_number": details.serial_number,
+        "san": list(details.san),
+        "fingerprint": fingerprint,
+    })
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def shared_context(cafile: str | None = None) -> ssl.SSLContext:
+    """Verifying client context, built once per CA bundle (None: the system store).
+
+    Loading a CA bundle is the expensive part of creating a context, so
+    every check in a process that verifies the same way shares one.
+    """
+    return ssl.create_default_context(cafile=cafile)
+
+
+def record_error(result: dict[str, Any], exc: BaseException, timeout: float) -> dict[str, Any]:
+    """Set the status and error of a result from the exception that ended its check."""
+    hostname, port = result["hostname"], result["port"]
+    target = f"{hostname} ({result['address']})" if result.get("address") else hostname
+    if isinstance(exc, ssl.SSLCertVerificationError):
         result["status"] = "invalid"
         result["error"] = str(exc)
-        logger.warning("SSL verification failed for %s: %s", hostname, exc)
-
-    except socket.timeout:
+        logger.warning("SSL verification failed for %s: %s", target, exc)
+    elif isinstance(exc, (socket.timeout, asyncio.TimeoutError)):
         result["status"] = "timeout"
         result["error"] = f"Connection timed out after {timeout}s"
-        logger.warning("Connection to %s:%d timed out", hostname, port)
-
-    except socket.gaierror as exc:
+        logger.warning("Connection to %s:%d timed out", target, port)
+    elif isinstance(exc, socket.gaierror):
         result["status"] = "dns_error"
         result["error"] = f"DNS resolution failed: {exc}"
         logger.warning("DNS resolution failed for %s: %s", hostname, exc)
-
-    except (OSError, ssl.SSLError) as exc:
+    else:
         result["status"] = "error"
         result["error"] = str(exc)
-        logger.warning("Error checking %s:%d: %s", hostname, port, exc)
-
+        logger.warning("Error checking %s:%d: %s", target, port, exc)
     return result
 
 
+def get_cert_info(
+    hostname: str,
+    port: int = 443,
+    timeout: float = 10,
+    context: ssl.SSLContext | None = None,
+) -> dict[str, Any]:
+    """Retrieve SSL certificate information for a hostname.
+
+    Returns dict with certificate details or error information.
+    """
+    result = new_result(hostname, port)
+    context = context or shared_context()
+
+    try:
+        with socket.create_connection((hostname, port), timeout=timeout) as sock:
+            with context.wrap_socket(sock, server_hostname=hostname) as tls_sock:
+                return fill_cert_details(result, *peer_cert_details(tls_sock))
+    except (OSError, ssl.SSLError) as exc:
+        return record_error(result, exc, timeout)
+
+
+@dataclass(slots=True)
+class ResolverStats:
+    """DNS lookups made and answered from the cache, with lookup latencies."""
+
+    lookups: int = 0
+    cache_hits: int = 0
+    failures: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def merge(self, other: "ResolverStats") -> None:
+        self.lookups += other.lookups
+        self.cache_hits += other.cache_hits
+        self.failures += other.failures
+        self.latencies.extend(other.latencies)
+
+    def summary(self) -> dict[str, Any]:
+        """Counts, hit rate and latency percentiles in milliseconds."""
+        latencies = sorted(self.latencies)
+        requests = self.lookups + self.cache_hits
+
+        def _percentile(fraction: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1)
+
+        return {
+            "lookups": self.lookups,
+            "cache_hits": self.cache_hits,
+            "hit_rate": round(self.cache_hits / requests, 3) if requests else 0.0,
+            "failures": self.failures,
+            "p50_ms": _percentile(0.5) if latencies else 0.0,
+            "p95_ms": _percentile(0.95) if latencies else 0.0,
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+
+
+class Resolver:
+    """Concurrent A/AAAA resolution with a TTL cache shared across hostnames.
+
+    Lookups go through the event loop's getaddrinfo with AI_CANONNAME, and
+    each answer is cached under both the queried name and its canonical
+    (CNAME target) name, so a CNAME target listed alongside its aliases is
+    not resolved again. Concurrent lookups of the same name share
+    one query. The system resolver does not expose record TTLs, so cached
+    answers and failures expire after a fixed ``ttl``.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_DNS_TTL, family: int = socket.AF_UNSPEC) -> None:
+        self.ttl = ttl
+        self.family = family
+        self.stats = ResolverStats()
+        self._cache: dict[str, tuple[float, asyncio.Task[list[str]]]] = {}
+
+    async def resolve(self, hostname: str) -> list[str]:
+        """Addresses of a hostname, IPv4 and IPv6, without duplicates.
+
+        Raises socket.gaierror when the name does not resolve.
+        """
+        key = hostname.rstrip(".").lower()
+        loop = asyncio.get_running_loop()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > loop.time():
+            self.stats.cache_hits += 1
+            lookup = entry[1]
+        else:
+            lookup = asyncio.create_task(self._lookup(key))
+            self._cache[key] = (float("inf"), lookup)
+        # Shielded so a caller hitting its timeout does not cancel a lookup others share.
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, key: str) -> list[str]:
+        loop = asyncio.get_running_loop()
+        lookup = asyncio.current_task()
+        started = time.perf_counter()
+        self.stats.lookups += 1
+        try:
+            infos = await loop.getaddrinfo(
+                key, None, family=self.family, type=socket.SOCK_STREAM, flags=socket.AI_CANONNAME,
+            )
+        except OSError:
+            self.stats.failures += 1
+            self._cache[key] = (loop.time() + self.ttl, lookup)
+            raise
+        finally:
+            self.stats.latencies.append(time.perf_counter() - started)
+
+        expires = loop.time() + self.ttl
+        self._cache[key] = (expires, lookup)
+        canonical = (infos[0][3] or key).rstrip(".").lower()
+        if canonical != key:
+            self._cache[canonical] = (expires, lookup)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+async def check_cert(
+    hostname: str,
+    port: int = 443,
+    timeout: float = 10,
+    context: ssl.SSLContext | None = None,
+    address: str | None = None,
+) -> dict[str, Any]:
+    """Asynchronous get_cert_info: connect and handshake within ``timeout`` seconds.
+
+    With ``address`` the connection goes to that IP, still sending
+    ``hostname`` as SNI and verifying the certificate against it.
+    """
+    result = new_result(hostname, port)
+    if address:
+        result["address"] = address
+    context = context or shared_context()
+    logger.debug("Checking %s:%d%s...", hostname, port, f" at {address}" if address else "")
+
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address or hostname, port, ssl=context, server_hostname=hostname),
+            timeout,
+        )
+    except (OSError, ssl.SSLError, asyncio.TimeoutError) as exc:
+        return record_error(result, exc, timeout)
+    try:
+        return fill_cert_details(result, *peer_cert_details(writer.get_extra_info("ssl_object")))
+    finally:
+        # Only the handshake matters; skip the TLS close_notify exchange.
+        writer.transport.abort()
+
+
+def _address_severity(result: dict[str, Any]) -> tuple[int, int]:
+    """Sort key putting the result that most needs attention first."""
+    if result["status"] == "expired":
+        return 0, result["days_remaining"]
+    if result["status"] != "valid":
+        return 1, 0
+    return 2, result["days_remaining"]
+
+
+def aggregate_addresses(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Combine the per-address results of one hostname.
+
+    The hostname takes the details of its worst address (an expired
+    certificate, then any failure, then the fewest days remaining), and
+    ``addresses`` lists the outcome on every address.
+    """
+    worst = min(results, key=_address_severity)
+    combined = dict(worst)
+    address = combined.pop("address")
+    if combined["error"] and len(results) > 1:
+        combined["error"] = f"{address}: {combined['error']}"
+    combined["addresses"] = [
+        {
+            "address": r["address"],
+            "status": r["status"],
+            "days_remaining": r["days_remaining"],
+            "subject": r["subject"],
+            "not_after": r["not_after"],
+            "serial_number": r["serial_number"],
+            "fingerprint": r["fingerprint"],
+            "error": r["error"],
+        }
+        for r in results
+    ]
+    return combined
+
+
+async def check_host(
+    hostname: str,
+    port: int,
+    timeout: float,
+    context: ssl.SSLContext,
+    resolver: Resolver,
+    connections: asyncio.Semaphore,
+) -> dict[str, Any]:
+    """Resolve a hostname and check the certificate served on each of its addresses.
+
+    ``timeout`` bounds the whole check: resolution plus the connect and
+    handshake on the addresses, which run in parallel with whatever time
+    resolution left. Time spent waiting for one of the ``connections``
+    slots is not counted against it.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        addresses = await asyncio.wait_for(resolver.resolve(hostname), timeout)
+    except (OSError, asyncio.TimeoutError) as exc:
+        return record_error(new_result(hostname, port), exc, timeout)
+    budget = max(0.01, round(timeout - (loop.time() - started), 2))
+
+    async def _check(address: str) -> dict[str, Any]:
+        async with connections:
+            result = await check_cert(hostname, port, budget, context, address)
+        if result["status"] == "timeout":
+            # Name the host's timeout rather than what resolution left of it.
+            result["error"] = f"Connection timed out after {timeout}s"
+        return result
+
+    results = await asyncio.gather(*(_check(address) for address in addresses))
+    return aggregate_addresses(list(results))
+
+
+async def iter_cert_checks(
+    hostnames: Iterable[str],
+    port: int = 443,
+    timeout: float = 10,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    deadline: float | None = None,
+    context: ssl.SSLContext | None = None,
+    resolver: Resolver | None = None,
+) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+    """Check hostnames concurrently, yielding (position, result) as each check completes.
+
+    At most ``concurrency`` hostnames are in flight and at most
+    ``concurrency`` TLS connections are open, however many addresses the
+    hostnames resolve to; hostnames are only read from the iterable as
+    slots free up. If the run outlasts
+    ``deadline`` seconds, checks still in flight are cancelled and every
+    host not checked yet is reported with status "timeout".
+    """
+    context = context or shared_context()
+    resolver = resolver or Resolver()
+    loop = asyncio.get_running_loop()
+    stop_at = None if deadline is None else loop.time() + deadline
+    connections = asyncio.Semaphore(concurrency)
+    queue = iter(enumerate(hostnames))
+    pending: dict[asyncio.Task[dict[str, Any]], tuple[int, str]] = {}
+
+    while True:
+        for index, hostname in itertools.islice(queue, max(0, concurrency - len(pending))):
+            task = asyncio.create_task(check_host(hostname, port, timeout, context, resolver, connections))
+            pending[task] = (index, hostname)
+        if not pending:
+            return
+        remaining = None if stop_at is None else stop_at - loop.time()
+        if remaining is not None and remaining <= 0:
+            break
+        done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index, _ = pending.pop(task)
+            yield index, task.result()
+
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    logger.error("Run deadline reached; reporting unchecked hosts as timed out")
+    for index, hostname in itertools.chain(pending.values(), queue):
+        result = new_result(hostname, port)
+        result["status"] = "timeout"
+        result["error"] = UNCHECKED_ERROR
+        yield index, result
+
+
+def classify_result(cert_info: dict[str, Any], warn_days: int, critical_days: int) -> str:
+    """Set and log the alert level of a checked certificate; returns the level."""
+    domain = cert_info["hostname"]
+    days = cert_info["days_remaining"]
+    status = cert_info["status"]
+
+    if status == "expired":
+        cert_info["alert_level"] = "CRITICAL"
+        logger.error("EXPIRED: %s (expired %d days ago)", domain, abs(days))
+    elif status in ("error", "invalid", "timeout", "dns_error"):
+        cert_info["alert_level"] = "ERROR"
+        logger.error("ERROR: %s (%s: %s)", domain, status, cert_info["error"])
+    elif 0 < days <= critical_days:
+        cert_info["alert_level"] = "CRITICAL"
+        logger.warning("CRITICAL: %s expires in %d days", domain, days)
+    elif 0 < days <= warn_days:
+        cert_info["alert_level"] = "WARNING"
+        logger.warning("WARNING: %s expires in %d days", domain, days)
+    else:
+        cert_info["alert_level"] = "OK"
+        logger.info("OK: %s (%d days remaining)", domain, days)
+    return cert_info["alert_level"]
+
+
+def check_shard(
+    hostnames: list[str],
+    port: int,
+    timeout: float,
+    concurrency: int,
+    stop_at: float | None,
+    dns_ttl: float,
+    family: int,
+    cafile: str | None,
+) -> tuple[list[dict[str, Any]], ResolverStats]:
+    """Process-pool worker: check one shard on its own event loop.
+
+    ``stop_at`` is the run deadline as a time.time() timestamp, shared by
+    every shard. Returns the results in the order of ``hostnames`` and the
+    shard's DNS stats.
+    """
+    results: list[dict[str, Any]] = [{} for _ in hostnames]
+    resolver = Resolver(dns_ttl, family)
+
+    async def _run() -> None:
+        deadline = None if stop_at is None else max(0.0, stop_at - time.time())
+        checks = iter_cert_checks(
+            hostnames, port, timeout, concurrency, deadline, context=shared_context(cafile), resolver=resolver,
+        )
+        async for index, cert_info in checks:
+            results[index] = cert_info
+
+    asyncio.run(_run())
+    return results, resolver.stats
+
+
+def iter_sharded_checks(
+    hostnames: list[str],
+    processes: int,
+    port: int = 443,
+    timeout: float = 10,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    deadline: float | None = None,
+    dns_ttl: float = DEFAULT_DNS_TTL,
+    family: int = socket.AF_UNSPEC,
+    cafile: str | None = None,
+    stats: ResolverStats | None = None,
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Check hostnames across a process pool, yielding (position, result) per finished shard.
+
+    Each worker runs its own event loop with up to ``concurrency``
+    connections in flight, so handshakes and certificate parsing spread over
+    ``processes`` cores. Shards hold a few concurrency windows' worth of
+    hosts: small enough that results stream back steadily and a shard of
+    slow hosts does not hold up the others, large enough to keep every
+    worker's window full. Each worker has its own DNS cache; their stats
+    are merged into ``stats``.
+    """
+    shard_size = concurrency * SHARD_WINDOWS
+    stop_at = None if deadline is None else time.time() + deadline
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {
+            pool.submit(
+                check_shard,
+                hostnames[start:start + shard_size],
+                port,
+                timeout,
+                concurrency,
+                stop_at,
+                dns_ttl,
+                family,
+                cafile,
+            ): start
+            for start in range(0, len(hostnames), shard_size)
+        }
+        logger.debug("Checking %d shard(s) of up to %d hosts on %d processes", len(futures), shard_size, processes)
+        for future in as_completed(futures):
+            start = futures[future]
+            shard_results, shard_stats = future.result()
+            if stats is not None:
+                stats.merge(shard_stats)
+            for offset, cert_info in enumerate(shard_results):
+                yield start + offset, cert_info
+
+
+def check_domains(domains: list[str], args: argparse.Namespace) -> tuple[list[dict[str, Any]], ResolverStats]:
+    """Check every domain concurrently and classify each result as it arrives.
+
+    Returns the results in the order of ``domains`` and the DNS stats.
+    """
+    results: list[dict[str, Any]] = [{} for _ in domains]
+    family = ADDRESS_FAMILIES[args.address_family]
+    stats = ResolverStats()
+
+    def _collect(index: int, cert_info: dict[str, Any]) -> None:
+        classify_result(cert_info, args.warn_days, args.critical_days)
+        results[index] = cert_info
+
+    if args.processes > 1:
+        checks = iter_sharded_checks(
+            domains,
+            args.processes,
+            port=args.port,
+            timeout=args.timeout,
+            concurrency=args.concurrency,
+            deadline=args.deadline,
+            dns_ttl=args.dns_ttl,
+            family=family,
+            cafile=args.ca_file,
+            stats=stats,
+        )
+        for index, cert_info in checks:
+            _collect(index, cert_info)
+        return results, stats
+
+    async def _run() -> None:
+        resolver = Resolver(args.dns_ttl, family)
+        resolver.stats = stats
+        checks = iter_cert_checks(
+            domains,
+            port=args.port,
+            timeout=args.timeout,
+            concurrency=args.concurrency,
+            deadline=args.deadline,
+            context=shared_context(args.ca_file),
+            resolver=resolver,
+        )
+        async for index, cert_info in checks:
+            _collect(index, cert_info)
+
+    asyncio.run(_run())
+    return results, stats
+
+
+def group_by_certificate(results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Certificates served by more than one host, soonest expiry first.
+
+    A host whose addresses serve different certificates is listed under each.
+    """
+    groups: dict[str, dict[str, Any]] = {}
+    for r in results:
+        served = {a["fingerprint"]: a for a in r.get("addresses") or [r] if a.get("fingerprint")}
+        for fingerprint, cert in served.items():
+            group = groups.setdefault(fingerprint, {
+                "fingerprint": fingerprint,
+                "subject": cert["subject"],
+                "not_after": cert["not_after"],
+                "days_remaining": cert["days_remaining"],
+                "hosts": [],
+            })
+            group["hosts"].append(f"{r['hostname']}:{r['port']}")
+    shared = [g for g in groups.values() if len(g["hosts"]) > 1]
+    shared.sort(key=lambda g: (g["days_remaining"], -len(g["hosts"])))
+    return shared
+
+
 def send_sns_alert(
     sns_topic_arn: str,
     region: str,
@@ -186,6 +697,9 @@ def build_parser() -> argparse.ArgumentParser:
 Examples:
   %(prog)s --domains example.com google.com github.com
   %(prog)s --domains-file domains.txt --warn-days 30
+  %(prog)s --domains-file domains.txt --concurrency 500 --timeout 5 --deadline 600
+  %(prog)s --domains-file domains.txt --processes 0
+  %(prog)s --domains-file domains.txt --due-only --max-staleness 30
   %(prog)s --domains example.com --sns-topic arn:aws:sns:us-east-1:123:alerts
   %(prog)s --domains example.com --json
         """,
@@ -197,13 +711,60 @@ Examples:
     parser.add_argument("--port", type=int, default=443, help="TLS port (default: 443)")
     parser.add_argument("--warn-days", type=int, default=30, help="Alert if expiring within N days (default: 30)")
     parser.add_argument("--critical-days", type=int, default=7, help="Critical alert threshold in days (default: 7)")
-    parser.add_argument("--timeout", type=int, default=10, help="Connection timeout in seconds (default: 10)")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10,
+        help="Per-host timeout in seconds, covering DNS resolution and the connect and handshake "
+        "on each address (default: 10)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        metavar="N",
+        help="TLS connections in flight at once, one per address of a host being checked; also the "
+        f"hostnames checked at once (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="Stop the whole run after SECONDS, reporting hosts not yet checked as timed out",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Shard the domains across N worker processes, each with --concurrency connections in flight; "
+        "0 uses every CPU (default: 1)",
+    )
+    parser.add_argument(
+        "--ca-file",
+        metavar="FILE",
+        help="Verify certificates against this CA bundle instead of the system trust store",
+    )
+    parser.add_argument(
+        "--dns-ttl",
+        type=float,
+        default=DEFAULT_DNS_TTL,
+        metavar="SECONDS",
+        help=f"Reuse DNS answers across hostnames for SECONDS (default: {DEFAULT_DNS_TTL})",
+    )
+    parser.add_argument(
+        "--address-family",
+        choices=list(ADDRESS_FAMILIES),
+        default="all",
+        help="Addresses to check the certificate on: every A and AAAA record, or one family (default: all)",
+    )
     parser.add_argument("--sns-topic", metavar="ARN", help="SNS topic ARN for alerts")
     parser.add_argument("--sns-region", default="us-east-1", help="AWS region for SNS (default: us-east-1)")
     parser.add_argument("--profile", help="AWS CLI profile")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
     parser.add_argument("--output", metavar="FILE", help="Write results to file")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
+    add_state_arguments(parser)
     return parser
 
 
@@ -214,44 +775,50 @@ def main() -> int:
 
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
+    if args.processes < 1:
+        args.processes = os.cpu_count() or 1
+    if args.due_only and args.no_state:
+        parser.error("--due-only needs the check state; drop --no-state")
 
     domains = args.domains if args.domains else load_domains_from_file(args.domains_file)
     if not domains:
         logger.error("No domains specified")
         return 1
 
-    logger.info("Checking SSL certificates for %d domain(s)", len(domains))
-
-    results: list[dict[str, Any]] = []
-    alerts: list[dict[str, Any]] = []
-
-    for domain in domains:
-        logger.info("Checking %s:%d...", domain, args.port)
-        cert_info = get_cert_info(domain, port=args.port, timeout=args.timeout)
-        results.append(cert_info)
-
-        days = cert_info["days_remaining"]
-        status = cert_info["status"]
-
-        if status == "expired":
-            cert_info["alert_level"] = "CRITICAL"
-            alerts.append(cert_info)
-            logger.error("EXPIRED: %s (expired %d days ago)", domain, abs(days))
-        elif status in ("error", "invalid", "timeout", "dns_error"):
-            cert_info["alert_level"] = "ERROR"
-            alerts.append(cert_info)
-            logger.error("ERROR: %s (%s: %s)", domain, status, cert_info["error"])
-        elif 0 < days <= args.critical_days:
-            cert_info["alert_level"] = "CRITICAL"
-            alerts.append(cert_info)
-            logger.warning("CRITICAL: %s expires in %d days", domain, days)
-        elif 0 < days <= args.warn_days:
-            cert_info["alert_level"] = "WARNING"
-            alerts.append(cert_info)
-            logger.warning("WARNING: %s expires in %d days", domain, days)
-        else:
-            cert_info["alert_level"] = "OK"
-            logger.info("OK: %s (%d days remaining)", domain, days)
+    state = open_state(args)
+    now = time.time()
+    due = [
+        index for index, domain in enumerate(domains)
+        if not args.due_only or state.is_due(domain, args.port, args.warn_days, now)
+    ]
+    if args.due_only:
+        logger.info("Checking SSL certificates for %d of %d domain(s); the rest are not due", len(due), len(domains))
+    else:
+        logger.info("Checking SSL certificates for %d domain(s)", len(domains))
+
+    started = time.perf_counter()
+    checked, dns_stats = check_domains([domains[index] for index in due], args)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    logger.info("Checked %d domain(s) in %.1fs (%.0f/min)", len(checked), elapsed, len(checked) / elapsed * 60)
+
+    results: list[dict[str, Any]] = [{} for _ in domains]
+    for index, cert_info in zip(due, checked):
+        results[index] = cert_info
+        if state is not None and cert_info["error"] != UNCHECKED_ERROR:
+            state.record(cert_info, args.warn_days, now)
+    for index, domain in enumerate(domains):
+        if not results[index]:
+            results[index] = state.cached_result(new_result(domain, args.port), now)
+            classify_result(results[index], args.warn_days, args.critical_days)
+    if state is not None:
+        state.save(now)
+    alerts = [r for r in results if r["alert_level"] != "OK"]
+    dns = dns_stats.summary()
+    logger.info(
+        "DNS: %d lookup(s), %d cache hit(s) (%.0f%%), %d failure(s); latency p50 %.1fms, p95 %.1fms, max %.1fms",
+        dns["lookups"], dns["cache_hits"], dns["hit_rate"] * 100, dns["failures"],
+        dns["p50_ms"], dns["p95_ms"], dns["max_ms"],
+    )
 
     if args.json:
         output = json.dumps(results, indent=2, default=str)
@@ -279,11 +846,30 @@ def main() -> int:
                 print(f"       Issuer:    {r['issuer']}")
             if r.get("error"):
                 print(f"       Error:     {r['error']}")
+            if len(r.get("addresses", [])) > 1:
+                for a in r["addresses"]:
+                    detail = a["error"] or f"{a['days_remaining']} days, serial {a['serial_number']}"
+                    print(f"       Address:   {a['address']} {a['status']} ({detail})")
+
+        shared = group_by_certificate(results)
+        if shared:
+            print(f"\n{'-' * 70}")
+            print(f"  Shared certificates ({len(shared)})")
+            for g in shared:
+                print(f"\n  {g['subject'] or g['fingerprint'][:16]} ({len(g['hosts'])} hosts)")
+                print(f"       SHA-256:   {g['fingerprint']}")
+                print(f"       Expires:   {g['not_after']} ({g['days_remaining']} days)")
+                hosts = ", ".join(g["hosts"][:SHARED_HOSTS_SHOWN])
+                if len(g["hosts"]) > SHARED_HOSTS_SHOWN:
+                    hosts += f" and {len(g['hosts']) - SHARED_HOSTS_SHOWN} more"
+                print(f"       Hosts:     {hosts}")
 
         print(f"\n{'=' * 70}")
         print(f"  Total: {len(results)} | OK: {sum(1 for r in results if r.get('alert_level') == 'OK')} | "
               f"Warnings: {sum(1 for r in results if r.get('alert_level') == 'WARNING')} | "
               f"Critical: {sum(1 for r in results if r.get('alert_level') in ('CRITICAL', 'ERROR'))}")
+        print(f"  DNS: {dns['lookups']} lookups | {dns['cache_hits']} cache hits ({dns['hit_rate']:.0%}) | "
+              f"p50 {dns['p50_ms']}ms | p95 {dns['p95_ms']}ms")
         print(f"{'=' * 70}\n")
 
     if alerts and args.sns_topic:
@@ -0,0 +1,203 @@
+"""Vectorized fleet utilization analytics.
+
+Hourly CloudWatch series for every instance are loaded into one NumPy
+matrix per metric (instances x hours, NaN where a datapoint is missing).
+Mean, p95, p99, peak and linear trend are then computed for the whole
+fleet in a single pass per metric. Underutilization verdicts come from
+percentile rules such as ``cpu.p95<20``. All rules must hold for an
+instance to be flagged, so a bursty instance with a low mean but a high
+p99 is not reported.
+"""
+
+import argparse
+import operator
+import re
+import warnings
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable
+
+import numpy as np
+
+from cloudwatch_metrics import MetricQuery, MetricSeries
+
+HOUR = 3600
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    """Where a utilization metric comes from and how its values are scaled."""
+
+    namespace: str
+    metric_name: str
+    stat: str
+    scale: float = 1.0
+
+
+# Metric name used in rules -> CloudWatch source. Network is MB per hour;
+# memory needs the CloudWatch agent publishing mem_used_percent per instance.
+METRICS: dict[str, MetricSpec] = {
+    "cpu": MetricSpec("AWS/EC2", "CPUUtilization", "Average"),
+    "network_in": MetricSpec("AWS/EC2", "NetworkIn", "Sum", scale=1e-6),
+    "network_out": MetricSpec("AWS/EC2", "NetworkOut", "Sum", scale=1e-6),
+    "memory": MetricSpec("CWAgent", "mem_used_percent", "Average"),
+}
+
+STATS = ("mean", "p95", "p99", "peak", "trend")
+
+_OPERATORS: dict[str, Callable[[Any, float], Any]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_RULE_RE = re.compile(r"^\s*(\w+)\.(\w+)\s*(<=|>=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+@dataclass(frozen=True)
+class UtilizationRule:
+    """A condition on one statistic of one metric, e.g. cpu.p95 < 20."""
+
+    metric: str
+    stat: str
+    op: str
+    threshold: float
+
+    def __str__(self) -> str:
+        return f"{self.metric}.{self.stat}{self.op}{self.threshold:g}"
+
+    @classmethod
+    def parse(cls, text: str) -> "UtilizationRule":
+        """Parse METRIC.STAT OP NUMBER; raises ValueError when malformed."""
+        match = _RULE_RE.match(text)
+        if not match:
+            raise ValueError(f"expected METRIC.STAT<NUMBER, got {text!r}")
+        metric, stat, op, threshold = match.groups()
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r} (choose from {', '.join(METRICS)})")
+        if stat not in STATS:
+            raise ValueError(f"unknown statistic {stat!r} (choose from {', '.join(STATS)})")
+        return cls(metric, stat, op, float(threshold))
+
+    def evaluate(self, stats: dict[str, dict[str, np.ndarray]]) -> np.ndarray:
+        """Return a boolean mask of instances satisfying the rule (NaN never does)."""
+        return _OPERATORS[self.op](stats[self.metric][self.stat], self.threshold)
+
+
+def default_rules(cpu_threshold: float) -> list[UtilizationRule]:
+    """Mean CPU below the threshold, guarded against bursty workloads."""
+    return [
+        UtilizationRule("cpu", "mean", "<", cpu_threshold),
+        UtilizationRule("cpu", "p99", "<", max(50.0, cpu_threshold)),
+    ]
+
+
+def rule_arg(value: str) -> UtilizationRule:
+    """argparse type for --utilization-rule."""
+    try:
+        return UtilizationRule.parse(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def metric_queries(instance_ids: list[str], metrics: list[str], period: int = HOUR) -> list[MetricQuery]:
+    """Build one query per instance and metric, keyed "<metric>/<instance-id>"."""
+    return [
+        MetricQuery(
+            key=f"{metric}/{instance_id}",
+            namespace=METRICS[metric].namespace,
+            metric_name=METRICS[metric].metric_name,
+            dimensions=(("InstanceId", instance_id),),
+            stat=METRICS[metric].stat,
+            period=period,
+        )
+        for metric in metrics
+        for instance_id in instance_ids
+    ]
+
+
+def load_matrix(
+    instance_ids: list[str],
+    metric: str,
+    series: dict[str, MetricSeries],
+    start_time: datetime,
+    end_time: datetime,
+    period: int = HOUR,
+) -> np.ndarray:
+    """Place each instance's datapoints into its row of a NaN-filled matrix.
+
+    Columns are consecutive periods from ``start_time``, so gaps stay NaN
+    and never shift later datapoints.
+    """
+    columns = max(1, int((end_time - start_time).total_seconds() // period))
+    matrix = np.full((len(instance_ids), columns), np.nan)
+    origin = start_time.timestamp()
+    scale = METRICS[metric].scale
+    for row, instance_id in enumerate(instance_ids):
+        data = series.get(f"{metric}/{instance_id}")
+        if data is None or not data.values:
+            continue
+        values = np.asarray(data.values, dtype=float) * scale
+        first = int((data.timestamps[0].timestamp() - origin) // period)
+        last = int((data.timestamps[-1].timestamp() - origin) // period)
+        if last - first == len(values) - 1 and first >= 0 and last < columns:
+            # Gap-free series (the common case): one slice, no per-point work.
+            matrix[row, first:last + 1] = values
+            continue
+        offsets = np.fromiter((ts.timestamp() for ts in data.timestamps), float, len(data.timestamps))
+        index = ((offsets - origin) // period).astype(np.int64)
+        valid = (index >= 0) & (index < columns)
+        matrix[row, index[valid]] = values[valid]
+    return matrix
+
+
+def summarize(matrix: np.ndarray, period: int = HOUR) -> dict[str, np.ndarray]:
+    """Per-row mean, p95, p99, peak and least-squares trend (units per day).
+
+    Rows without any datapoint get NaN for every statistic.
+    """
+    present = ~np.isnan(matrix)
+    count = present.sum(axis=1)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(matrix, axis=1)
+        p95, p99 = np.nanpercentile(matrix, [95, 99], axis=1)
+        peak = np.nanmax(matrix, axis=1)
+
+        # Slope of value over time fitted to the present datapoints only.
+        x = np.where(present, np.arange(matrix.shape[1], dtype=float), 0.0)
+        y = np.where(present, matrix, 0.0)
+        sum_x = x.sum(axis=1)
+        sum_y = y.sum(axis=1)
+        slope = (count * (x * y).sum(axis=1) - sum_x * sum_y) / (count * (x * x).sum(axis=1) - sum_x ** 2)
+    trend = np.where(count >= 2, slope * (86400 / period), np.nan)
+    return {"mean": mean, "p95": p95, "p99": p99, "peak": peak, "trend": trend}
+
+
+def analyze_fleet(
+    instance_ids: list[str],
+    series: dict[str, MetricSeries],
+    metrics: list[str],
+    start_time: datetime,
+    end_time: datetime,
+    period: int = HOUR,
+) -> dict[str, dict[str, np.ndarray]]:
+    """Summarize every metric for every instance; arrays follow ``instance_ids``."""
+    return {
+        metric: summarize(load_matrix(instance_ids, metric, series, start_time, end_time, period), period)
+        for metric in metrics
+    }
+
+
+def underutilized(stats: dict[str, dict[str, np.ndarray]], rules: list[UtilizationRule]) -> np.ndarray:
+    """Indices of instances that satisfy every rule."""
+    mask = np.ones(len(next(iter(stats.values()))["mean"]), dtype=bool)
+    for rule in rules:
+        mask &= rule.evaluate(stats)
+    return np.flatnonzero(mask)
+
+
+def rule_metrics(rules: list[UtilizationRule]) -> list[str]:
+    """Metrics to fetch for a rule set; CPU is always included for reporting."""
+    return ["cpu", *sorted({rule.metric for rule in rules} - {"cpu"})]